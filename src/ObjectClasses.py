@@ -1,14 +1,82 @@
-from dataclasses import dataclass
-from typing import Optional, List, Tuple
+import functools
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, List, Tuple, Dict
 
 import cv2
 import cv2 as cv
 import numpy as np
-from PySide6.QtCore import QThread, Signal, QMutex, QMutexLocker
+from PySide6.QtCore import Qt, QThread, Signal, QMutex, QMutexLocker
+from genicam.genapi import EAccessMode
+from genicam.gentl import TimeoutException
 from harvesters.core import Harvester
+from image_cache import cached_imread, thumbnail_cache
+from metrics import metrics
+from profiling import profiler
 from utils import OpenCVToQtAdapter
 
 
+# 16-битные файлы (TIFF/PNG) читаются без потери разрядности
+IMREAD_FLAGS = cv.IMREAD_GRAYSCALE | cv.IMREAD_ANYDEPTH
+
+
+def normalize_depth(image: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Рабочие типы конвейера - uint8 и uint16; прочие приводятся к uint16"""
+    if image is None or image.dtype in (np.uint8, np.uint16):
+        return image
+    return cv.normalize(image, None, 0, 65535, cv.NORM_MINMAX, dtype=cv.CV_16U)
+
+
+# Полный перебор автогаммы (1..15 с шагом 0.1) помещается в кэш целиком
+@functools.lru_cache(maxsize=160)
+def gamma_lut(gamma: float, dtype: str = 'uint8') -> np.ndarray:
+    """Таблица гамма-коррекции на 256 или 65536 значений (кэшируется)"""
+    max_value = np.iinfo(dtype).max
+    values = np.arange(max_value + 1, dtype=np.float64) / max_value
+    lut = (np.power(values, gamma) * max_value).astype(dtype)
+    lut.setflags(write=False)
+    return lut
+
+
+@functools.lru_cache(maxsize=160)
+def gamma_display_lut(gamma: float) -> np.ndarray:
+    """8-битная таблица гаммы для отображения 16-битного кадра по старшему байту"""
+    samples = np.minimum(np.arange(256) * 256, 65535)
+    lut = OpenCVToQtAdapter.to_8bit(gamma_lut(gamma, 'uint16')[samples])
+    lut.setflags(write=False)
+    return lut
+
+
+def otsu_threshold(image: np.ndarray) -> float:
+    """Порог Оцу по гистограмме (для 16 бит - 65536 корзин)"""
+    bins = np.iinfo(image.dtype).max + 1
+    return otsu_from_histogram(cv.calcHist([image], [0], None, [bins], [0, bins]).ravel())
+
+
+def otsu_from_histogram(hist: np.ndarray) -> float:
+    """Порог Оцу по готовой гистограмме (в т.ч. собранной по тайлам)"""
+    hist = np.asarray(hist, dtype=np.float64)
+    bins = len(hist)
+    levels = np.arange(bins, dtype=np.float64)
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    if total == 0:
+        return 0.0
+    cumulative_mean = np.cumsum(hist * levels)
+    mean = cumulative_mean[-1] / total
+    # Межклассовая дисперсия для всех порогов сразу
+    background = weight * (total - weight)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean * weight - cumulative_mean) ** 2 / background
+    between[background == 0] = 0
+    return float(np.argmax(between))
+
+
 @dataclass
 class CameraParams:
     """Параметры камеры"""
@@ -22,6 +90,7 @@ class CameraParams:
     auto_exposure: bool = False
     auto_gain: bool = False
     auto_white_balance: bool = False
+    binning: int = 1  # биннинг/децимация предпросмотра
 
 
 class Image:
@@ -29,19 +98,47 @@ class Image:
      и изменения его параметров без создания высокой связности
      QT приложения(теперь QT App делает 0 вызовов к opencv)'''
 
-    def __init__(self, image_path, image=None):
+    def __init__(self, image_path, image=None, timestamp=None):
         if image is None:
-            image = cv.imread(image_path, cv.IMREAD_GRAYSCALE)
-        self.image = image
+            image = cached_imread(image_path, IMREAD_FLAGS)
+        self.image = normalize_depth(image)
         self.image_path = image_path
+        # Время захвата кадра (time.perf_counter) для кадров с камеры
+        self.timestamp = timestamp
+        # Кадр не отличается от предыдущего (FrameChangeDetector) и номер последнего
+        # изменения сцены, к которому он относится (None - неизвестно)
+        self.is_static = False
+        self.change_generation = None
+        # Положение изображения (ROI) в полном кадре и размер полного кадра (w, h)
+        self.offset = (0, 0)
+        self.full_size = None
         self.contours = None
         self.processed_image = None
         self.image_with_contours = None
+        # Гистограмма исходного 16-битного кадра (для порога после гаммы)
+        self._histogram = None
+
+    @property
+    def processed_image(self) -> Optional[np.ndarray]:
+        # 16-битная гамма применяется при первом обращении: для маски она не нужна
+        if self._processed_image is None and self._gamma_lut is not None:
+            self._processed_image = np.take(self._gamma_lut, self.image)
+        return self._processed_image
+
+    @processed_image.setter
+    def processed_image(self, image: Optional[np.ndarray]):
+        self._processed_image = image
+        self._gamma_lut = None
+        self._display_image = None
 
     # Getters, setters and simple staff:
     def get_image(self):
         return self.image
 
+    def get_max_value(self) -> int:
+        """Максимальный уровень яркости (255 или 65535)"""
+        return int(np.iinfo(self.image.dtype).max)
+
     def get_processed_image(self):
         return self.processed_image
 
@@ -54,34 +151,136 @@ class Image:
         return self.contours
 
     def clone(self):
-        return Image(image_path=self.image_path, image=self.image)
+        return Image(image_path=self.image_path, image=self.image)._copy_frame_info(self)
+
+    def _copy_frame_info(self, source: 'Image') -> 'Image':
+        """Перенос времени захвата и геометрии ROI с исходного изображения"""
+        self.timestamp = source.timestamp
+        self.is_static = source.is_static
+        self.change_generation = source.change_generation
+        self.offset = source.offset
+        self.full_size = source.full_size
+        return self
+
+    def get_full_size(self) -> Tuple[int, int]:
+        """Размер полного кадра (w, h), к которому относятся координаты"""
+        if self.full_size is not None:
+            return self.full_size
+        return (self.image.shape[1], self.image.shape[0])
+
+    def crop(self, x: int, y: int, width: int, height: int) -> 'Image':
+        """Программный ROI (координаты в системе этого изображения)"""
+        cropped = Image(self.image_path, self.image[y:y + height, x:x + width])._copy_frame_info(self)
+        cropped.offset = (self.offset[0] + x, self.offset[1] + y)
+        cropped.full_size = self.get_full_size()
+        return cropped
+
+    def get_full_frame_px(self) -> int:
+        """Пикселей в полном кадре (знаменатель доли площади при ROI)"""
+        width, height = self.get_full_size()
+        return width * height
+
+    def get_contours_full_frame(self, contours=None):
+        """Контуры (по умолчанию - свои) в координатах полного кадра"""
+        if contours is None:
+            contours = self.get_contours()
+        if self.offset == (0, 0):
+            return contours
+        shift = np.array(self.offset, dtype=contours[0].dtype if contours else np.int32)
+        return tuple(contour + shift for contour in contours)
 
     def open_image(self, filename):
         self.image_path = filename
-        self.image = cv.imread(self.image_path, cv.IMREAD_GRAYSCALE)
+        self.image = normalize_depth(cached_imread(self.image_path, IMREAD_FLAGS))
+        self._histogram = None
+        self._display_image = None
         return self.image
 
     # Meaningful functions
+    @profiler.timed('gamma')
     def apply_gamma(self, gamma):
-        lookUpTable = np.empty((1, 256), np.uint8)
-        for i in range(256):
-            lookUpTable[0, i] = np.clip(pow(i / 255.0, gamma) * 255.0, 0, 255)
-        gamma_img = cv.LUT(self.image, lookUpTable)
-        self.processed_image = gamma_img
+        gamma = round(float(gamma), 4)
+        lookUpTable = gamma_lut(gamma, self.image.dtype.name)
+        if self.image.dtype == np.uint8:
+            self.processed_image = cv.LUT(self.image, lookUpTable)
+        elif gamma > 0:
+            # cv.LUT поддерживает только 8 бит, а выборка из таблицы на 65536 значений
+            # в 5 раз дороже. Таблица монотонна, поэтому маска считается по исходному
+            # кадру (binarize), а сам кадр после гаммы - только для отображения
+            self.processed_image = None
+            self._gamma_lut = lookUpTable
+            self._display_lut = gamma_display_lut(gamma)
+        else:
+            self.processed_image = np.take(lookUpTable, self.image)
         self.is_applied_contours = False
         return self
 
-    def apply_contours(self):
-        if self.processed_image is None:
-            processed_image = self.image
-        else:
-            processed_image = self.processed_image
-        _, temp_image = cv.threshold(processed_image, 0., 255., cv.THRESH_OTSU)
-        contours, hierarchy = cv.findContours(temp_image, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
-        # print(len(contours))
-        self.contours = contours
-        back_to_rgb = cv.cvtColor(processed_image, cv.COLOR_GRAY2RGB)
-        self.image_with_contours = cv.drawContours(back_to_rgb, contours, -1, (255, 0, 0), 3)
+    def _working_image(self) -> np.ndarray:
+        """Обработанное изображение, если оно есть, иначе исходное"""
+        return self.image if self.processed_image is None else self.processed_image
+
+    def _has_processed_image(self) -> bool:
+        return self._processed_image is not None or self._gamma_lut is not None
+
+    def get_display_image(self) -> np.ndarray:
+        """8-битная копия рабочего изображения для отображения (строится один раз)"""
+        if self._display_image is None:
+            if self._processed_image is None and self._gamma_lut is not None:
+                # Экрану хватает старшего байта: cv.LUT на 256 значений вместо полной гаммы
+                high_byte = cv.convertScaleAbs(self.image, alpha=1.0 / 256.0)
+                self._display_image = cv.LUT(high_byte, self._display_lut)
+            else:
+                self._display_image = OpenCVToQtAdapter.to_8bit(self._working_image())
+        return self._display_image
+
+    def get_view_image(self, use_processed=True) -> np.ndarray:
+        """Кадр, который показывается без контуров: после предобработки, если она была"""
+        if use_processed and self._has_processed_image():
+            return self.get_display_image()
+        return self.image
+
+    @profiler.timed('otsu_threshold')
+    def binarize(self) -> np.ndarray:
+        """Бинарная маска включений по порогу Оцу"""
+        if self._processed_image is None and self._gamma_lut is not None:
+            return self._binarize_through_lut(self._gamma_lut)
+        processed_image = self._working_image()
+        if processed_image.dtype == np.uint8:
+            _, mask = cv.threshold(processed_image, 0., 255., cv.THRESH_OTSU)
+            return mask
+        return cv.compare(processed_image, otsu_threshold(processed_image), cv.CMP_GT)
+
+    def _binarize_through_lut(self, lut: np.ndarray) -> np.ndarray:
+        """
+        Та же маска, что lut[image] > порог Оцу, без построения lut[image]:
+        гистограмма после гаммы - перенос гистограммы исходного кадра по таблице,
+        а сравнение идёт с исходным кадром по обратному образу порога
+        """
+        if self._histogram is None:
+            bins = len(lut)
+            self._histogram = cv.calcHist([self.image], [0], None, [bins], [0, bins]).ravel()
+        threshold = otsu_from_histogram(np.bincount(lut, weights=self._histogram, minlength=len(lut)))
+        # Наибольшее исходное значение, которое после гаммы не превышает порог
+        source_threshold = int(np.searchsorted(lut, threshold, side='right')) - 1
+        return cv.compare(self.image, source_threshold, cv.CMP_GT)
+
+    @staticmethod
+    @profiler.timed('findContours')
+    def find_contours(mask: np.ndarray):
+        contours, hierarchy = cv.findContours(mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    @profiler.timed('drawContours')
+    def draw_contours(self, contours) -> np.ndarray:
+        """Контуры поверх 8-битной копии для отображения"""
+        back_to_rgb = cv.cvtColor(self.get_display_image(), cv.COLOR_GRAY2RGB)
+        return cv.drawContours(back_to_rgb, contours, -1, (255, 0, 0), 3)
+
+    def apply_contours(self, draw=True):
+        self.contours = self.find_contours(self.binarize())
+        if not draw:
+            return self
+        self.image_with_contours = self.draw_contours(self.contours)
         return self
 
     def calculate_area(self, unit_factor=None):
@@ -96,25 +295,30 @@ class Image:
         else:
             return -1, -1
 
-    def get_pixmap(self, use_processed=True, use_contours=True):
+    def get_contour_areas(self) -> np.ndarray:
+        """Площади всех найденных контуров в пикселях"""
+        contours = self.get_contours()
+        return np.array([cv.contourArea(contour) for contour in contours], dtype=np.float64)
+
+    def get_pixmap(self, use_processed=True, use_contours=True, converter=None):
         if use_contours and self.contours:
-            return OpenCVToQtAdapter.convert_cv_to_qt(self.image_with_contours)
-        if use_processed and self.processed_image is not None:
-            return OpenCVToQtAdapter.convert_cv_to_qt(self.processed_image)
-        return OpenCVToQtAdapter.convert_cv_to_qt(self.image)
+            return OpenCVToQtAdapter.convert_cv_to_qt(self.image_with_contours, converter=converter)
+        return OpenCVToQtAdapter.convert_cv_to_qt(self.get_view_image(use_processed), converter=converter)
 
     def gamma_from_high_percentile(self, top_percent=0.001, target=0.6):
-        norm = self.image / 255.0
+        norm = self.image / float(self.get_max_value())
         sorted_vals = np.sort(norm.flatten())
         top_k = max(1, int(len(sorted_vals) * top_percent))
         bright_avg = np.mean(sorted_vals[-top_k:])
         gamma = np.log(target) / np.log(bright_avg)
         return np.clip(gamma, 0.5, 10.0)
 
+    @profiler.timed('stretch')
     def stretch_bright_region(self, threshold=0.85):
-        gray = self.image / 255.0
+        max_value = self.get_max_value()
+        gray = self.image / float(max_value)
         stretched = np.clip((gray - threshold) / (1.0 - threshold), 0, 1)
-        return Image(self.image_path, (stretched * 255).astype(np.uint8))
+        return Image(self.image_path, (stretched * max_value).astype(self.image.dtype))._copy_frame_info(self)
 
 
     def calculate_gamma_from_contour_graph_with_log_deriv(self, min_gamma=1.0, max_gamma=10.0, area_difference_coefficient=20,
@@ -126,7 +330,7 @@ class Image:
         areas = []
         while gamma <= max_gamma:
             self.apply_gamma(gamma)
-            contour_img = self.apply_contours()
+            contour_img = self.apply_contours(draw=False)
             current_area, _ = contour_img.calculate_area()
             areas.append(current_area)
             # print(prev_area/current_area, gamma)
@@ -164,100 +368,1046 @@ class Image:
         return min_gamma
 
 
+
+@dataclass
+class Measurements:
+    """Результат этапа measurements конвейера"""
+    contour_areas: np.ndarray  # площади контуров, px
+    image_px: int  # пикселей в измеряемом изображении
+    # Контуры в координатах полного кадра и его размер в пикселях (при ROI больше image_px)
+    contours: tuple = ()
+    frame_px: int = 0
+
+    @property
+    def area_px(self) -> float:
+        return float(self.contour_areas.sum())
+
+    @property
+    def area_fraction(self) -> float:
+        """Доля площади включений от полного кадра"""
+        frame_px = self.frame_px or self.image_px
+        return self.area_px / frame_px if frame_px else 0.0
+
+    @property
+    def contours_count(self) -> int:
+        return len(self.contour_areas)
+
+    def area(self, unit_factor=None) -> Tuple[float, float]:
+        """(площадь в px, площадь в единицах) с теми же соглашениями, что Image.calculate_area"""
+        if not self.contours_count:
+            return -1, -1
+        area_px = self.area_px
+        return area_px, area_px * unit_factor ** 2 if unit_factor else -1
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """Этап конвейера: входы (другие этапы), функция и объявленные параметры"""
+    name: str
+    inputs: Tuple[str, ...]
+    function: Callable
+    params: Tuple[Tuple[str, object], ...] = ()
+
+
+def _preprocess_stage(image: Image, mode: str, gamma: float, threshold: float) -> Image:
+    # apply_gamma меняет объект, поэтому работает с копией (массив общий)
+    if mode == ProcessingPipeline.GAMMA:
+        return image.clone().apply_gamma(gamma)
+    if mode == ProcessingPipeline.STRETCH:
+        return image.stretch_bright_region(threshold=threshold)
+    return image.clone()
+
+
+def _measure_stage(image: Image, contours) -> Measurements:
+    areas = np.array([cv.contourArea(contour) for contour in contours], dtype=np.float64)
+    return Measurements(contour_areas=areas, image_px=image.get_image().size,
+                        contours=tuple(image.get_contours_full_frame(contours)),
+                        frame_px=image.get_full_frame_px())
+
+
+class ProcessingPipeline:
+    '''Граф обработки decode -> preprocess -> threshold -> contours ->
+     measurements / overlay. Каждый этап объявляет свои параметры и кэширует
+     результат по версиям входов и значениям параметров, поэтому пересчитывается
+     только то, что ниже изменившегося этапа. Экземпляр не потокобезопасен:
+     у GUI, пакетной обработки и живого измерения - свои конвейеры'''
+
+    # Режимы этапа preprocess
+    NONE = 'none'
+    GAMMA = 'gamma'
+    STRETCH = 'stretch'
+
+    STAGES = (
+        PipelineStage('decode', (), Image, (('image_path', ''),)),
+        PipelineStage('preprocess', ('decode',), _preprocess_stage,
+                      (('mode', NONE), ('gamma', 1.0), ('threshold', 0.7))),
+        PipelineStage('threshold', ('preprocess',), Image.binarize),
+        PipelineStage('contours', ('threshold',), Image.find_contours),
+        PipelineStage('measurements', ('preprocess', 'contours'), _measure_stage),
+        PipelineStage('overlay', ('preprocess', 'contours'), Image.draw_contours),
+    )
+
+    def __init__(self):
+        self._stages = {stage.name: stage for stage in self.STAGES}
+        self._params = {stage.name: dict(stage.params) for stage in self.STAGES}
+        # имя этапа -> (ключ кэша, версия результата, результат)
+        self._cache: Dict[str, Tuple[tuple, int, object]] = {}
+        self._versions = itertools.count(1)
+        # Сколько раз этап действительно выполнялся
+        self.runs = {stage.name: 0 for stage in self.STAGES}
+
+    def set_source(self, image: Image):
+        """Готовое изображение вместо этапа decode (кадр камеры, уже открытый файл)"""
+        cached = self._cache.get('decode')
+        if cached is not None and cached[2] is image:
+            return
+        self._params['decode']['image_path'] = image.image_path
+        self._cache['decode'] = (self._key('decode', ()), next(self._versions), image)
+
+    def set_params(self, stage: str, **params):
+        declared = self._params[stage]
+        unknown = set(params) - set(declared)
+        if unknown:
+            raise KeyError(f"Stage {stage} has no parameters {sorted(unknown)}")
+        declared.update(params)
+
+    def get(self, stage: str):
+        """Результат этапа (пересчитывается только при изменении входов или параметров)"""
+        return self._evaluate(stage)[1]
+
+    def _key(self, name: str, input_versions: tuple) -> tuple:
+        return input_versions, tuple(sorted(self._params[name].items()))
+
+    def _evaluate(self, name: str) -> Tuple[int, object]:
+        stage = self._stages[name]
+        upstream = [self._evaluate(input_name) for input_name in stage.inputs]
+        key = self._key(name, tuple(version for version, _ in upstream))
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            profiler.count('pipeline.cached')
+            return cached[1], cached[2]
+
+        profiler.count('pipeline.runs')
+        output = stage.function(*(value for _, value in upstream), **self._params[name])
+        version = next(self._versions)
+        self._cache[name] = (key, version, output)
+        self.runs[name] += 1
+        return version, output
+
+
+class GammaTracker:
+    '''Слежение за автогаммой (по графику площадей) на живом видео.
+     Поиск начинается от гаммы предыдущего кадра и проверяет только узкий
+     интервал вокруг неё; полный перебор - при смене сцены или если
+     перепад площадей ушёл за границы интервала. Выход сглаживается'''
+
+    # Сдвиг итоговой гаммы относительно подножия перепада (как в полном поиске)
+    GAMMA_OFFSET = 2.0
+    STEP = 0.1
+
+    def __init__(self, min_gamma=1.0, max_gamma=15.0, bracket=0.5, smoothing=0.3,
+                 scene_change_threshold=12.0, stability_threshold=0.1, max_side=640):
+        self.min_gamma = min_gamma
+        self.max_gamma = max_gamma
+        self.bracket = bracket
+        self.smoothing = smoothing
+        self.scene_change_threshold = scene_change_threshold
+        self.stability_threshold = stability_threshold
+        self.max_side = max_side
+
+        self.gamma = None  # сглаженный результат
+        self.full_searches = 0
+        self.tracked_updates = 0
+        self._raw_gamma = None
+        self._reference = None
+
+    def reset(self):
+        self.gamma = None
+        self._raw_gamma = None
+        self._reference = None
+
+    def _downsample(self, gray: np.ndarray) -> np.ndarray:
+        # Перепад площадей определяется отношениями, поэтому уменьшенного кадра достаточно
+        h, w = gray.shape[:2]
+        scale = self.max_side / max(h, w)
+        if scale >= 1.0:
+            return gray
+        return cv.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv.INTER_AREA)
+
+    def _is_scene_changed(self, small: np.ndarray) -> bool:
+        if self._reference is None or self._reference.shape != small.shape:
+            return True
+        # Порог задан в 8-битных уровнях
+        levels = np.iinfo(small.dtype).max / 255.0
+        return float(cv.absdiff(small, self._reference).mean()) / levels > self.scene_change_threshold
+
+    def _full_search(self, small: np.ndarray) -> float:
+        self.full_searches += 1
+        self._reference = small
+        return Image('', small).calculate_gamma_from_contour_graph_with_log_deriv(
+            min_gamma=self.min_gamma, max_gamma=self.max_gamma
+        )
+
+    def _bracket_search(self, small: np.ndarray) -> Optional[float]:
+        """Поиск подножия перепада в интервале вокруг прошлого результата (None - не найден)"""
+        foot = self._raw_gamma - self.GAMMA_OFFSET
+        n = int(round(self.bracket / self.STEP))
+        gammas = [foot + self.STEP * k for k in range(-n, n + 1)]
+        gammas = [g for g in gammas if self.min_gamma <= g <= self.max_gamma]
+        if len(gammas) < 3:
+            return None
+
+        image = Image('', small)
+        areas = []
+        for gamma in gammas:
+            area, _ = image.apply_gamma(gamma).apply_contours(draw=False).calculate_area()
+            areas.append(max(area, 0.0))
+
+        areas = np.array(areas) + 1e-8
+        log_grad = np.log(areas[:-1]) - np.log(areas[1:])
+        drop_idx = int(np.argmax(log_grad))
+        if drop_idx == 0:
+            # Перепад может начинаться левее интервала
+            return None
+        for i in range(drop_idx + 1, len(log_grad)):
+            if abs(log_grad[i]) < self.stability_threshold:
+                self.tracked_updates += 1
+                return gammas[i + 1] + self.GAMMA_OFFSET
+        return None
+
+    def update(self, gray: np.ndarray) -> float:
+        """Гамма для очередного кадра"""
+        small = self._downsample(gray)
+
+        scene_changed = self._raw_gamma is None or self._is_scene_changed(small)
+        raw = None if scene_changed else self._bracket_search(small)
+        if raw is None:
+            raw = self._full_search(small)
+        self._raw_gamma = raw
+
+        if self.gamma is None or scene_changed:
+            self.gamma = raw
+        else:
+            self.gamma += self.smoothing * (raw - self.gamma)
+        return self.gamma
+
+
+def set_thread_affinity(native_id: Optional[int], cores) -> bool:
+    """
+    Привязка потока ОС к ядрам CPU (только Linux; на других ОС ничего не делает)
+
+    Args:
+        native_id: threading.get_native_id() потока
+        cores: Набор номеров ядер (None/пустой - без ограничений)
+    """
+    if native_id is None or not cores or not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        os.sched_setaffinity(native_id, set(cores))
+        return True
+    except OSError as e:
+        print(f"Error setting CPU affinity: {e}")
+    return False
+
+
+def plan_stream_affinity(streams: int) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """
+    Раздел доступных ядер между камерами: (ядра захвата, ядра обработки)
+    для каждой. Первое ядро остаётся GUI; у захвата своё ядро, чтобы
+    обработка одной камеры не вытесняла захват другой
+    """
+    if streams <= 0:
+        return []
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if len(cores) > streams + 1:
+        cores = cores[1:]
+
+    plan = []
+    share = max(1, len(cores) // streams)
+    for index in range(streams):
+        # Остаток ядер от деления достаётся последней камере
+        end = (index + 1) * share if index < streams - 1 else len(cores)
+        group = cores[index * share:end] or [cores[index % len(cores)]]
+        acquisition = tuple(group[:1])
+        processing = tuple(group[1:]) or acquisition
+        plan.append((acquisition, processing))
+    return plan
+
+
+def pin_thread(thread, cores):
+    """Ядра для потока камеры/обработчика; применяются сразу, если поток уже работает"""
+    thread.cpu_cores = tuple(cores) if cores else None
+    native_id = getattr(thread, 'native_id', None)
+    if native_id is not None and hasattr(os, 'sched_getaffinity'):
+        # Снятие привязки - все ядра, доступные процессу
+        set_thread_affinity(native_id, thread.cpu_cores or os.sched_getaffinity(0))
+
+
+@dataclass
+class BurstStats:
+    """Итоги серийной съёмки с усреднением"""
+    frames: int
+    capture_time: float  # с, от запроса до последнего кадра
+    noise_variance_single: float  # дисперсия шума одного кадра
+    noise_variance_averaged: float  # дисперсия шума усреднённого кадра
+
+    @property
+    def variance_reduction(self) -> float:
+        if self.noise_variance_averaged <= 0:
+            return 0.0
+        return self.noise_variance_single / self.noise_variance_averaged
+
+
+class FrameAverager:
+    '''Усреднение серии кадров в заранее выделенных буферах float32.
+     Чётные и нечётные кадры копятся раздельно: разность двух полусерий
+     даёт оценку остаточного шума без знания "истинного" кадра'''
+
+    def __init__(self):
+        self.count = 0
+        self._shape = None
+        self._halves = None
+        self._previous = None
+        self._work = None
+        self._result = None
+        self._single_variance = 0.0
+
+    def reset(self, shape: Tuple[int, int], dtype=np.uint8):
+        """Подготовка к новой серии; буферы пересоздаются только при смене размера или типа кадра"""
+        if shape != self._shape or self._result.dtype != dtype:
+            self._shape = shape
+            self._halves = (np.zeros(shape, np.float32), np.zeros(shape, np.float32))
+            self._previous = np.zeros(shape, np.float32)
+            self._work = np.zeros(shape, np.float32)
+            self._result = np.zeros(shape, dtype)
+        else:
+            self._halves[0].fill(0)
+            self._halves[1].fill(0)
+        self.count = 0
+        self._single_variance = 0.0
+
+    def add(self, gray: np.ndarray):
+        """Накопление кадра на месте (без выделения памяти)"""
+        cv.accumulate(gray, self._halves[self.count % 2])
+        if self.count == 1:
+            # Шум одного кадра: дисперсия разности двух соседних кадров пополам
+            cv.subtract(gray, self._previous, self._work, dtype=cv.CV_32F)
+            self._single_variance = float(cv.meanStdDev(self._work)[1][0, 0] ** 2) / 2
+        elif self.count == 0:
+            self._previous[...] = gray
+        self.count += 1
+
+    def average(self) -> np.ndarray:
+        """Усреднённый кадр в типе исходных кадров (копия, буферы остаются за усреднителем)"""
+        cv.add(self._halves[0], self._halves[1], self._work)
+        cv.multiply(self._work, 1.0 / max(self.count, 1), self._work)
+        cv.add(self._work, 0.5, self._work)
+        np.copyto(self._result, self._work, casting='unsafe')
+        return self._result.copy()
+
+    def single_noise_variance(self) -> float:
+        """Дисперсия шума одного кадра (по первым двум кадрам серии)"""
+        return self._single_variance
+
+    def averaged_noise_variance(self) -> float:
+        """Оценка дисперсии шума усреднённого кадра по разности полусерий"""
+        even, odd = (self.count + 1) // 2, self.count // 2
+        if odd == 0:
+            return self._single_variance
+        cv.addWeighted(self._halves[0], 1.0 / even, self._halves[1], -1.0 / odd, 0.0, self._work)
+        # D(A - B) = s^2 (1/even + 1/odd), у среднего по всей серии D = s^2 / count
+        difference_variance = float(cv.meanStdDev(self._work)[1][0, 0] ** 2)
+        return difference_variance / ((1.0 / even + 1.0 / odd) * self.count)
+
+
+class FrameChangeDetector:
+    '''Дешёвое определение неизменившихся кадров: средняя абсолютная разница
+     уменьшенного кадра с последним изменившимся кадром'''
+
+    def __init__(self, sensitivity: float = 1.5, size: Tuple[int, int] = (64, 48)):
+        # Порог средней разницы в уровнях яркости; 0 - детектор выключен
+        self.sensitivity = sensitivity
+        self.size = size
+        self.frames_total = 0
+        self.frames_static = 0
+        # Растёт на каждом изменившемся кадре; при reset() не сбрасывается
+        self.generation = 0
+        self._reference = None
+
+    def reset(self):
+        self.frames_total = 0
+        self.frames_static = 0
+        self._reference = None
+
+    def mark(self, image: 'Image'):
+        """Проставляет кадру is_static и номер изменения сцены"""
+        image.is_static = self.is_static(image.get_image())
+        image.change_generation = self.generation
+
+    def is_static(self, gray: np.ndarray) -> bool:
+        self.frames_total += 1
+        if self.sensitivity <= 0:
+            self.generation += 1
+            return False
+
+        small = cv.resize(gray, self.size, interpolation=cv.INTER_AREA)
+        # Порог задан в 8-битных уровнях
+        small = OpenCVToQtAdapter.to_8bit(small)
+        if self._reference is None or self._reference.shape != small.shape:
+            self._reference = small
+            self.generation += 1
+            return False
+
+        difference = cv.norm(small, self._reference, cv.NORM_L1) / small.size
+        if difference < self.sensitivity:
+            self.frames_static += 1
+            return True
+
+        # Сравниваем с последним изменившимся кадром, чтобы медленный дрейф накапливался
+        self._reference = small
+        self.generation += 1
+        return False
+
+
+class RunningAverage:
+    '''Экспоненциальное скользящее среднее. Пишет один поток, читать можно
+     из любого: значение - одно число с плавающей точкой'''
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.value = 0.0
+        self._initialized = False
+
+    def add(self, value: float):
+        if self._initialized:
+            self.value += self.alpha * (value - self.value)
+        else:
+            self.value = value
+            self._initialized = True
+
+    def reset(self):
+        self.value = 0.0
+        self._initialized = False
+
+
+class FrameRateMeter:
+    '''Частота кадров по сглаженному интервалу между отметками tick()'''
+
+    # Без кадров дольше этого времени частота считается нулевой
+    STALE_AFTER = 1.0
+
+    def __init__(self, alpha: float = 0.1):
+        self.frames = 0
+        self._interval = RunningAverage(alpha)
+        self._last = None
+
+    def tick(self, now: Optional[float] = None):
+        now = time.perf_counter() if now is None else now
+        if self._last is not None:
+            self._interval.add(now - self._last)
+        self._last = now
+        self.frames += 1
+
+    def fps(self) -> float:
+        last = self._last
+        interval = self._interval.value
+        if last is None or interval <= 0 or time.perf_counter() - last > self.STALE_AFTER:
+            return 0.0
+        return 1.0 / interval
+
+    def reset(self):
+        self.frames = 0
+        self._interval.reset()
+        self._last = None
+
+
+def register_camera_metrics(thread, camera: str):
+    """
+    Метрики потока захвата (при включённом реестре). Значения читаются из
+    acquisition_meter и dropped_frames в момент опроса, поток камеры не тратит
+    на них ничего
+    """
+    labels = {'camera': camera}
+    meter = thread.acquisition_meter
+    metrics.counter('camera_frames_total', 'Frames received from the camera',
+                    labels).set_function(lambda: meter.frames)
+    metrics.counter('camera_dropped_frames_total', 'Frames lost by the camera or transport',
+                    labels).set_function(lambda: thread.dropped_frames)
+    metrics.gauge('camera_fps', 'Smoothed acquisition frame rate', labels).set_function(meter.fps)
+
+
+class ImageLoadThread(QThread):
+    '''Фоновое декодирование файла в полном разрешении,
+     пока отображается быстрый уменьшенный предпросмотр'''
+
+    loaded = Signal(object)  # Image
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.image: Optional[Image] = None
+
+    def run(self):
+        try:
+            self.image = Image(self.path)
+        except Exception as e:
+            print(f"Ошибка загрузки изображения {self.path}: {e}")
+            return
+        self.loaded.emit(self.image)
+
+
+class ThumbnailThread(QThread):
+    '''Построение миниатюр вне GUI-потока. Запросы обслуживаются с конца:
+     последний запрошенный файл (текущий в диалоге) строится первым'''
+
+    ready = Signal(str, object)  # путь, миниатюра (np.ndarray или None)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.running = False
+        self._pending: List[str] = []
+        self._condition = threading.Condition()
+
+    def request(self, path: str):
+        with self._condition:
+            if path in self._pending:
+                self._pending.remove(path)
+            self._pending.append(path)
+            self._condition.notify()
+
+    def run(self):
+        self.running = True
+        while self.running:
+            with self._condition:
+                while not self._pending and self.running:
+                    self._condition.wait(0.1)
+                path = self._pending.pop() if self._pending else None
+            if path is None:
+                continue
+            try:
+                thumbnail = thumbnail_cache.get(path)
+            except Exception as e:
+                print(f"Ошибка построения миниатюры {path}: {e}")
+                thumbnail = None
+            self.ready.emit(path, thumbnail)
+
+    def stop(self):
+        self.running = False
+        with self._condition:
+            self._condition.notify()
+        self.wait()
+
+
 class VideoThread(QThread):
     frame_ready = Signal(Image)
+    snapshot_ready = Signal(Image)
 
     def __init__(self, video_source=0):
         super().__init__()
         self.video_source = video_source
         self.running = False
+        self.last_frame = None
+        self._paused = False
+        self._mutex = QMutex()
+        self.change_detector = FrameChangeDetector()
+        # Частота захвата; веб-камера не сообщает о потерянных кадрах
+        self.acquisition_meter = FrameRateMeter()
+        self.dropped_frames = 0
+        self._roi = None
+        self._last_offset = (0, 0)
+        self._full_size = None
+        self._snapshot_requested = False
+        # Привязка к ядрам и глубина буфера драйвера (None - по умолчанию)
+        self.cpu_cores = None
+        self.native_id = None
+        self.num_buffers = None
+
+    def set_change_sensitivity(self, sensitivity: float):
+        """Порог детектора неизменившихся кадров (0 - выключить)"""
+        self.change_detector.sensitivity = sensitivity
+
+    def set_analysis_roi(self, x: int, y: int, width: int, height: int) -> bool:
+        """ROI анализа в координатах полного кадра (у веб-камер только программный)"""
+        self._roi = (int(x), int(y), int(width), int(height))
+        return True
+
+    def clear_analysis_roi(self) -> bool:
+        self._roi = None
+        return True
+
+    def set_preview_binning(self, factor: int) -> bool:
+        """У веб-камер биннинг недоступен"""
+        return factor <= 1
+
+    def request_snapshot(self):
+        """Следующий кадр будет выдан через snapshot_ready (в т.ч. на стоп-кадре)"""
+        self._snapshot_requested = True
 
     def run(self):
+        self.native_id = threading.get_native_id()
+        set_thread_affinity(self.native_id, self.cpu_cores)
+        register_camera_metrics(self, f'webcam{self.video_source}')
         cap = cv2.VideoCapture(self.video_source)
         self.cap = cap
         if not cap.isOpened():
             raise RuntimeError('Cannot open video source')
+        if self.num_buffers:
+            cap.set(cv.CAP_PROP_BUFFERSIZE, self.num_buffers)
         self.running = True
         while self.running:
+            if self._paused and not self._snapshot_requested:
+                # Захват продолжается (буфер драйвера не устаревает), кадры не декодируются
+                if not cap.grab():
+                    print("can't read video source frame")
+                    break
+                continue
+
             ret, frame = cap.read()
             if ret:
+                timestamp = time.perf_counter()
+                self.acquisition_meter.tick(timestamp)
                 gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-                image = Image('', gray)
+                image = Image('', gray, timestamp=timestamp)
+                self._full_size = image.get_full_size()
+                if self._roi is not None:
+                    image = image.crop(*self._roi)
+                with QMutexLocker(self._mutex):
+                    self.last_frame = image.get_image()
+                    self._last_offset = image.offset
+                if self._snapshot_requested:
+                    self._snapshot_requested = False
+                    self.snapshot_ready.emit(image)
+                    if self._paused:
+                        continue
+                self.change_detector.mark(image)
                 self.frame_ready.emit(image)
             else:
                 print("can't read video source frame")
                 break
-        ret, frame = self.cap.read()
-        if ret:
-            gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-            self.last_image = Image('', gray)
         cap.release()
+        self.native_id = None
 
-    def stop(self):
+    def pause(self):
+        """Стоп-кадр без остановки захвата"""
+        self._paused = True
+
+    def resume(self):
+        """Возобновление выдачи кадров"""
+        self._paused = False
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+    def get_last_image(self) -> Optional[Image]:
+        """Последний кадр без остановки потока"""
+        with QMutexLocker(self._mutex):
+            last = self.last_frame
+            offset = self._last_offset
+        if last is not None:
+            image = Image('', last)
+            image.offset = offset
+            image.full_size = self._full_size
+            return image
+        return None
+
+    def stop(self) -> Optional[Image]:
         self.running = False
         self.wait()
-        last_image = self.last_image
-        self.last_image = None
+        last_image = self.get_last_image()
+        with QMutexLocker(self._mutex):
+            self.last_frame = None
         return last_image
 
 
+def camera_command(requires_restart: bool = False, invalidates: Tuple[str, ...] = (), collapse: bool = True):
+    '''Декоратор сеттеров HikrobotThread: вызов из другого потока во время захвата
+     ставится в очередь и выполняется потоком захвата между fetch.
+     invalidates - узлы, описания которых устаревают после команды;
+     collapse=False - действие (не сеттер): каждый вызов выполняется'''
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._should_queue():
+                self._commands.put((method, args, kwargs, requires_restart, invalidates, collapse))
+                # На стоп-кадре поток захвата спит до 0.5 с - будим, чтобы команда не ждала
+                self._wake.set()
+                return True
+            result = method(self, *args, **kwargs)
+            if result and invalidates:
+                self.invalidate_node_table(invalidates)
+            return result
+
+        wrapper.requires_restart = requires_restart
+        return wrapper
+
+    return decorator
+
+
+# Узлы GenICam, которые использует HikrobotThread
+CAMERA_NODES = (
+    'PixelFormat', 'AcquisitionMode',
+    'ExposureAuto', 'ExposureTime',
+    'GainAuto', 'Gain',
+    'AcquisitionFrameRateEnable', 'AcquisitionFrameRate', 'ResultingFrameRate',
+    'Width', 'Height', 'OffsetX', 'OffsetY',
+    'BalanceWhiteAuto', 'GammaEnable', 'Gamma',
+    'TriggerMode', 'TriggerSource', 'TriggerSoftware',
+    'BinningHorizontal', 'BinningVertical', 'DecimationHorizontal', 'DecimationVertical',
+)
+
+
+@dataclass
+class NodeDescriptor:
+    """Закэшированное описание узла GenICam"""
+    name: str
+    available: bool = False
+    kind: str = ''  # 'float', 'int', 'bool', 'enum', 'command', 'string'
+    readable: bool = False
+    writable: bool = False
+    min: Optional[float] = None
+    max: Optional[float] = None
+    inc: Optional[float] = None
+    entries: Tuple[str, ...] = ()
+    node: object = None
+
+    @classmethod
+    def introspect(cls, node_map, name: str) -> 'NodeDescriptor':
+        """Однократный опрос узла через GenApi"""
+        try:
+            if not hasattr(node_map, name):
+                return cls(name)
+            node = getattr(node_map, name)
+
+            try:
+                access = node.get_access_mode()
+                if access in (EAccessMode.NI, EAccessMode.NA):
+                    return cls(name)
+                readable = access in (EAccessMode.RO, EAccessMode.RW)
+                writable = access in (EAccessMode.WO, EAccessMode.RW)
+            except Exception:
+                readable, writable = True, True
+
+            descriptor = cls(name, available=True, readable=readable, writable=writable, node=node)
+
+            if hasattr(node, 'symbolics'):
+                descriptor.kind = 'enum'
+                descriptor.entries = tuple(node.symbolics)
+            elif hasattr(node, 'execute'):
+                descriptor.kind = 'command'
+            elif readable:
+                value = node.value
+                if isinstance(value, bool):
+                    descriptor.kind = 'bool'
+                elif isinstance(value, int):
+                    descriptor.kind = 'int'
+                elif isinstance(value, float):
+                    descriptor.kind = 'float'
+                else:
+                    descriptor.kind = 'string'
+
+            if descriptor.kind in ('int', 'float'):
+                for attr in ('min', 'max', 'inc'):
+                    try:
+                        setattr(descriptor, attr, getattr(node, attr))
+                    except Exception:
+                        pass
+
+            return descriptor
+        except Exception as e:
+            print(f"Error reading node {name}: {e}")
+            return cls(name)
+
+
+DEFAULT_CTI_FILE = '/opt/MVS/lib/64/MvProducerU3V.cti'
+
+
+class HarvesterSession:
+    '''Долгоживущий Harvester для одного CTI файла.
+     GenTL Producer загружается один раз, список устройств кэшируется,
+     а ImageAcquirer переживает перезапуски потока камеры'''
+
+    _sessions: Dict[str, 'HarvesterSession'] = {}
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, cti_file: str):
+        self.cti_file = cti_file
+        self.harvester = None
+        self._devices: Optional[List[str]] = None
+        # id устройства -> ImageAcquirer; индексы списка меняются при обновлении
+        self._acquirers: Dict[str, object] = {}
+        # Устройства, ImageAcquirer которых сейчас у потоков камер
+        self._held = set()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def get(cls, cti_file: Optional[str] = None) -> 'HarvesterSession':
+        """Общая сессия для CTI файла (создаётся при первом обращении)"""
+        cti_file = cti_file or DEFAULT_CTI_FILE
+        with cls._sessions_lock:
+            session = cls._sessions.get(cti_file)
+            if session is None:
+                session = cls(cti_file)
+                cls._sessions[cti_file] = session
+            return session
+
+    @classmethod
+    def reset_all(cls):
+        """Освобождение всех сессий (при закрытии приложения)"""
+        with cls._sessions_lock:
+            sessions = list(cls._sessions.values())
+            cls._sessions.clear()
+        for session in sessions:
+            session.reset()
+
+    def _ensure_loaded(self):
+        if self.harvester is None:
+            harvester = Harvester()
+            harvester.add_file(self.cti_file)
+            harvester.update()
+            self.harvester = harvester
+
+    def get_devices(self, refresh: bool = False) -> List[str]:
+        """Список устройств из кэша; refresh=True заново опрашивает producer"""
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                if refresh:
+                    self._refresh()
+
+                if self._devices is None:
+                    devices = []
+                    for i, device_info in enumerate(self.harvester.device_info_list):
+                        device_str = f"Index {i}: {getattr(device_info, 'vendor', 'Unknown')} {getattr(device_info, 'model', 'Unknown')} (SN: {getattr(device_info, 'serial_number', 'Unknown')})"
+                        devices.append(device_str)
+                    self._devices = devices
+
+                return list(self._devices)
+
+            except Exception as e:
+                print(f"Error getting devices: {e}")
+                return []
+
+    def _refresh(self):
+        """Повторный опрос producer. harvester.update() делает все ImageAcquirer
+        недействительными, поэтому при работающих камерах список не обновляется"""
+        if self._held:
+            print("Device list is not refreshed while cameras of this CTI file are running")
+            return
+        self._destroy_acquirers()
+        self.harvester.update()
+        self._devices = None
+
+    def _device_key(self, camera_index: int) -> str:
+        info = self.harvester.device_info_list[camera_index]
+        key = getattr(info, 'id_', None) or getattr(info, 'serial_number', None)
+        return str(key) if key else f'index {camera_index}'
+
+    def in_use(self, camera_index: int) -> bool:
+        """Устройство уже захвачено потоком камеры"""
+        with self._lock:
+            if self.harvester is None or camera_index >= len(self.harvester.device_info_list):
+                return False
+            return self._device_key(camera_index) in self._held
+
+    def acquire(self, camera_index: int):
+        """ImageAcquirer для устройства (переиспользуется между запусками).
+        Один ImageAcquirer не может обслуживать два потока: fetch/stop из разных
+        потоков ломают захват, поэтому занятое устройство не выдаётся"""
+        with self._lock:
+            self._ensure_loaded()
+            key = self._device_key(camera_index)
+            if key in self._held:
+                raise RuntimeError(f'Camera {camera_index} is already in use')
+            ia = self._acquirers.get(key)
+            if ia is None:
+                ia = self.harvester.create(camera_index)
+                self._acquirers[key] = ia
+            self._held.add(key)
+            return ia
+
+    def release(self, ia):
+        """Останавливает захват, но не уничтожает ImageAcquirer"""
+        try:
+            if ia.is_acquiring():
+                ia.stop()
+        except Exception as e:
+            print(f"Camera error in cleanup: {e}")
+        with self._lock:
+            for key, acquirer in self._acquirers.items():
+                if acquirer is ia:
+                    self._held.discard(key)
+
+    def _destroy_acquirers(self):
+        for ia in self._acquirers.values():
+            try:
+                ia.stop()
+                ia.destroy()
+            except Exception as e:
+                print(f"Camera error in cleanup: {e}")
+        self._acquirers.clear()
+        self._held.clear()
+
+    def reset(self):
+        """Полное освобождение устройств и producer"""
+        with self._lock:
+            self._destroy_acquirers()
+            self._devices = None
+
+            if self.harvester:
+                try:
+                    self.harvester.reset()
+                except Exception as e:
+                    print(f"Error cleaning up harvester: {e}")
+                self.harvester = None
+
+
 class HikrobotThread(QThread):
     frame_ready = Signal(object)
+    snapshot_ready = Signal(object)  # Image полного разрешения
+    burst_ready = Signal(object, object)  # усреднённый Image, BurstStats
+    burst_failed = Signal(str)  # серия не снята (таймаут или ошибка)
     error_occurred = Signal(str)
     params_changed = Signal(object)  # CameraParams
 
-    def __init__(self, cti_file: Optional[str] = None, camera_index: int = 0):
+    # Таймаут fetch определяет задержку реакции на stop()/pause()
+    FETCH_TIMEOUT = 0.05  # с
+    STOP_TIMEOUT_MS = 100
+    # Ожидание кадра по программному триггеру (сверх времени экспозиции)
+    SNAPSHOT_TIMEOUT = 2.0  # с
+    # Форматы высокой разрядности в порядке предпочтения
+    HIGH_BIT_DEPTH_FORMATS = ('Mono16', 'Mono12', 'Mono10')
+
+    def __init__(self, cti_file: Optional[str] = None, camera_index: int = 0, bit_depth: int = 8):
         super().__init__()
         self.cti_file = cti_file
         self.camera_index = camera_index
+        # 8 - Mono8, больше 8 - Mono10/12/16 (кадры uint16)
+        self.bit_depth = bit_depth
         self.running = False
-        self.harvester = None
+        self.session = None
         self.ia = None
         self.last_frame = None
+        self._paused = False
+        self._stop_acquisition_on_pause = True
+        self._wake = threading.Event()
+        self._commands = queue.Queue()
+        self._acquisition_thread_id = None
+        self._node_table: Dict[str, NodeDescriptor] = {}
+        # node_map, для которого собрана таблица (сбрасывается при смене устройства)
+        self._node_table_map = None
+        self._pixel_format = ''
+        self.change_detector = FrameChangeDetector()
+        # Программная часть ROI (относительно кадра, пришедшего с камеры)
+        self._software_roi = None
+        # ROI анализа в координатах сенсора без биннинга (переустанавливается при смене биннинга)
+        self._analysis_roi = None
+        self._full_size = None
+        # Частота захвата и потерянные кадры (по пропускам frame_id буферов)
+        self.acquisition_meter = FrameRateMeter()
+        self.dropped_frames = 0
+        self._last_frame_id = None
+        # Смещение часов камеры относительно perf_counter (минимум по кадрам)
+        self._clock_offset = None
+        self._last_offset = (0, 0)
+        self._snapshot_requested = threading.Event()
+        self._burst_requests = queue.Queue()
+        self.averager = FrameAverager()
+        # Привязка к ядрам и собственный пул буферов harvesters (None - по умолчанию)
+        self.cpu_cores = None
+        self.native_id = None
+        self.num_buffers = None
         self._mutex = QMutex()
         self._params = CameraParams()
         self._node_map = None
 
     @staticmethod
-    def get_devices(cti_file: Optional[str] = None) -> List[str]:
+    def get_devices(cti_file: Optional[str] = None, refresh: bool = False) -> List[str]:
         """
         Возвращает список доступных устройств в виде строк
 
         Args:
             cti_file: Путь к CTI файлу
+            refresh: Повторно опросить GenTL Producer вместо кэша
 
         Returns:
             List[str]: Список строк с описанием устройств
         """
-        harvester = None
-        try:
-            harvester = Harvester()
+        return HarvesterSession.get(cti_file).get_devices(refresh=refresh)
 
-            if cti_file:
-                harvester.add_file(cti_file)
-            else:
-                harvester.add_file('/opt/mvIMPACT_Acquire/lib/x86_64/mvGenTLProducer.cti')
+    # ==================== Таблица узлов GenICam ====================
 
-            harvester.update()
-
-            devices = []
-            for i, device_info in enumerate(harvester.device_info_list):
-                device_str = f"Index {i}: {getattr(device_info, 'vendor', 'Unknown')} {getattr(device_info, 'model', 'Unknown')} (SN: {getattr(device_info, 'serial_number', 'Unknown')})"
-                devices.append(device_str)
+    def _node(self, name: str) -> Optional[NodeDescriptor]:
+        """Описание узла из таблицы (None, если узел недоступен)"""
+        if not self._node_map:
+            return None
+        if self._node_table_map is not self._node_map:
+            self.invalidate_node_table()
+
+        descriptor = self._node_table.get(name)
+        if descriptor is None:
+            descriptor = NodeDescriptor.introspect(self._node_map, name)
+            self._node_table[name] = descriptor
+        return descriptor if descriptor.available else None
+
+    def _build_node_table(self):
+        """Однократный опрос всех используемых узлов (после настройки камеры)"""
+        self._node_table = {
+            name: NodeDescriptor.introspect(self._node_map, name) for name in CAMERA_NODES
+        }
+        self._node_table_map = self._node_map
+
+    def invalidate_node_table(self, names: Optional[Tuple[str, ...]] = None):
+        """Сброс описаний узлов (всех или указанных), они будут опрошены заново"""
+        if names is None:
+            self._node_table = {}
+            self._node_table_map = self._node_map
+            return
+        for name in names:
+            self._node_table.pop(name, None)
+
+    def get_node_table(self) -> Dict[str, NodeDescriptor]:
+        """Копия таблицы описаний узлов"""
+        return dict(self._node_table)
+
+    def _read(self, name: str, default=None):
+        node = self._node(name)
+        if node is None or not node.readable:
+            return default
+        return node.node.value
+
+    def _write(self, name: str, value) -> bool:
+        node = self._node(name)
+        if node is None:
+            return False
+        if not node.writable:
+            # Доступ мог измениться (например, после выключения Auto режима)
+            self.invalidate_node_table((name,))
+            node = self._node(name)
+            if node is None or not node.writable:
+                return False
+        node.node.value = value
+        return True
+
+    def _execute(self, name: str) -> bool:
+        node = self._node(name)
+        if node is None or node.kind != 'command':
+            return False
+        node.node.execute()
+        return True
 
-            return devices
+    def _has(self, name: str) -> bool:
+        return self._node(name) is not None
 
-        except Exception as e:
-            print(f"Error getting devices: {e}")
-            return []
+    def _can_read_device(self) -> bool:
+        """Чтение с устройства только из потока захвата или при остановленном потоке"""
+        return bool(self._node_map) and not self._should_queue()
 
-        finally:
-            if harvester:
-                try:
-                    harvester.reset()
-                except Exception as e:
-                    print(f"Error cleaning up harvester: {e}")
     # ==================== Формат Пикселей и режим захвата ====================
+    @camera_command(requires_restart=True)
     def set_pixel_format(self, format_name: str = 'Mono8') -> bool:
         """
         Установка формата пикселей
@@ -269,52 +1419,64 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            if hasattr(self._node_map, 'PixelFormat'):
-                if hasattr(self._node_map.PixelFormat, 'symbolics'):
-                    available = self._node_map.PixelFormat.symbolics
-
-                    # Пробуем установить указанный формат
-                    if format_name in available:
-                        self._node_map.PixelFormat.value = format_name
-                        print(f"  Pixel format: {format_name}")
-                        return True
-
-                    # Fallback: если Mono8 недоступен, пробуем BayerRG8
-                    if format_name == 'Mono8' and 'BayerRG8' in available:
-                        self._node_map.PixelFormat.value = 'BayerRG8'
-                        print(f"  Pixel format: BayerRG8 (Mono8 not available)")
-                        return True
+            node = self._node('PixelFormat')
+            if node is not None and node.kind == 'enum':
+                available = node.entries
+
+                # Пробуем установить указанный формат
+                if format_name in available:
+                    if not self._write('PixelFormat', format_name):
+                        print(f"  Warning: Pixel format {format_name} is not writable")
+                        return False
+                    self._pixel_format = format_name
+                    print(f"  Pixel format: {format_name}")
+                    return True
+
+                # Fallback: если Mono8 недоступен, пробуем BayerRG8
+                if format_name == 'Mono8' and 'BayerRG8' in available:
+                    if not self._write('PixelFormat', 'BayerRG8'):
+                        print(f"  Warning: Pixel format BayerRG8 is not writable")
+                        return False
+                    self._pixel_format = 'BayerRG8'
+                    print(f"  Pixel format: BayerRG8 (Mono8 not available)")
+                    return True
 
             print(f"  Warning: Pixel format {format_name} not available")
         except Exception as e:
             print(f"Error setting pixel format: {e}")
         return False
 
+    @camera_command(requires_restart=True)
+    def set_bit_depth(self, bits: int) -> bool:
+        """8 бит (Mono8) или наибольшая доступная разрядность Mono10/12/16"""
+        self.bit_depth = bits
+        if bits > 8:
+            available = self.get_available_pixel_formats()
+            for format_name in self.HIGH_BIT_DEPTH_FORMATS:
+                if format_name in available:
+                    return self.set_pixel_format(format_name)
+            print("  Warning: No high bit depth mono format, using Mono8")
+            self.bit_depth = 8
+        return self.set_pixel_format('Mono8')
+
     def get_pixel_format(self) -> str:
         """Получение текущего формата пикселей"""
-        if not self._node_map:
-            return ''
+        if not self._can_read_device():
+            return self._pixel_format
 
         try:
-            if hasattr(self._node_map, 'PixelFormat'):
-                return str(self._node_map.PixelFormat.value)
+            self._pixel_format = str(self._read('PixelFormat', ''))
+            return self._pixel_format
         except Exception as e:
             print(f"Error getting pixel format: {e}")
         return ''
 
     def get_available_pixel_formats(self) -> List[str]:
         """Получение списка доступных форматов пикселей"""
-        if not self._node_map:
-            return []
-
-        try:
-            if hasattr(self._node_map, 'PixelFormat'):
-                if hasattr(self._node_map.PixelFormat, 'symbolics'):
-                    return list(self._node_map.PixelFormat.symbolics)
-        except Exception as e:
-            print(f"Error getting available pixel formats: {e}")
-        return []
+        node = self._node('PixelFormat')
+        return list(node.entries) if node is not None else []
 
+    @camera_command(requires_restart=True)
     def set_acquisition_mode(self, mode: str = 'Continuous') -> bool:
         """
         Установка режима захвата
@@ -326,8 +1488,7 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            if hasattr(self._node_map, 'AcquisitionMode'):
-                self._node_map.AcquisitionMode.value = mode
+            if self._write('AcquisitionMode', mode):
                 print(f"  Acquisition mode: {mode}")
                 return True
         except Exception as e:
@@ -336,31 +1497,23 @@ class HikrobotThread(QThread):
 
     def get_acquisition_mode(self) -> str:
         """Получение текущего режима захвата"""
-        if not self._node_map:
+        if not self._can_read_device():
             return ''
 
         try:
-            if hasattr(self._node_map, 'AcquisitionMode'):
-                return str(self._node_map.AcquisitionMode.value)
+            return str(self._read('AcquisitionMode', ''))
         except Exception as e:
             print(f"Error getting acquisition mode: {e}")
         return ''
 
     def get_available_acquisition_modes(self) -> List[str]:
         """Получение списка доступных режимов захвата"""
-        if not self._node_map:
-            return []
-
-        try:
-            if hasattr(self._node_map, 'AcquisitionMode'):
-                if hasattr(self._node_map.AcquisitionMode, 'symbolics'):
-                    return list(self._node_map.AcquisitionMode.symbolics)
-        except Exception as e:
-            print(f"Error getting available acquisition modes: {e}")
-        return []
+        node = self._node('AcquisitionMode')
+        return list(node.entries) if node is not None else []
 
     # ==================== Параметры экспозиции ====================
 
+    @camera_command(invalidates=('ExposureTime', 'AcquisitionFrameRate', 'ResultingFrameRate'))
     def set_exposure(self, exposure_us: float) -> bool:
         """
         Установка времени экспозиции
@@ -376,11 +1529,9 @@ class HikrobotThread(QThread):
 
         try:
             # Отключаем автоэкспозицию
-            if hasattr(self._node_map, 'ExposureAuto'):
-                self._node_map.ExposureAuto.value = 'Off'
+            self._write('ExposureAuto', 'Off')
 
-            if hasattr(self._node_map, 'ExposureTime'):
-                self._node_map.ExposureTime.value = float(exposure_us)
+            if self._write('ExposureTime', float(exposure_us)):
                 self._params.exposure = exposure_us
                 self._params.auto_exposure = False
                 return True
@@ -390,12 +1541,12 @@ class HikrobotThread(QThread):
 
     def get_exposure(self) -> float:
         """Получение текущего времени экспозиции в мкс"""
-        if not self._node_map:
-            return 0.0
+        if not self._can_read_device():
+            return self._params.exposure
 
         try:
-            if hasattr(self._node_map, 'ExposureTime'):
-                self._params.exposure = self._node_map.ExposureTime.value
+            if self._has('ExposureTime'):
+                self._params.exposure = self._read('ExposureTime', 0.0)
                 return self._params.exposure
         except Exception as e:
             print(f"Error getting exposure: {e}")
@@ -403,17 +1554,9 @@ class HikrobotThread(QThread):
 
     def get_exposure_range(self) -> Tuple[float, float]:
         """Получение диапазона экспозиции (min, max) в мкс"""
-        if not self._node_map:
-            return (0.0, 0.0)
-
-        try:
-            if hasattr(self._node_map, 'ExposureTime'):
-                node = self._node_map.ExposureTime
-                return (node.min, node.max)
-        except Exception as e:
-            print(f"Error getting exposure range: {e}")
-        return (0.0, 0.0)
+        return self._node_range('ExposureTime')
 
+    @camera_command(invalidates=('ExposureTime',))
     def set_auto_exposure(self, enable: bool, mode: str = 'continuous') -> bool:
         """
         Включение/выключение автоэкспозиции
@@ -426,14 +1569,7 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            if hasattr(self._node_map, 'ExposureAuto'):
-                if not enable:
-                    self._node_map.ExposureAuto.value = 'Off'
-                elif mode == 'once':
-                    self._node_map.ExposureAuto.value = 'Once'
-                else:
-                    self._node_map.ExposureAuto.value = 'Continuous'
-
+            if self._write('ExposureAuto', self._auto_mode_value(enable, mode)):
                 self._params.auto_exposure = enable
                 return True
         except Exception as e:
@@ -442,6 +1578,7 @@ class HikrobotThread(QThread):
 
     # ==================== Параметры усиления ====================
 
+    @camera_command(invalidates=('Gain',))
     def set_gain(self, gain_db: float) -> bool:
         """
         Установка усиления
@@ -454,11 +1591,9 @@ class HikrobotThread(QThread):
 
         try:
             # Отключаем автоусиление
-            if hasattr(self._node_map, 'GainAuto'):
-                self._node_map.GainAuto.value = 'Off'
+            self._write('GainAuto', 'Off')
 
-            if hasattr(self._node_map, 'Gain'):
-                self._node_map.Gain.value = float(gain_db)
+            if self._write('Gain', float(gain_db)):
                 self._params.gain = gain_db
                 self._params.auto_gain = False
                 return True
@@ -468,12 +1603,12 @@ class HikrobotThread(QThread):
 
     def get_gain(self) -> float:
         """Получение текущего усиления в дБ"""
-        if not self._node_map:
-            return 0.0
+        if not self._can_read_device():
+            return self._params.gain
 
         try:
-            if hasattr(self._node_map, 'Gain'):
-                self._params.gain = self._node_map.Gain.value
+            if self._has('Gain'):
+                self._params.gain = self._read('Gain', 0.0)
                 return self._params.gain
         except Exception as e:
             print(f"Error getting gain: {e}")
@@ -481,31 +1616,16 @@ class HikrobotThread(QThread):
 
     def get_gain_range(self) -> Tuple[float, float]:
         """Получение диапазона усиления (min, max) в дБ"""
-        if not self._node_map:
-            return (0.0, 0.0)
-
-        try:
-            if hasattr(self._node_map, 'Gain'):
-                node = self._node_map.Gain
-                return (node.min, node.max)
-        except Exception as e:
-            print(f"Error getting gain range: {e}")
-        return (0.0, 0.0)
+        return self._node_range('Gain')
 
+    @camera_command(invalidates=('Gain',))
     def set_auto_gain(self, enable: bool, mode: str = 'continuous') -> bool:
         """Включение/выключение автоусиления"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'GainAuto'):
-                if not enable:
-                    self._node_map.GainAuto.value = 'Off'
-                elif mode == 'once':
-                    self._node_map.GainAuto.value = 'Once'
-                else:
-                    self._node_map.GainAuto.value = 'Continuous'
-
+            if self._write('GainAuto', self._auto_mode_value(enable, mode)):
                 self._params.auto_gain = enable
                 return True
         except Exception as e:
@@ -514,6 +1634,7 @@ class HikrobotThread(QThread):
 
     # ==================== Частота кадров ====================
 
+    @camera_command(invalidates=('AcquisitionFrameRate', 'ResultingFrameRate'))
     def set_frame_rate(self, fps: float) -> bool:
         """Установка частоты кадров"""
         if not self._node_map:
@@ -521,11 +1642,9 @@ class HikrobotThread(QThread):
 
         try:
             # Включаем управление частотой кадров
-            if hasattr(self._node_map, 'AcquisitionFrameRateEnable'):
-                self._node_map.AcquisitionFrameRateEnable.value = True
+            self._write('AcquisitionFrameRateEnable', True)
 
-            if hasattr(self._node_map, 'AcquisitionFrameRate'):
-                self._node_map.AcquisitionFrameRate.value = float(fps)
+            if self._write('AcquisitionFrameRate', float(fps)):
                 self._params.frame_rate = fps
                 return True
         except Exception as e:
@@ -534,42 +1653,33 @@ class HikrobotThread(QThread):
 
     def get_frame_rate(self) -> float:
         """Получение текущей частоты кадров"""
-        if not self._node_map:
-            return 0.0
+        if not self._can_read_device():
+            return self._params.frame_rate
 
         try:
             # ResultingFrameRate - реальная частота кадров
-            if hasattr(self._node_map, 'ResultingFrameRate'):
-                return self._node_map.ResultingFrameRate.value
-            elif hasattr(self._node_map, 'AcquisitionFrameRate'):
-                return self._node_map.AcquisitionFrameRate.value
+            if self._has('ResultingFrameRate'):
+                return self._read('ResultingFrameRate', 0.0)
+            elif self._has('AcquisitionFrameRate'):
+                return self._read('AcquisitionFrameRate', 0.0)
         except Exception as e:
             print(f"Error getting frame rate: {e}")
         return 0.0
 
     def get_frame_rate_range(self) -> Tuple[float, float]:
         """Получение диапазона частоты кадров"""
-        if not self._node_map:
-            return (0.0, 0.0)
-
-        try:
-            if hasattr(self._node_map, 'AcquisitionFrameRate'):
-                node = self._node_map.AcquisitionFrameRate
-                return (node.min, node.max)
-        except Exception as e:
-            print(f"Error getting frame rate range: {e}")
-        return (0.0, 0.0)
+        return self._node_range('AcquisitionFrameRate')
 
     # ==================== Разрешение и ROI ====================
 
     def get_resolution(self) -> Tuple[int, int]:
         """Получение текущего разрешения (width, height)"""
-        if not self._node_map:
-            return (0, 0)
+        if not self._can_read_device():
+            return (self._params.width, self._params.height)
 
         try:
-            width = self._node_map.Width.value if hasattr(self._node_map, 'Width') else 0
-            height = self._node_map.Height.value if hasattr(self._node_map, 'Height') else 0
+            width = self._read('Width', 0)
+            height = self._read('Height', 0)
 
             self._params.width = width
             self._params.height = height
@@ -581,17 +1691,12 @@ class HikrobotThread(QThread):
 
     def get_max_resolution(self) -> Tuple[int, int]:
         """Получение максимального разрешения"""
-        if not self._node_map:
-            return (0, 0)
-
-        try:
-            width = self._node_map.Width.max if hasattr(self._node_map, 'Width') else 0
-            height = self._node_map.Height.max if hasattr(self._node_map, 'Height') else 0
-            return (width, height)
-        except Exception as e:
-            print(f"Error getting max resolution: {e}")
-        return (0, 0)
+        width = self._node('Width')
+        height = self._node('Height')
+        return (int(width.max) if width is not None and width.max is not None else 0,
+                int(height.max) if height is not None and height.max is not None else 0)
 
+    @camera_command(requires_restart=True)
     def set_resolution(self, width: int, height: int) -> bool:
         """
         Установка разрешения
@@ -602,19 +1707,17 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            was_running = self.running
-            if was_running and self.ia:
+            was_running = self.running and self.ia is not None and self.ia.is_acquiring()
+            if was_running:
                 self.ia.stop()
 
-            if hasattr(self._node_map, 'Width'):
-                self._node_map.Width.value = width
-            if hasattr(self._node_map, 'Height'):
-                self._node_map.Height.value = height
+            self._write('Width', width)
+            self._write('Height', height)
 
             self._params.width = width
             self._params.height = height
 
-            if was_running and self.ia:
+            if was_running:
                 self.ia.start()
 
             return True
@@ -622,6 +1725,7 @@ class HikrobotThread(QThread):
             print(f"Error setting resolution: {e}")
         return False
 
+    @camera_command(requires_restart=True)
     def set_roi(self, x: int, y: int, width: int, height: int) -> bool:
         """
         Установка области интереса (ROI)
@@ -636,41 +1740,276 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            was_running = self.running
-            if was_running and self.ia:
+            was_running = self.running and self.ia is not None and self.ia.is_acquiring()
+            if was_running:
                 self.ia.stop()
 
             # Сначала сбрасываем смещения
-            if hasattr(self._node_map, 'OffsetX'):
-                self._node_map.OffsetX.value = 0
-            if hasattr(self._node_map, 'OffsetY'):
-                self._node_map.OffsetY.value = 0
-
-            # Устанавливаем размеры
-            if hasattr(self._node_map, 'Width'):
-                self._node_map.Width.value = width
-            if hasattr(self._node_map, 'Height'):
-                self._node_map.Height.value = height
-
-            # Устанавливаем смещения
-            if hasattr(self._node_map, 'OffsetX'):
-                self._node_map.OffsetX.value = x
-            if hasattr(self._node_map, 'OffsetY'):
-                self._node_map.OffsetY.value = y
-
-            self._params.width = width
-            self._params.height = height
-            self._params.offset_x = x
-            self._params.offset_y = y
+            self._write('OffsetX', 0)
+            self._write('OffsetY', 0)
+
+            # Устанавливаем размеры (диапазоны Width/Height зависят от смещений)
+            self.invalidate_node_table(('Width', 'Height'))
+            applied = self._write('Width', width)
+            applied = self._write('Height', height) and applied
+
+            # Устанавливаем смещения (нулевые допустимы и без узлов Offset)
+            self.invalidate_node_table(('OffsetX', 'OffsetY'))
+            applied = (self._write('OffsetX', x) or x == 0) and applied
+            applied = (self._write('OffsetY', y) or y == 0) and applied
+
+            if applied:
+                self._params.width = width
+                self._params.height = height
+                self._params.offset_x = x
+                self._params.offset_y = y
+            else:
+                self._refresh_roi_params()
 
-            if was_running and self.ia:
+            if was_running:
                 self.ia.start()
 
-            return True
+            return applied
         except Exception as e:
             print(f"Error setting ROI: {e}")
         return False
 
+    def _refresh_roi_params(self):
+        """Фактические размеры и смещения после неудачной записи ROI"""
+        self._params.width = self._read('Width', 0)
+        self._params.height = self._read('Height', 0)
+        self._params.offset_x = self._read('OffsetX', 0)
+        self._params.offset_y = self._read('OffsetY', 0)
+
+    def _align_roi(self, x: int, y: int, width: int, height: int) -> Tuple[int, int, int, int]:
+        """Аппаратный ROI, покрывающий заданный, с учётом шагов и пределов узлов"""
+        max_w, max_h = self.get_max_resolution()
+
+        def step(name):
+            node = self._node(name)
+            return max(1, int(node.inc)) if node is not None and node.inc else 1
+
+        def align(start, size, offset_step, size_step, limit):
+            aligned_start = (start // offset_step) * offset_step
+            end = min(start + size, limit)
+            aligned_size = -(-(end - aligned_start) // size_step) * size_step
+            if aligned_start + aligned_size > limit:
+                aligned_size = ((limit - aligned_start) // size_step) * size_step
+            return aligned_start, aligned_size
+
+        hx, hw = align(x, width, step('OffsetX'), step('Width'), max_w)
+        hy, hh = align(y, height, step('OffsetY'), step('Height'), max_h)
+        return hx, hy, hw, hh
+
+    @camera_command(requires_restart=True)
+    def set_analysis_roi(self, x: int, y: int, width: int, height: int) -> bool:
+        """
+        ROI анализа в координатах полного кадра. По возможности задаётся
+        аппаратно (камера передаёт только нужные пиксели), остаток -
+        программной обрезкой; без поддержки ROI - только программно
+        """
+        x, y, width, height = int(x), int(y), int(width), int(height)
+        binning = self._params.binning
+        self._analysis_roi = (x * binning, y * binning, width * binning, height * binning)
+        return self._apply_analysis_roi(x, y, width, height)
+
+    def _apply_analysis_roi(self, x: int, y: int, width: int, height: int) -> bool:
+        """Аппаратный ROI с программным остатком в координатах текущего кадра"""
+        hx, hy, hw, hh = self._align_roi(x, y, width, height)
+
+        if hw > 0 and hh > 0 and self.set_roi(hx, hy, hw, hh):
+            software = (x - hx, y - hy, width, height)
+            self._software_roi = None if (hx, hy, hw, hh) == (x, y, width, height) else software
+            print(f"  ROI: hardware {hw}x{hh}+{hx}+{hy}")
+            return True
+
+        # Fallback: полный кадр с камеры и программная обрезка
+        self.reset_roi()
+        self._software_roi = (x - self._params.offset_x, y - self._params.offset_y, width, height)
+        print(f"  ROI: software {width}x{height}+{x}+{y}")
+        return True
+
+    @camera_command(requires_restart=True)
+    def clear_analysis_roi(self) -> bool:
+        """Возврат к анализу полного кадра"""
+        self._analysis_roi = None
+        self._software_roi = None
+        return self.reset_roi()
+
+    # ==================== Биннинг предпросмотра ====================
+
+    def _binning_value(self, name: str, factor: int):
+        """Значение узла биннинга: число или пункт перечисления (например, 'BinningHorizontal2')"""
+        node = self._node(name)
+        if node is None:
+            return None
+        if node.kind == 'enum':
+            for entry in node.entries:
+                if ''.join(ch for ch in entry if ch.isdigit()) == str(factor):
+                    return entry
+            return None
+        return factor
+
+    def _apply_binning(self, factor: int) -> bool:
+        """
+        Биннинг, а при его отсутствии - децимация. Диапазоны Width/Height
+        меняются, поэтому ROI сбрасывается на весь (уменьшенный) кадр,
+        а ROI анализа задаётся заново в масштабе нового биннинга
+        """
+        applied = False
+        for prefix in ('Binning', 'Decimation'):
+            horizontal = self._binning_value(f'{prefix}Horizontal', factor)
+            vertical = self._binning_value(f'{prefix}Vertical', factor)
+            if horizontal is None or vertical is None:
+                continue
+            if self._write(f'{prefix}Horizontal', horizontal) and self._write(f'{prefix}Vertical', vertical):
+                applied = True
+                break
+
+        if not applied and factor > 1:
+            return False
+
+        self.invalidate_node_table(('Width', 'Height', 'OffsetX', 'OffsetY'))
+        self._software_roi = None
+        self.reset_roi()
+        self._full_size = self.get_max_resolution()
+        if self._analysis_roi is not None:
+            factor = max(1, factor)
+            x, y, width, height = self._analysis_roi
+            self._apply_analysis_roi(x // factor, y // factor, max(1, width // factor), max(1, height // factor))
+        return True
+
+    @camera_command(requires_restart=True)
+    def set_preview_binning(self, factor: int) -> bool:
+        """
+        Биннинг/децимация для живого просмотра: камера передаёт в factor^2
+        меньше данных. Полное разрешение - только для request_snapshot()
+        """
+        if not self._node_map:
+            return False
+
+        try:
+            factor = max(1, int(factor))
+            if self._apply_binning(factor):
+                self._params.binning = factor
+                print(f"  Preview binning: {factor}x{factor}")
+                return True
+        except Exception as e:
+            print(f"Error setting preview binning: {e}")
+        return False
+
+    def request_snapshot(self):
+        """
+        Запрос одного кадра полного разрешения (программный триггер).
+        Кадр приходит через snapshot_ready, затем поток возвращается к предпросмотру
+        """
+        self._snapshot_requested.set()
+        self._wake.set()
+
+    def _capture_snapshot(self, acquiring: bool) -> bool:
+        """Снимок в потоке захвата; возвращает состояние захвата"""
+        if acquiring:
+            self.ia.stop()
+        binning = self._params.binning
+
+        try:
+            if binning > 1:
+                self._apply_binning(1)
+
+            # Без программного триггера берём первый кадр непрерывного захвата
+            triggered = (self._has('TriggerSoftware') and self.set_trigger_mode(True)
+                         and self.set_trigger_source('software'))
+
+            self.ia.start()
+            try:
+                if triggered:
+                    self.software_trigger()
+                timeout = self.SNAPSHOT_TIMEOUT + self._params.exposure * 1e-6
+                with self.ia.fetch(timeout=timeout) as buffer:
+                    image = self._image_from_buffer(buffer, time.perf_counter())
+                self.snapshot_ready.emit(image)
+            except (TimeoutError, TimeoutException):
+                print("Warning: Snapshot timed out")
+            finally:
+                self.ia.stop()
+                if triggered:
+                    self.set_trigger_mode(False)
+        except Exception as e:
+            print(f"Error capturing snapshot: {e}")
+        finally:
+            if binning > 1:
+                self._apply_binning(binning)
+            self._build_node_table()
+
+        return False
+
+    def request_burst(self, frames: int = 8):
+        """
+        Серия из frames кадров подряд, усреднённая в один малошумный кадр
+        (полное разрешение). Результат приходит через burst_ready
+        """
+        self._burst_requests.put(max(2, int(frames)))
+        self._wake.set()
+
+    def _capture_burst(self, acquiring: bool, frames: int) -> bool:
+        """Серийная съёмка в потоке захвата; возвращает состояние захвата"""
+        binning = self._params.binning
+        # Время серии отсчитывается от начала съёмки, а не от постановки в очередь
+        started = time.perf_counter()
+        try:
+            # Перезапуск захвата сбрасывает кадры, снятые до запроса
+            if acquiring:
+                self.ia.stop()
+                acquiring = False
+            if binning > 1:
+                self._apply_binning(1)
+
+            self.ia.start()
+            acquiring = True
+
+            timeout = self.SNAPSHOT_TIMEOUT + self._params.exposure * 1e-6
+            for _ in range(frames):
+                with self.ia.fetch(timeout=timeout) as buffer:
+                    component = buffer.payload.components[0]
+                    # Mono8 накапливается прямо из буфера драйвера, без копии
+                    frame = np.asarray(component.data).reshape(component.height, component.width)
+                    data_format = str(component.data_format)
+                    if frame.dtype != np.uint8 or 'Bayer' in data_format:
+                        frame = self._convert_to_grayscale(frame, data_format)
+                    if self.averager.count == 0:
+                        self.averager.reset(frame.shape, frame.dtype)
+                    self.averager.add(frame)
+            capture_time = time.perf_counter() - started
+
+            stats = BurstStats(
+                frames=self.averager.count,
+                capture_time=capture_time,
+                noise_variance_single=self.averager.single_noise_variance(),
+                noise_variance_averaged=self.averager.averaged_noise_variance(),
+            )
+            image = self._wrap_frame(self.averager.average(), time.perf_counter())
+            print(f"  Burst {stats.frames}: {stats.capture_time * 1000:.0f} ms, "
+                  f"noise variance {stats.noise_variance_single:.2f} -> {stats.noise_variance_averaged:.2f} "
+                  f"(x{stats.variance_reduction:.1f})")
+            self.burst_ready.emit(image, stats)
+        except (TimeoutError, TimeoutException):
+            print("Warning: Burst capture timed out")
+            self.burst_failed.emit('Burst capture timed out')
+        except Exception as e:
+            print(f"Error capturing burst: {e}")
+            self.burst_failed.emit(str(e))
+        finally:
+            self.averager.count = 0
+            if binning > 1:
+                if acquiring:
+                    self.ia.stop()
+                    acquiring = False
+                self._apply_binning(binning)
+                self._build_node_table()
+
+        return acquiring
+
+    @camera_command(requires_restart=True)
     def reset_roi(self) -> bool:
         """Сброс ROI на максимальное разрешение"""
         max_w, max_h = self.get_max_resolution()
@@ -680,20 +2019,14 @@ class HikrobotThread(QThread):
 
     # ==================== Баланс белого ====================
 
+    @camera_command()
     def set_auto_white_balance(self, enable: bool, mode: str = 'continuous') -> bool:
         """Включение/выключение автоматического баланса белого"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'BalanceWhiteAuto'):
-                if not enable:
-                    self._node_map.BalanceWhiteAuto.value = 'Off'
-                elif mode == 'once':
-                    self._node_map.BalanceWhiteAuto.value = 'Once'
-                else:
-                    self._node_map.BalanceWhiteAuto.value = 'Continuous'
-
+            if self._write('BalanceWhiteAuto', self._auto_mode_value(enable, mode)):
                 self._params.auto_white_balance = enable
                 return True
         except Exception as e:
@@ -702,50 +2035,46 @@ class HikrobotThread(QThread):
 
     # ==================== Гамма ====================
 
+    @camera_command(invalidates=('Gamma',))
     def set_gamma(self, gamma: float) -> bool:
         """Установка гамма-коррекции камеры"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'GammaEnable'):
-                self._node_map.GammaEnable.value = True
-
-            if hasattr(self._node_map, 'Gamma'):
-                self._node_map.Gamma.value = float(gamma)
-                return True
+            self._write('GammaEnable', True)
+            return self._write('Gamma', float(gamma))
         except Exception as e:
             print(f"Error setting gamma: {e}")
         return False
 
+    @camera_command(invalidates=('Gamma',))
     def set_gamma_enabled(self, enable: bool) -> bool:
         """Включение/выключение гамма-коррекции"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'GammaEnable'):
-                self._node_map.GammaEnable.value = enable
-                return True
+            return self._write('GammaEnable', enable)
         except Exception as e:
             print(f"Error setting gamma enabled: {e}")
         return False
 
     # ==================== Триггер ====================
 
+    @camera_command(invalidates=('TriggerSoftware',))
     def set_trigger_mode(self, enable: bool) -> bool:
         """Включение/выключение триггерного режима"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'TriggerMode'):
-                self._node_map.TriggerMode.value = 'On' if enable else 'Off'
-                return True
+            return self._write('TriggerMode', 'On' if enable else 'Off')
         except Exception as e:
             print(f"Error setting trigger mode: {e}")
         return False
 
+    @camera_command()
     def set_trigger_source(self, source: str = 'software') -> bool:
         """
         Установка источника триггера
@@ -757,39 +2086,68 @@ class HikrobotThread(QThread):
             return False
 
         try:
-            if hasattr(self._node_map, 'TriggerSource'):
-                sources = {
-                    'software': 'Software',
-                    'line0': 'Line0',
-                    'line1': 'Line1',
-                    'line2': 'Line2',
-                }
-                self._node_map.TriggerSource.value = sources.get(source.lower(), 'Software')
-                return True
+            sources = {
+                'software': 'Software',
+                'line0': 'Line0',
+                'line1': 'Line1',
+                'line2': 'Line2',
+            }
+            return self._write('TriggerSource', sources.get(source.lower(), 'Software'))
         except Exception as e:
             print(f"Error setting trigger source: {e}")
         return False
 
+    @camera_command(collapse=False)
     def software_trigger(self) -> bool:
         """Программный триггер (если включен триггерный режим)"""
         if not self._node_map:
             return False
 
         try:
-            if hasattr(self._node_map, 'TriggerSoftware'):
-                self._node_map.TriggerSoftware.execute()
-                return True
+            return self._execute('TriggerSoftware')
         except Exception as e:
             print(f"Error executing software trigger: {e}")
         return False
 
+    # ==================== Вспомогательные ====================
+
+    @staticmethod
+    def _auto_mode_value(enable: bool, mode: str) -> str:
+        if not enable:
+            return 'Off'
+        if mode == 'once':
+            return 'Once'
+        return 'Continuous'
+
+    def _node_range(self, name: str) -> Tuple[float, float]:
+        """Диапазон (min, max) узла из таблицы"""
+        node = self._node(name)
+        if node is None or node.min is None or node.max is None:
+            return (0.0, 0.0)
+        return (node.min, node.max)
+
     # ==================== Получение всех параметров ====================
 
-    def get_all_params(self) -> CameraParams:
-        """Получение всех текущих параметров камеры"""
-        if not self._node_map:
-            return self._params
+    def get_all_params(self, refresh: bool = False) -> CameraParams:
+        """
+        Получение всех текущих параметров камеры
+
+        Args:
+            refresh: Перечитать значения с устройства. Во время захвата
+                чтение выполняется потоком захвата, результат придёт в params_changed
+        """
+        if not self._node_map or not refresh:
+            return replace(self._params)
+
+        if self._should_queue():
+            self._commands.put((HikrobotThread._refresh_params, (), {}, False, (), True))
+            self._wake.set()
+            return replace(self._params)
+
+        self._refresh_params()
+        return replace(self._params)
 
+    def _refresh_params(self) -> bool:
         self._params.exposure = self.get_exposure()
         self._params.gain = self.get_gain()
         self._params.frame_rate = self.get_frame_rate()
@@ -797,8 +2155,7 @@ class HikrobotThread(QThread):
         w, h = self.get_resolution()
         self._params.width = w
         self._params.height = h
-
-        return self._params
+        return True
 
     def apply_params(self, params: CameraParams) -> bool:
         """Применение набора параметров"""
@@ -827,46 +2184,79 @@ class HikrobotThread(QThread):
     # ==================== Основные методы ====================
 
     def run(self):
+        self._acquisition_thread_id = threading.get_ident()
+        self.native_id = threading.get_native_id()
+        set_thread_affinity(self.native_id, self.cpu_cores)
+        register_camera_metrics(self, f'genicam{self.camera_index}')
         try:
-            self.harvester = Harvester()
-
-            if self.cti_file:
-                self.harvester.add_file(self.cti_file)
-            else:
-                self.harvester.add_file('/opt/MVS/lib/64/MvProducerU3V.cti')
+            self.session = HarvesterSession.get(self.cti_file)
 
-            self.harvester.update()
-
-            if len(self.harvester.device_info_list) == 0:
+            if not self.session.get_devices():
                 self.error_occurred.emit('Cannot open camera - no devices found')
                 return
 
-            self.ia = self.harvester.create(self.camera_index)
+            self.ia = self.session.acquire(self.camera_index)
+            if self.num_buffers:
+                self.ia.num_buffers = self.num_buffers
 
             # Сохраняем node_map для управления параметрами
             self._node_map = self.ia.remote_device.node_map
 
+            self.invalidate_node_table()
             self._configure_camera()
-            self.ia.start()
+            self._build_node_table()
+            self.get_pixel_format()
+            self._refresh_params()
+            self._full_size = self.get_max_resolution()
 
             self.running = True
+            acquiring = False
 
             while self.running:
+                acquiring = self._process_commands(acquiring)
+
+                if self._snapshot_requested.is_set():
+                    self._snapshot_requested.clear()
+                    acquiring = self._capture_snapshot(acquiring)
+
+                while not self._burst_requests.empty():
+                    acquiring = self._capture_burst(acquiring, self._burst_requests.get_nowait())
+
+                if self._paused:
+                    # Стоп-кадр: либо останавливаем только захват, либо сбрасываем буферы
+                    if self._stop_acquisition_on_pause:
+                        if acquiring:
+                            self.ia.stop()
+                            acquiring = False
+                        self._wake.wait(0.5)
+                        self._wake.clear()
+                        continue
+
+                if not acquiring:
+                    self.ia.start()
+                    acquiring = True
+                    # После перезапуска счётчики буферов и часы камеры могут начаться заново
+                    self._last_frame_id = None
+                    self._clock_offset = None
+
                 try:
-                    with self.ia.fetch(timeout=2.0) as buffer:
-                        component = buffer.payload.components[0]
-                        frame = np.array(component.data).reshape(component.height, component.width)
+                    with self.ia.fetch(timeout=self.FETCH_TIMEOUT) as buffer:
+                        if self._paused:
+                            continue
 
-                        # Конвертация в черно-белое
-                        gray = self._convert_to_grayscale(frame, str(component.data_format))
+                        received = time.perf_counter()
+                        self.acquisition_meter.tick(received)
+                        self._count_dropped(buffer)
+                        image = self._image_from_buffer(buffer, self._capture_time(buffer, received))
 
                         with QMutexLocker(self._mutex):
-                            self.last_frame = gray.copy()
+                            self.last_frame = image.get_image().copy()
+                            self._last_offset = image.offset
 
-                        image = Image('', gray)
+                        self.change_detector.mark(image)
                         self.frame_ready.emit(image)
 
-                except TimeoutError:
+                except (TimeoutError, TimeoutException):
                     continue
                 except Exception as e:
                     if self.running:
@@ -881,11 +2271,115 @@ class HikrobotThread(QThread):
         finally:
             self._cleanup()
 
-    def _convert_to_grayscale(self, frame: np.ndarray, data_format: str) -> np.ndarray:
-        """Конвертация кадра в черно-белое"""
-        if len(frame.shape) == 2 and 'Bayer' not in data_format:
-            return frame.astype(np.uint8)
+    def set_change_sensitivity(self, sensitivity: float):
+        """Порог детектора неизменившихся кадров (0 - выключить)"""
+        self.change_detector.sensitivity = sensitivity
+
+    def _should_queue(self) -> bool:
+        """Команды из чужих потоков во время работы потока захвата идут в очередь"""
+        return self.running and threading.get_ident() != self._acquisition_thread_id
+
+    def _process_commands(self, acquiring: bool) -> bool:
+        """
+        Выполняет накопленные команды пачкой. Повторные вызовы одного сеттера
+        схлопываются до последнего; захват перезапускается один раз и только
+        если этого требует хотя бы одна команда
+
+        Returns:
+            bool: Идёт ли захват после выполнения команд
+        """
+        if self._commands.empty():
+            return acquiring
 
+        batch = {}
+        for index in itertools.count():
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if not command[5]:
+                # Действия не схлопываются: у каждого вызова свой ключ
+                batch[(command[0].__name__, index)] = command
+                continue
+            # Последний вызов сеттера в конец, чтобы сохранить порядок применения
+            name = command[0].__name__
+            batch.pop(name, None)
+            batch[name] = command
+
+        restart = acquiring and any(item[3] for item in batch.values())
+        if restart:
+            self.ia.stop()
+
+        for method, args, kwargs, _, invalidates, _ in batch.values():
+            try:
+                if not method(self, *args, **kwargs):
+                    print(f"Warning: {method.__name__}{args} was not applied")
+                elif invalidates:
+                    self.invalidate_node_table(invalidates)
+            except Exception as e:
+                print(f"Error applying {method.__name__}: {e}")
+
+        # Диапазоны и доступность узлов после смены ROI/формата пересчитываются
+        if any(command[3] for command in batch.values()):
+            self._build_node_table()
+
+        if restart:
+            self.ia.start()
+
+        self.params_changed.emit(replace(self._params))
+        return acquiring
+
+    def _count_dropped(self, buffer):
+        frame_id = getattr(buffer, 'frame_id', None)
+        if frame_id is None:
+            return
+        if self._last_frame_id is not None and frame_id > self._last_frame_id + 1:
+            self.dropped_frames += frame_id - self._last_frame_id - 1
+        self._last_frame_id = frame_id
+
+    def _capture_time(self, buffer, received: float) -> float:
+        """
+        Время экспозиции по метке буфера в шкале perf_counter. Часы камеры
+        сводятся к часам хоста по минимальному наблюдавшемуся смещению,
+        поэтому задержка включает передачу кадра; без метки - время получения
+        """
+        try:
+            device_time = buffer.timestamp_ns * 1e-9
+        except Exception:
+            return received
+        if not device_time:
+            return received
+        offset = received - device_time
+        if self._clock_offset is None or offset < self._clock_offset:
+            self._clock_offset = offset
+        return device_time + self._clock_offset
+
+    def _image_from_buffer(self, buffer, timestamp: float) -> Image:
+        """Image из буфера harvesters с геометрией ROI"""
+        component = buffer.payload.components[0]
+        frame = np.array(component.data).reshape(component.height, component.width)
+
+        # Конвертация в черно-белое
+        gray = self._convert_to_grayscale(frame, str(component.data_format))
+        return self._wrap_frame(gray, timestamp)
+
+    def _wrap_frame(self, gray: np.ndarray, timestamp: float) -> Image:
+        """Image с геометрией текущего ROI (аппаратное смещение и программная обрезка)"""
+        image = Image('', gray, timestamp=timestamp)
+        image.full_size = self._full_size
+        image.offset = (self._params.offset_x, self._params.offset_y)
+        if self._software_roi is not None:
+            image = image.crop(*self._software_roi)
+        return image
+
+    @staticmethod
+    def _significant_bits(data_format: str) -> int:
+        """Разрядность формата по имени: 'Mono12' -> 12, 'BayerRG10p' -> 10"""
+        digits = ''.join(ch for ch in data_format if ch.isdigit())
+        return int(digits) if digits else 8
+
+    def _convert_to_grayscale(self, frame: np.ndarray, data_format: str) -> np.ndarray:
+        """Конвертация кадра в черно-белое без потери разрядности (uint8 или uint16)"""
         if 'Bayer' in data_format:
             if 'RG' in data_format:
                 bgr = cv2.cvtColor(frame, cv2.COLOR_BAYER_RG2BGR)
@@ -897,31 +2391,33 @@ class HikrobotThread(QThread):
                 bgr = cv2.cvtColor(frame, cv2.COLOR_BAYER_GB2BGR)
             else:
                 bgr = cv2.cvtColor(frame, cv2.COLOR_BAYER_RG2BGR)
-            return cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+            gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        elif len(frame.shape) == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = frame
 
-        if len(frame.shape) == 3:
-            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if gray.dtype == np.uint8:
+            return gray
 
-        return frame.astype(np.uint8)
+        # Mono10/Mono12 растягиваются на полный 16-битный диапазон,
+        # чтобы гамма, Оцу и отображение не зависели от формата камеры
+        gray = gray.astype(np.uint16, copy=False)
+        bits = self._significant_bits(data_format)
+        if 8 < bits < 16:
+            gray = np.left_shift(gray, 16 - bits)
+        return gray
 
     def _cleanup(self):
         """Очистка ресурсов"""
         self._node_map = None
+        self.invalidate_node_table()
+        self.native_id = None
 
-        if self.ia:
-            try:
-                self.ia.stop()
-                self.ia.destroy()
-            except Exception as e:
-                print(f"Camera error in cleanup: {e}")
-            self.ia = None
-
-        if self.harvester:
-            try:
-                self.harvester.reset()
-            except Exception as e:
-                print(f"Camera error in cleanup: {e}")
-            self.harvester = None
+        # Harvester и ImageAcquirer остаются в сессии для быстрого перезапуска
+        if self.ia and self.session:
+            self.session.release(self.ia)
+        self.ia = None
 
     def _configure_camera(self):
         """Настройка параметров камеры"""
@@ -932,14 +2428,16 @@ class HikrobotThread(QThread):
             if not self.set_trigger_mode(False):
                 print("  Warning: Could not disable trigger mode")
 
-            # 2. Устанавливаем максимальное разрешение
+            # 2. Без биннинга (мог остаться от предыдущего запуска) и максимальное разрешение
+            self._apply_binning(1)
+            self._params.binning = 1
             if not self.reset_roi():
                 print("  Warning: Could not set maximum resolution")
             else:
                 print(f"  Resolution: {self._params.width}x{self._params.height} (maximum)")
 
-            # 3. Устанавливаем формат пикселей (нужен отдельный метод)
-            if not self.set_pixel_format('Mono8'):
+            # 3. Устанавливаем формат пикселей (Mono8 или высокая разрядность)
+            if not self.set_bit_depth(self.bit_depth):
                 print("  Warning: Could not set pixel format")
 
             # 4. Устанавливаем экспозицию 1/30 сек = 33333 мкс
@@ -970,19 +2468,261 @@ class HikrobotThread(QThread):
             print(f"Warning: Could not configure camera: {e}")
 
 
+    def pause(self, stop_acquisition: bool = True):
+        """
+        Стоп-кадр без уничтожения ImageAcquirer
+
+        Args:
+            stop_acquisition: Останавливать захват на камере (иначе кадры
+                продолжают приходить и отбрасываются)
+        """
+        self._stop_acquisition_on_pause = stop_acquisition
+        self._paused = True
+
+    def resume(self):
+        """Возобновление выдачи кадров"""
+        self._paused = False
+        self._wake.set()
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+    def get_last_image(self) -> Optional[Image]:
+        """Последний кадр без остановки потока"""
+        with QMutexLocker(self._mutex):
+            last = self.last_frame
+            offset = self._last_offset
+        if last is not None:
+            image = Image('', last)
+            image.offset = offset
+            image.full_size = self._full_size
+            return image
+        return None
+
     def stop(self) -> Optional[Image]:
         """Остановка потока и возврат последнего кадра"""
         self.running = False
+        self._wake.set()
 
-        if not self.wait(3000):
-            print("Warning: Thread did not stop in time")
-            self.terminate()
+        # fetch ограничен FETCH_TIMEOUT, поэтому поток завершается сам
+        if not self.wait(self.STOP_TIMEOUT_MS):
+            print("Warning: Thread did not stop in time, waiting")
             self.wait()
 
+        last_image = self.get_last_image()
         with QMutexLocker(self._mutex):
-            last = self.last_frame
             self.last_frame = None
+        return last_image
 
-        if last is not None:
-            return Image('', last)
-        return None
\ No newline at end of file
+
+@dataclass
+class LiveMeasurement:
+    """Результат измерения одного кадра в живом режиме"""
+    timestamp: float  # время захвата кадра (time.perf_counter)
+    area_px: float
+    area_fraction: float  # доля полного кадра (при ROI - не только измеренной области)
+    contours_count: int
+    latency: float  # с, от захвата до результата
+    fps: float  # достигнутая частота измерений
+
+
+class LiveMeasurementWorker(QThread):
+    '''Измерение площади включений на каждом кадре, который успевает обработать.
+     Кадры принимаются через submit() (вызывается из потока камеры),
+     необработанный кадр заменяется более свежим'''
+
+    measurement_ready = Signal(object)  # LiveMeasurement
+    gamma_changed = Signal(float)
+
+    def __init__(self, history_size: int = 300, name: str = 'main'):
+        super().__init__()
+        self.name = name
+        self.running = False
+        self.gamma = 1.0
+        self.measure_enabled = True
+        self.gamma_tracker: Optional[GammaTracker] = None
+        self.dropped_frames = 0
+        self.measured_frames = 0
+        self.skipped_static_frames = 0
+        self._last_measurement: Optional[LiveMeasurement] = None
+        # Номер изменения сцены кадра, по которому посчитан _last_measurement
+        self._last_generation = None
+        self.history = deque(maxlen=history_size)
+        self.pipeline = ProcessingPipeline()
+        self._pending = None
+        self._condition = threading.Condition()
+        self._finish_times = deque(maxlen=30)
+        # Бюджет: ядра CPU и максимальная частота измерений (0 - без ограничения)
+        self.cpu_cores = None
+        self.native_id = None
+        self.max_rate = 0.0
+        self._register_metrics({'worker': name})
+
+    def _register_metrics(self, labels: Dict[str, str]):
+        self._latency_metric = metrics.histogram(
+            'live_measurement_latency_seconds', 'Time from frame capture to measurement result', labels)
+        self._duration_metric = metrics.histogram(
+            'live_measurement_duration_seconds', 'Processing time of one live measurement', labels)
+        metrics.counter('live_measured_frames_total', 'Frames measured in live mode',
+                        labels).set_function(lambda: self.measured_frames)
+        metrics.counter('live_dropped_frames_total', 'Frames replaced by a newer one before measurement',
+                        labels).set_function(lambda: self.dropped_frames)
+        metrics.counter('live_static_frames_total', 'Unchanged frames that reused the previous result',
+                        labels).set_function(lambda: self.skipped_static_frames)
+        metrics.gauge('live_measurement_fps', 'Achieved live measurement rate',
+                      labels).set_function(self.measure_fps)
+
+    def submit(self, image: Image):
+        """Передача кадра на измерение (без блокировки потока камеры)"""
+        with self._condition:
+            if self._pending is not None:
+                self.dropped_frames += 1
+            self._pending = image
+            self._condition.notify()
+
+    def set_gamma(self, gamma: float):
+        self.gamma = gamma
+        # Прошлый результат посчитан с другой гаммой
+        self._last_measurement = None
+
+    def set_gamma_tracker(self, tracker: Optional[GammaTracker]):
+        """Включение (tracker) / выключение (None) слежения за автогаммой"""
+        if tracker is not None:
+            tracker.reset()
+        self.gamma_tracker = tracker
+
+    def get_history(self) -> List[LiveMeasurement]:
+        """Копия временного ряда последних измерений"""
+        return list(self.history)
+
+    def _measure(self, image: Image) -> LiveMeasurement:
+        self.pipeline.set_source(image)
+        self.pipeline.set_params('preprocess', mode=ProcessingPipeline.GAMMA, gamma=self.gamma)
+        result = self.pipeline.get('measurements')
+        area_px = result.area_px
+        contours_count = result.contours_count
+        area_fraction = result.area_fraction
+
+        now = time.perf_counter()
+        self._finish_times.append(now)
+        fps = self._current_fps(now)
+
+        captured = image.timestamp if image.timestamp is not None else now
+        return LiveMeasurement(
+            timestamp=captured,
+            area_px=area_px,
+            area_fraction=area_fraction,
+            contours_count=contours_count,
+            latency=now - captured,
+            fps=fps,
+        )
+
+    def run(self):
+        self.native_id = threading.get_native_id()
+        set_thread_affinity(self.native_id, self.cpu_cores)
+        self.running = True
+        while self.running:
+            if self.max_rate > 0 and self._finish_times:
+                # Не чаще max_rate: лишние кадры вытесняются в почтовом ящике
+                delay = self._finish_times[-1] + 1.0 / self.max_rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            with self._condition:
+                while self._pending is None and self.running:
+                    self._condition.wait(0.1)
+                image = self._pending
+                self._pending = None
+            if image is None:
+                continue
+
+            # Сцена не изменилась с измеренного кадра - повторяем результат без пересчёта.
+            # is_static сравнивает с последним изменившимся кадром камеры; если тот был
+            # вытеснен из почтового ящика, номера изменений не совпадут
+            if (image.is_static and self._last_measurement is not None
+                    and image.change_generation is not None
+                    and image.change_generation == self._last_generation):
+                self.skipped_static_frames += 1
+                if self.measure_enabled:
+                    self._publish(self._reuse(self._last_measurement, image))
+                continue
+
+            tracker = self.gamma_tracker
+            if tracker is not None:
+                try:
+                    previous = self.gamma
+                    self.gamma = tracker.update(image.get_image())
+                    if abs(self.gamma - previous) >= 0.01:
+                        self.gamma_changed.emit(self.gamma)
+                except Exception as e:
+                    print(f"Gamma tracking error: {e}")
+
+            if not self.measure_enabled:
+                continue
+
+            try:
+                started = time.perf_counter()
+                with profiler.stage('live.measure'):
+                    measurement = self._measure(image)
+            except Exception as e:
+                print(f"Live measurement error: {e}")
+                continue
+
+            self._duration_metric.observe(time.perf_counter() - started)
+            self._latency_metric.observe(measurement.latency)
+            self.measured_frames += 1
+            self._last_generation = image.change_generation
+            self._publish(measurement)
+        self.native_id = None
+
+    def _publish(self, measurement: LiveMeasurement):
+        self._last_measurement = measurement
+        self.history.append(measurement)
+        self.measurement_ready.emit(measurement)
+
+    def _reuse(self, previous: LiveMeasurement, image: Image) -> LiveMeasurement:
+        now = time.perf_counter()
+        self._finish_times.append(now)
+        captured = image.timestamp if image.timestamp is not None else now
+        return replace(previous, timestamp=captured, latency=now - captured, fps=self._current_fps(now))
+
+    def measure_fps(self) -> float:
+        """Достигнутая частота измерений (для индикаторов)"""
+        return self._current_fps(time.perf_counter())
+
+    def _current_fps(self, now: float) -> float:
+        if len(self._finish_times) < 2:
+            return 0.0
+        return (len(self._finish_times) - 1) / (now - self._finish_times[0])
+
+    def stop(self):
+        self.running = False
+        with self._condition:
+            self._condition.notify()
+        self.wait()
+
+
+class CameraStream:
+    '''Камера в многокамерном режиме: свой поток захвата с пулом буферов
+     и свой обработчик кадров, каждый на своих ядрах'''
+
+    def __init__(self, name: str, thread, num_buffers: Optional[int] = None, max_rate: float = 0.0):
+        self.name = name
+        self.thread = thread
+        self.thread.num_buffers = num_buffers
+        self.worker = LiveMeasurementWorker(name=name)
+        self.worker.max_rate = max_rate
+        # Кадры передаются обработчику прямо из потока камеры
+        self.thread.frame_ready.connect(self.worker.submit, Qt.DirectConnection)
+
+    def set_cores(self, acquisition_cores, processing_cores):
+        pin_thread(self.thread, acquisition_cores)
+        pin_thread(self.worker, processing_cores)
+
+    def start(self):
+        self.worker.start()
+        self.thread.start()
+
+    def stop(self):
+        self.thread.stop()
+        self.worker.stop()
+        self.worker.wait()
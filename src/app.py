@@ -1,19 +1,41 @@
 import os
 import sys
-import csv
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
-from PySide6.QtCore import Qt, Slot, QTimer, QSize, QTranslator, QCoreApplication
-from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox, QProgressDialog, QDialog
+from PySide6.QtCore import Qt, Slot, Signal, QTimer, QSize, QTranslator, QCoreApplication, QEvent, QRect, QPoint
+from PySide6.QtWidgets import (QApplication, QMainWindow, QFileDialog, QMessageBox, QProgressDialog, QDialog,
+                               QRubberBand, QWidget, QLabel, QGridLayout, QVBoxLayout)
 from PySide6.QtMultimedia import QMediaDevices
 
-from ObjectClasses import Image, VideoThread, HikrobotThread
+from ObjectClasses import (Image, VideoThread, HikrobotThread, HarvesterSession, LiveMeasurementWorker, GammaTracker,
+                           CameraStream, ImageLoadThread, ProcessingPipeline, FrameRateMeter, RunningAverage,
+                           plan_stream_affinity, pin_thread)
 from ui import Ui_MainWindow
-from dialogs import ChooseCameraDialog, PreprocessMethodDialog, ChooseCalibrationDialog
-from utils import OpenCVToQtAdapter, PreprocessMethod
+from dialogs import ChooseCameraDialog, PreprocessMethodDialog, ChooseCalibrationDialog, ImageFilesDialog
+from utils import FrameConverter, OpenCVToQtAdapter
+from batch import BatchProcessor
+from image_cache import read_reduced, register_cache_metrics
+from metrics import metrics
+from profiling import profiler
+from viewer import ZoomableImageView
+from tiling import TiledAnalyzer, open_tile_source
 
 filename = 'placeholder.png'
+# Биннинг камеры в режиме предпросмотра
+PREVIEW_BINNING = 2
+# Кадров в серии для малошумного измерения и серии для замера
+BURST_FRAMES = 8
+BURST_BENCHMARK_FRAMES = (4, 8, 16)
+# Предельное время одной серии замера, мс (после него замер сбрасывается)
+BURST_BENCHMARK_TIMEOUT = 30000
+# Период обновления индикатора производительности, мс
+PERFORMANCE_OVERLAY_INTERVAL = 500
+# Многокамерный режим: буферов на камеру и предел частоты измерений на камеру
+STREAM_NUM_BUFFERS = 8
+STREAM_MEASURE_RATE = 10.0
 
 
 class ImageViewer(QMainWindow):
@@ -24,6 +46,10 @@ class ImageViewer(QMainWindow):
         self.filename = filename
         self.image = Image(filename)
         self.processed_image = None
+        # Конвейер отображения и измерения (кэширует этапы между перерисовками)
+        self.pipeline = ProcessingPipeline()
+        # Загрузка полного разрешения после уменьшенного предпросмотра файла
+        self._image_loader = None
 
         # Параметры обработки
         self.gamma = 1.0
@@ -41,6 +67,48 @@ class ImageViewer(QMainWindow):
         self._is_camera_mode = False
         self._camera_paused = False
         self._last_camera_frame = None
+        self._last_render_key = None
+        self._snap_button_shown = False
+        self._snapshot_shown = False
+        self._measure_on_snapshot = False
+        self._burst_benchmark = None
+        self._burst_benchmark_timer = None
+
+        # Дополнительные камеры (многокамерный режим)
+        self.streams = []
+        self._tile_view = None
+
+        # Живое измерение площади
+        self.live_worker = None
+        self._live_measurements = deque(maxlen=300)
+
+        # ROI анализа (координаты полного кадра)
+        self.roi = None
+        self._source_image = None
+        self._rubber_band = None
+        self._roi_origin = None
+
+        # Просмотр с масштабированием (пирамида тайлов) вместо pixmap_label
+        self._zoom_view = None
+        # Буфер преобразования кадров для pixmap_label (переиспользуется между кадрами)
+        self._frame_converter = FrameConverter()
+
+        # Индикатор производительности живого просмотра (строка состояния)
+        self._display_meter = FrameRateMeter()
+        self._display_latency = RunningAverage()
+        self._render_time = RunningAverage()
+        self._performance_label = None
+        self._performance_timer = None
+        self._performance_thread = None
+        # Кадры, захваченные камерой до начала счёта отображённых
+        self._acquired_baseline = 0
+        metrics.counter('display_frames_total', 'Frames shown in the live view').set_function(
+            lambda: self._display_meter.frames)
+        metrics.gauge('display_fps', 'Live view frame rate').set_function(self._display_meter.fps)
+        metrics.gauge('display_latency_seconds', 'Smoothed time from capture to display').set_function(
+            lambda: self._display_latency.value)
+        metrics.gauge('display_render_seconds', 'Smoothed frame conversion and drawing time').set_function(
+            lambda: self._render_time.value)
 
         # UI
         self.ui = Ui_MainWindow()
@@ -66,6 +134,23 @@ class ImageViewer(QMainWindow):
         self.ui.actionConnect_cti_file.triggered.connect(self._connect_cti_file)
         self.ui.actionProcess_Image_Array.triggered.connect(self._process_images_array)
         self.ui.actionAbout.triggered.connect(self._show_about)
+        self.ui.actionLive_Measurement.toggled.connect(self._on_live_measurement_toggled)
+        self.ui.actionGamma_Tracking.toggled.connect(self._on_gamma_tracking_toggled)
+        self.ui.actionReset_ROI.triggered.connect(self._reset_roi)
+        self.ui.actionBinned_Preview.toggled.connect(self._on_binned_preview_toggled)
+        self.ui.actionBurst_Average.triggered.connect(self._burst_average)
+        self.ui.actionBurst_Benchmark.triggered.connect(self._burst_benchmark_start)
+        self.ui.actionAdd_Camera_Stream.triggered.connect(self._add_camera_stream)
+        self.ui.actionAdd_GenICam_Stream.triggered.connect(self._add_genicam_stream)
+        self.ui.actionHigh_Bit_Depth.toggled.connect(self._on_high_bit_depth_toggled)
+        self.ui.actionAnalyze_Large_Image.triggered.connect(self._analyze_large_image)
+        self.ui.actionZoomable_Viewer.toggled.connect(self._on_zoomable_viewer_toggled)
+        self.ui.actionSelect_ROI.toggled.connect(self._on_select_roi_toggled)
+        self.ui.actionProfiling.setChecked(profiler.enabled)
+        self.ui.actionProfiling.toggled.connect(profiler.set_enabled)
+        self.ui.actionSave_Profile.triggered.connect(self._save_profile)
+        self.ui.actionPerformance_Overlay.toggled.connect(self._on_performance_overlay_toggled)
+        self.ui.pixmap_label.installEventFilter(self)
 
         # Контуры: автоматический стоп-кадр только для камеры
         self.ui.apply_countour_button.toggled.connect(self._on_contours_toggled)
@@ -79,6 +164,245 @@ class ImageViewer(QMainWindow):
         self.display_image()
 
 
+    # ==================== ROI ====================
+
+    def eventFilter(self, obj, event):
+        """Выделение ROI мышью на изображении"""
+        if obj is self.ui.pixmap_label and self.ui.actionSelect_ROI.isChecked():
+            if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+                self._roi_origin = event.position().toPoint()
+                if self._rubber_band is None:
+                    self._rubber_band = QRubberBand(QRubberBand.Rectangle, self.ui.pixmap_label)
+                self._rubber_band.setGeometry(QRect(self._roi_origin, QSize()))
+                self._rubber_band.show()
+                return True
+            if event.type() == QEvent.MouseMove and self._roi_origin is not None:
+                self._rubber_band.setGeometry(QRect(self._roi_origin, event.position().toPoint()).normalized())
+                return True
+            if event.type() == QEvent.MouseButtonRelease and self._roi_origin is not None:
+                rect = QRect(self._roi_origin, event.position().toPoint()).normalized()
+                self._roi_origin = None
+                self._rubber_band.hide()
+                self.ui.actionSelect_ROI.setChecked(False)
+                self._select_roi(rect)
+                return True
+        return super().eventFilter(obj, event)
+
+    def _label_to_image(self, point: QPoint):
+        """Координаты на метке -> координаты текущего изображения"""
+        label = self.ui.pixmap_label
+        pixmap = label.pixmap()
+        height, width = self.image.get_image().shape[:2]
+        if pixmap is None or pixmap.isNull():
+            return None
+        # Pixmap масштабирован с KeepAspectRatio и выровнен по центру метки
+        left = (label.width() - pixmap.width()) / 2
+        top = (label.height() - pixmap.height()) / 2
+        x = (point.x() - left) * width / pixmap.width()
+        y = (point.y() - top) * height / pixmap.height()
+        return min(max(int(x), 0), width), min(max(int(y), 0), height)
+
+    def _select_roi(self, rect: QRect):
+        self._ensure_full_image()
+        top_left = self._label_to_image(rect.topLeft())
+        bottom_right = self._label_to_image(rect.bottomRight())
+        if top_left is None or bottom_right is None:
+            return
+        width = bottom_right[0] - top_left[0]
+        height = bottom_right[1] - top_left[1]
+        if width < 2 or height < 2:
+            return
+        self._apply_roi(top_left[0], top_left[1], width, height)
+
+    def _on_select_roi_toggled(self, checked: bool):
+        if self._zoom_view is not None:
+            self._zoom_view.set_roi_mode(checked)
+
+    @Slot(int, int, int, int)
+    def _on_zoom_view_roi(self, x: int, y: int, width: int, height: int):
+        if not self.ui.actionSelect_ROI.isChecked():
+            return
+        self.ui.actionSelect_ROI.setChecked(False)
+        # Выделение сделано на показанном кадре - это может быть уменьшенный предпросмотр
+        shown_height, shown_width = self.image.get_image().shape[:2]
+        self._ensure_full_image()
+        full_height, full_width = self.image.get_image().shape[:2]
+        if (full_width, full_height) != (shown_width, shown_height):
+            scale_x = full_width / shown_width
+            scale_y = full_height / shown_height
+            x, width = round(x * scale_x), round(width * scale_x)
+            y, height = round(y * scale_y), round(height * scale_y)
+        self._apply_roi(x, y, width, height)
+
+    def _apply_roi(self, x: int, y: int, width: int, height: int):
+        """ROI в координатах текущего изображения"""
+        # Переводим в координаты полного кадра
+        offset_x, offset_y = self.image.offset
+        self.roi = (x + offset_x, y + offset_y, width, height)
+
+        if self._is_camera_mode and self.thread is not None:
+            # ROI сам сокращает поток с камеры, биннинг с ним не совмещается
+            self._set_action_checked(self.ui.actionBinned_Preview, False)
+            self.thread.set_preview_binning(1)
+            self.thread.set_analysis_roi(*self.roi)
+        else:
+            if self._source_image is None:
+                self._source_image = self.image
+            source_x, source_y = self._source_image.offset
+            self.image = self._source_image.crop(self.roi[0] - source_x, self.roi[1] - source_y, width, height)
+            self.processed_image = None
+            self.display_image()
+
+    def _reset_roi(self):
+        if self.roi is None:
+            return
+        self.roi = None
+        if self._is_camera_mode and self.thread is not None:
+            self.thread.clear_analysis_roi()
+        elif self._source_image is not None:
+            self.image = self._source_image
+            self.processed_image = None
+            self.display_image()
+        self._source_image = None
+
+    # ==================== Предпросмотр и снимок ====================
+
+    @staticmethod
+    def _set_action_checked(action, checked: bool):
+        action.blockSignals(True)
+        action.setChecked(checked)
+        action.blockSignals(False)
+
+    def _on_binned_preview_toggled(self, checked: bool):
+        """Живой просмотр с биннингом камеры, полное разрешение - по кнопке Snap"""
+        if not self._is_camera_mode or self.thread is None:
+            self._set_action_checked(self.ui.actionBinned_Preview, False)
+            return
+        if checked:
+            self._reset_roi()
+        if not self.thread.set_preview_binning(PREVIEW_BINNING if checked else 1):
+            self._set_action_checked(self.ui.actionBinned_Preview, False)
+            self.statusBar().showMessage(self.tr("Binning is not supported by this camera"), 3000)
+
+    def _show_snap_button(self, show: bool):
+        if show and not self._snap_button_shown:
+            self.ui.add_snap_button()
+            self.ui.snap_pushButton.toggled.connect(self._on_snap_toggled)
+        elif not show and self._snap_button_shown:
+            self.ui.delete_snap_button()
+        self._snap_button_shown = show
+
+    def _on_snap_toggled(self, checked: bool):
+        if self.thread is None:
+            return
+        if checked:
+            # Кадр полного разрешения придёт в _on_snapshot
+            self.thread.request_snapshot()
+        elif not self._check_buttons():
+            self._snapshot_shown = False
+            self._set_camera_paused(False)
+
+    @Slot(object)
+    def _on_snapshot(self, image):
+        """Снимок полного разрешения: стоп-кадр (и измерение, если оно его ждало)"""
+        self._set_camera_paused(True)
+        self.image = image
+        self.processed_image = None
+        self._snapshot_shown = True
+        if self._snap_button_shown:
+            self.ui.snap_pushButton.blockSignals(True)
+            self.ui.snap_pushButton.setChecked(True)
+            self.ui.snap_pushButton.blockSignals(False)
+        self.display_image()
+
+        if self._measure_on_snapshot:
+            self._measure_on_snapshot = False
+            self._calculate_area()
+
+    def _on_high_bit_depth_toggled(self, checked: bool):
+        """Mono10/12/16 вместо Mono8 (применяется и к следующим запускам камеры)"""
+        set_bit_depth = getattr(self.thread, 'set_bit_depth', None)
+        if self._is_camera_mode and set_bit_depth is not None:
+            set_bit_depth(16 if checked else 8)
+
+    def _burst_request(self):
+        """request_burst потока камеры (есть только у GenICam камер)"""
+        if not self._is_camera_mode or self.thread is None:
+            return None
+        request = getattr(self.thread, 'request_burst', None)
+        if request is None:
+            self.statusBar().showMessage(self.tr("Burst capture is not supported by this camera"), 3000)
+        return request
+
+    def _burst_average(self):
+        """Малошумный стоп-кадр: среднее серии кадров"""
+        request = self._burst_request()
+        if request is not None:
+            self._stop_burst_benchmark()
+            request(BURST_FRAMES)
+
+    def _burst_benchmark_start(self):
+        """Время съёмки и снижение шума для серий разной длины"""
+        request = self._burst_request()
+        if request is not None:
+            self._burst_benchmark = []
+            if self._burst_benchmark_timer is None:
+                self._burst_benchmark_timer = QTimer(self)
+                self._burst_benchmark_timer.setSingleShot(True)
+                self._burst_benchmark_timer.timeout.connect(self._on_burst_benchmark_timeout)
+            # Серии снимаются по очереди: следующая запрашивается после burst_ready предыдущей,
+            # иначе время каждой серии включало бы ожидание предыдущих
+            self._burst_benchmark_timer.start(BURST_BENCHMARK_TIMEOUT)
+            request(BURST_BENCHMARK_FRAMES[0])
+
+    def _stop_burst_benchmark(self):
+        """Сброс незавершённого замера серий"""
+        self._burst_benchmark = None
+        if self._burst_benchmark_timer is not None:
+            self._burst_benchmark_timer.stop()
+
+    def _on_burst_benchmark_timeout(self):
+        if self._burst_benchmark is not None:
+            self._stop_burst_benchmark()
+            self.statusBar().showMessage(self.tr("Burst benchmark timed out"), 5000)
+
+    @Slot(str)
+    def _on_burst_failed(self, message):
+        if self._burst_benchmark is not None:
+            self._stop_burst_benchmark()
+            self.statusBar().showMessage(self.tr("Burst benchmark failed: {0}").format(message), 5000)
+            return
+        self.statusBar().showMessage(self.tr("Burst capture failed: {0}").format(message), 5000)
+
+    @Slot(object, object)
+    def _on_burst(self, image, stats):
+        if self._burst_benchmark is not None:
+            self._burst_benchmark.append(stats)
+            done = len(self._burst_benchmark)
+            if done < len(BURST_BENCHMARK_FRAMES):
+                request = self._burst_request()
+                if request is None:
+                    self._stop_burst_benchmark()
+                    return
+                self._burst_benchmark_timer.start(BURST_BENCHMARK_TIMEOUT)
+                request(BURST_BENCHMARK_FRAMES[done])
+                return
+            lines = [
+                self.tr("N={frames}: {time:.0f} ms, noise variance {single:.2f} -> {averaged:.2f} (x{reduction:.1f})").format(
+                    frames=item.frames, time=item.capture_time * 1000, single=item.noise_variance_single,
+                    averaged=item.noise_variance_averaged, reduction=item.variance_reduction)
+                for item in self._burst_benchmark
+            ]
+            self._stop_burst_benchmark()
+            QMessageBox.information(self, self.tr("Burst Benchmark"), '\n'.join(lines))
+            return
+
+        self._on_snapshot(image)
+        self.statusBar().showMessage(
+            self.tr("Averaged {frames} frames in {time:.0f} ms, noise variance x{reduction:.1f} lower").format(
+                frames=stats.frames, time=stats.capture_time * 1000, reduction=stats.variance_reduction),
+            5000)
+
     def _show_about(self):
         QMessageBox.about(
             self,
@@ -86,6 +410,75 @@ class ImageViewer(QMainWindow):
             self.tr("Author: Zhilin Rostislav Romanovich, ©South Ural State University."),
         )
 
+    def _on_performance_overlay_toggled(self, checked: bool):
+        """Частоты захвата и отображения, потери и задержки в строке состояния"""
+        if checked:
+            if self._performance_label is None:
+                self._performance_label = QLabel(self)
+                self.statusBar().addPermanentWidget(self._performance_label)
+                self._performance_timer = QTimer(self)
+                self._performance_timer.timeout.connect(self._update_performance_overlay)
+            self._performance_label.show()
+            self._performance_timer.start(PERFORMANCE_OVERLAY_INTERVAL)
+            self._update_performance_overlay()
+        elif self._performance_label is not None:
+            self._performance_timer.stop()
+            self._performance_label.hide()
+
+    def _update_performance_overlay(self):
+        thread = self.thread
+        if thread is None:
+            self._performance_label.setText(self.tr("No camera"))
+            return
+        acquisition = getattr(thread, 'acquisition_meter', None)
+        acquired = acquisition.frames if acquisition is not None else 0
+        if thread is not self._performance_thread:
+            # Новая камера - статистика отображения с нуля
+            self._performance_thread = thread
+            self._acquired_baseline = acquired
+            self._display_meter.reset()
+            self._display_latency.reset()
+            self._render_time.reset()
+        text = self.tr(
+            "Camera {camera:.1f} fps | Display {display:.1f} fps | Dropped {dropped} | Not shown {skipped} | "
+            "Latency {latency:.0f} ms | Render {render:.1f} ms"
+        ).format(
+            camera=acquisition.fps() if acquisition is not None else 0.0,
+            display=self._display_meter.fps(),
+            dropped=getattr(thread, 'dropped_frames', 0),
+            skipped=max(0, acquired - self._acquired_baseline - self._display_meter.frames),
+            latency=self._display_latency.value * 1000,
+            render=self._render_time.value * 1000,
+        )
+        if self.live_worker is not None:
+            text += self.tr(" | Measure {fps:.1f} fps, {dropped} dropped").format(
+                fps=self.live_worker.measure_fps(), dropped=self.live_worker.dropped_frames)
+        self._performance_label.setText(text)
+
+    def _save_profile(self):
+        """Трасса Chrome (.json) и таблица этапов (.txt) текущего сеанса профилирования"""
+        if not profiler.stages:
+            QMessageBox.information(self, self.tr("Profiling"),
+                                    self.tr("No timings recorded. Enable Help > Profiling first."))
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, self.tr("Save Profile"),
+            os.path.join(os.getcwd(), f'profile_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'),
+            'Chrome Trace (*.json)'
+        )
+        if not path:
+            return
+        summary = profiler.summary()
+        try:
+            profiler.write_chrome_trace(path)
+            with open(Path(path).with_suffix('.txt'), 'w', encoding='utf-8') as f:
+                f.write(summary + '\n')
+        except OSError as e:
+            QMessageBox.warning(self, self.tr("Profiling"), str(e))
+            return
+        print(summary)
+        self.statusBar().showMessage(self.tr("Profile saved to {path}").format(path=path), 5000)
+
     # ==================== Перевод ====================
     def _toggle_language(self):
         # примитивный toggle en <-> ru
@@ -134,7 +527,7 @@ class ImageViewer(QMainWindow):
     def _calibrate_area(self):
         filename = QFileDialog.getOpenFileName(
             self, 'Open file', os.getcwd(),
-            'Image Files (*.png *.jpg *.bmp)'
+            'Image Files (*.png *.jpg *.bmp *.tif *.tiff)'
         )
         if filename[0]:
             length, units = OpenCVToQtAdapter.process_calibration_image(filename[0])
@@ -150,19 +543,32 @@ class ImageViewer(QMainWindow):
             # Режим камеры: управляем стоп-кадром
             if checked:
                 # Включили контуры -> стоп-кадр
-                self._camera_paused = True
+                self._set_camera_paused(True)
             else:
                 # Выключили контуры -> возобновляем видео
                 if not self.ui.pushButton.isChecked():
-                    self._camera_paused = checked
+                    self._set_camera_paused(checked)
                 else:
-                    self._camera_paused = True
+                    self._set_camera_paused(True)
         self.display_image()
 
+    def _set_camera_paused(self, paused: bool):
+        """Стоп-кадр/возобновление без остановки потока камеры"""
+        self._camera_paused = paused
+        if not paused:
+            # Дальше показываются живые кадры, а не снимок
+            self._snapshot_shown = False
+        if self.thread is not None and self.thread.isRunning():
+            if paused:
+                self.thread.pause()
+            else:
+                self.thread.resume()
+
     def _stop_camera(self):
-        """Остановка камеры и захват последнего кадра"""
+        """Стоп-кадр с захватом последнего кадра"""
         if self.thread and self.thread.isRunning():
-            last_image = self.thread.stop()
+            self._set_camera_paused(True)
+            last_image = self.thread.get_last_image()
             if last_image:
                 self.image = last_image
         self.display_image()
@@ -173,7 +579,10 @@ class ImageViewer(QMainWindow):
     def _restart_camera(self):
         """Перезапуск камеры"""
         if not self._check_buttons():
-            if self._camera_cti_file is not None:
+            if self.thread is not None and self.thread.isRunning():
+                # Поток жив - достаточно возобновить выдачу кадров
+                self._set_camera_paused(False)
+            elif self._camera_cti_file is not None:
                 # Hikrobot камера
                 self._start_hikrobot_camera()
             elif self._camera_index is not None:
@@ -188,8 +597,17 @@ class ImageViewer(QMainWindow):
             self.thread = None
 
         self.thread = HikrobotThread(self._camera_cti_file, camera_index=self._camera_index)
+        self.thread.bit_depth = 16 if self.ui.actionHigh_Bit_Depth.isChecked() else 8
         self.thread.error_occurred.connect(lambda msg: print(f"Error: {msg}"))
         self.thread.frame_ready.connect(self.display_video_slot)
+        self.thread.burst_ready.connect(self._on_burst)
+        self.thread.burst_failed.connect(self._on_burst_failed)
+        self._stop_burst_benchmark()
+        self.thread.snapshot_ready.connect(self._on_snapshot)
+        self._attach_live_worker()
+        self.roi = None
+        self._set_action_checked(self.ui.actionBinned_Preview, False)
+        self._show_snap_button(True)
         self.thread.start()
 
     def _start_video_camera(self):
@@ -201,36 +619,132 @@ class ImageViewer(QMainWindow):
 
         self.thread = VideoThread(self._camera_index)
         self.thread.frame_ready.connect(self.display_video_slot)
+        self.thread.snapshot_ready.connect(self._on_snapshot)
+        self._attach_live_worker()
+        self.roi = None
+        self._set_action_checked(self.ui.actionBinned_Preview, False)
+        self._show_snap_button(True)
         self.thread.start()
 
+    # ==================== Живое измерение ====================
+
+    def _on_live_measurement_toggled(self, checked: bool):
+        """Включение/выключение измерения площади на каждом кадре"""
+        if checked:
+            self._live_measurements.clear()
+        self._update_live_worker()
+        if not checked:
+            self.ui.statusbar.clearMessage()
+
+    def _on_gamma_tracking_toggled(self, checked: bool):
+        """Непрерывная автогамма на живом видео"""
+        self._update_live_worker()
+
+    def _update_live_worker(self):
+        """Запуск/остановка обработчика кадров по включённым режимам"""
+        measure = self.ui.actionLive_Measurement.isChecked()
+        tracking = self.ui.actionGamma_Tracking.isChecked()
+
+        if not measure and not tracking:
+            if self.live_worker is not None:
+                if self.thread is not None:
+                    try:
+                        self.thread.frame_ready.disconnect(self.live_worker.submit)
+                    except (RuntimeError, TypeError):
+                        pass
+                self.live_worker.stop()
+                self.live_worker = None
+            return
+
+        if self.live_worker is None:
+            self.live_worker = LiveMeasurementWorker()
+            self.live_worker.measurement_ready.connect(self._on_live_measurement)
+            self.live_worker.gamma_changed.connect(self._on_tracked_gamma)
+            self.live_worker.set_gamma(self.gamma)
+            self.live_worker.start()
+            self._attach_live_worker()
+
+        self.live_worker.measure_enabled = measure
+        if tracking and self.live_worker.gamma_tracker is None:
+            self.auto_gamma_flag = False
+            self.live_worker.set_gamma_tracker(GammaTracker())
+        elif not tracking:
+            self.live_worker.set_gamma_tracker(None)
+
+    @Slot(float)
+    def _on_tracked_gamma(self, gamma: float):
+        """Гамма от слежения: обновляем подпись и слайдер без перерисовки"""
+        self.gamma = gamma
+        self.ui.gamma_label.setText(f'{self.gamma:.2f}')
+        self.ui.gamma_slider.blockSignals(True)
+        self.ui.gamma_slider.setValue(int(self.gamma * 10))
+        self.ui.gamma_slider.blockSignals(False)
+
+    def _attach_live_worker(self):
+        """Подключение измерителя к текущему потоку камеры"""
+        if self.streams:
+            # Новый поток основной камеры или измеритель получают свою долю ядер
+            self._rebalance_streams()
+        if self.live_worker is None or self.thread is None:
+            return
+        # Кадры передаются прямо из потока камеры, минуя GUI
+        self.thread.frame_ready.connect(self.live_worker.submit, Qt.DirectConnection)
+
+    @Slot(object)
+    def _on_live_measurement(self, measurement):
+        self._live_measurements.append(measurement)
+        mean_fraction = sum(m.area_fraction for m in self._live_measurements) / len(self._live_measurements)
+        self.ui.statusbar.showMessage(
+            self.tr(
+                "Area: {area:.3f}% (mean {mean:.3f}%) | Contours: {contours} | "
+                "{fps:.1f} fps | latency {latency:.0f} ms | dropped {dropped}"
+            ).format(
+                area=measurement.area_fraction * 100,
+                mean=mean_fraction * 100,
+                contours=measurement.contours_count,
+                fps=measurement.fps,
+                latency=measurement.latency * 1000,
+                dropped=self.live_worker.dropped_frames if self.live_worker else 0,
+            )
+        )
+
     # ==================== Подключение камер ====================
 
-    def _connect_cti_file(self):
-        """Подключение Hikrobot камеры"""
+    def _choose_genicam_camera(self):
+        """Выбор CTI файла и устройства; (cti_file, index) или None"""
         filename = QFileDialog.getOpenFileName(self, 'Open file', '/', 'Cti File (*.cti)')
 
         if not filename[0]:
-            return
+            return None
 
-        devices = HikrobotThread.get_devices(filename[0])
+        # Явный выбор CTI файла - повторно опрашиваем устройства
+        devices = HikrobotThread.get_devices(filename[0], refresh=True)
         print(devices)
 
         if not devices:
             print("No devices found")
-            return
+            return None
 
         ids = [int(device.split(':')[0].split()[1]) for device in devices]
         models = [device.split(':')[1] for device in devices]
         modal = ChooseCameraLogic(parent=self, inputs={'ids': ids, 'names': models})
         thread_id = modal.get_chosen_camera()
+        if thread_id is None:
+            return None
+        return filename[0], thread_id
 
-        if thread_id is not None:
+    def _connect_cti_file(self):
+        """Подключение Hikrobot камеры"""
+        chosen = self._choose_genicam_camera()
+
+        if chosen is not None:
+            cti_file, thread_id = chosen
             # Останавливаем предыдущий поток
             if self.thread is not None:
                 self.thread.stop()
 
             # Сохраняем параметры камеры
-            self._camera_cti_file = filename[0]
+            self._camera_cti_file = cti_file
             self._camera_index = thread_id
             self._is_camera_mode = True
 
@@ -261,6 +775,65 @@ class ImageViewer(QMainWindow):
             # Запускаем камеру
             self._start_video_camera()
 
+    # ==================== Многокамерный режим ====================
+
+    def _add_camera_stream(self):
+        """Дополнительная USB камера, работающая одновременно с основной"""
+        modal = ChooseCameraLogic(parent=self)
+        index = modal.get_chosen_camera()
+        if index is not None:
+            self._add_stream(CameraStream(f'USB {index}', VideoThread(index),
+                                          num_buffers=STREAM_NUM_BUFFERS, max_rate=STREAM_MEASURE_RATE))
+
+    def _add_genicam_stream(self):
+        """Дополнительная GenICam камера, работающая одновременно с основной"""
+        chosen = self._choose_genicam_camera()
+        if chosen is not None:
+            cti_file, index = chosen
+            if HarvesterSession.get(cti_file).in_use(index):
+                QMessageBox.warning(self, self.tr("Camera is busy"),
+                                    self.tr("This camera is already running in another view"))
+                return
+            thread = HikrobotThread(cti_file, camera_index=index)
+            thread.error_occurred.connect(lambda msg: print(f"Error: {msg}"))
+            self._add_stream(CameraStream(f'GenICam {index}', thread,
+                                          num_buffers=STREAM_NUM_BUFFERS, max_rate=STREAM_MEASURE_RATE))
+
+    def _add_stream(self, stream: CameraStream):
+        if self._tile_view is None:
+            self._tile_view = CameraTileView(self)
+            self._tile_view.closed.connect(self._stop_streams)
+        self._tile_view.add_stream(stream)
+        self._tile_view.show()
+
+        self.streams.append(stream)
+        self._rebalance_streams()
+        stream.start()
+
+    def _rebalance_streams(self):
+        """Раздел ядер CPU между основной камерой и дополнительными (одна камера - без привязки)"""
+        pairs = [(stream.thread, stream.worker) for stream in self.streams]
+        if self.thread is not None:
+            pairs.insert(0, (self.thread, self.live_worker))
+        if len(pairs) > 1:
+            plan = plan_stream_affinity(len(pairs))
+        else:
+            plan = [(None, None)] * len(pairs)
+
+        for (thread, worker), (acquisition_cores, processing_cores) in zip(pairs, plan):
+            pin_thread(thread, acquisition_cores)
+            if worker is not None:
+                pin_thread(worker, processing_cores)
+
+    def _stop_streams(self):
+        for stream in self.streams:
+            stream.stop()
+        self.streams = []
+        self._rebalance_streams()
+        if self._tile_view is not None:
+            self._tile_view.deleteLater()
+            self._tile_view = None
+
     # ==================== Отображение ====================
 
     @Slot(object)
@@ -272,35 +845,71 @@ class ImageViewer(QMainWindow):
         if self._camera_paused:
             return
         self.image = image
-        pixmap = self._get_pixmap(apply_contours=False)
-        self._set_pixmap(pixmap)
+        self._snapshot_shown = False
+
+        # Неизменившийся кадр с теми же настройками отображения не перерисовываем
+        render_key = (self.gamma, self.ui.pushButton.isChecked(), id(self.processed_image),
+                      self.ui.pixmap_label.width(), self.ui.pixmap_label.height())
+        if image.is_static and render_key == self._last_render_key:
+            return
+        self._last_render_key = render_key
+
+        start = time.perf_counter()
+        self._show_image(apply_contours=False)
+        end = time.perf_counter()
+        self._display_meter.tick(end)
+        self._render_time.add(end - start)
+        if image.timestamp is not None:
+            self._display_latency.add(end - image.timestamp)
 
     def display_image(self):
         """Отображает изображение (файл или стоп-кадр)"""
         if self.image is None:
             return
+        self._last_render_key = None
 
         apply_contours = self.ui.apply_countour_button.isChecked()
-        pixmap = self._get_pixmap(apply_contours=apply_contours)
-        self._set_pixmap(pixmap)
+        self._show_image(apply_contours=apply_contours)
         self.image_init_flag = True
 
+    def _show_image(self, apply_contours: bool):
+        with profiler.stage('display'):
+            self._render(apply_contours)
+
+    def _render(self, apply_contours: bool):
+        if self._zoom_view is not None and self._zoom_view.isVisible():
+            # Контуры рисуются просмотром по тайлам, а не на полном кадре
+            image = self._get_display_image(apply_contours, draw_contours=False)
+            self._zoom_view.set_image(image.get_view_image(), image.get_contours() if apply_contours else None)
+        else:
+            self._set_pixmap(self._get_pixmap(apply_contours=apply_contours))
+
     def _get_pixmap(self, apply_contours: bool):
         """Получение pixmap с применением фильтров"""
-        # Выбираем базовое изображение
-        if self.ui.pushButton.isChecked():
+        image = self._get_display_image(apply_contours)
+        return image.get_pixmap(use_contours=apply_contours, converter=self._frame_converter)
+
+    def _configure_pipeline(self):
+        """Источник и параметры предобработки конвейера по текущему состоянию UI"""
+        self.pipeline.set_source(self.image)
+        if self.ui.pushButton.isChecked() or self.processed_image is not None:
             # Режим stretch_bright_region
-            image = self.image.stretch_bright_region(threshold=self.first_parameter)
-        elif self.processed_image is not None:
-            image = self.processed_image
+            self.pipeline.set_params('preprocess', mode=ProcessingPipeline.STRETCH, threshold=self.first_parameter)
         else:
-            image = self.image.apply_gamma(self.gamma)
+            self.pipeline.set_params('preprocess', mode=ProcessingPipeline.GAMMA, gamma=self.gamma)
+
+    def _get_display_image(self, apply_contours: bool, draw_contours: bool = True):
+        """Изображение для отображения с применением фильтров"""
+        self._configure_pipeline()
+        image = self.pipeline.get('preprocess')
 
         # Применяем контуры если нужно
         if apply_contours:
-            image = image.apply_contours()
+            image.contours = self.pipeline.get('contours')
+            if draw_contours:
+                image.image_with_contours = self.pipeline.get('overlay')
 
-        return image.get_pixmap(use_contours=apply_contours)
+        return image
 
     def _set_pixmap(self, pixmap):
         """Установка pixmap с масштабированием"""
@@ -316,13 +925,28 @@ class ImageViewer(QMainWindow):
         else:
             label.setPixmap(pixmap)
 
+    def _on_zoomable_viewer_toggled(self, checked: bool):
+        """Переключение между pixmap_label и просмотром с масштабированием"""
+        if checked and self._zoom_view is None:
+            self._zoom_view = ZoomableImageView(self.ui.centralwidget)
+            self._zoom_view.setMinimumSize(QSize(200, 200))
+            self._zoom_view.roi_selected.connect(self._on_zoom_view_roi)
+            self._zoom_view.set_roi_mode(self.ui.actionSelect_ROI.isChecked())
+            layout = self.ui.verticalLayout
+            layout.insertWidget(layout.indexOf(self.ui.pixmap_label) + 1, self._zoom_view)
+        if self._zoom_view is not None:
+            self._zoom_view.setVisible(checked)
+        self.ui.pixmap_label.setVisible(not checked)
+        self._last_render_key = None
+        self.display_image()
+
     # ==================== Открытие файла ====================
 
     def _open_file(self):
         """Открытие файла изображения"""
         filename = QFileDialog.getOpenFileName(
             self, 'Open file', os.getcwd(),
-            'Image Files (*.png *.jpg *.bmp)'
+            'Image Files (*.png *.jpg *.bmp *.tif *.tiff)'
         )
 
         if filename[0]:
@@ -336,13 +960,56 @@ class ImageViewer(QMainWindow):
             self._camera_cti_file = None
             self._camera_index = None
 
-            # Загружаем изображение
+            # Загружаем изображение: сначала быстрый уменьшенный предпросмотр,
+            # полное разрешение декодируется в фоне
             self.filename = filename[0]
-            self.image = Image(self.filename)
+            label = self.ui.pixmap_label
+            preview, _ = read_reduced(self.filename, max(label.width(), label.height()))
+            if preview is not None:
+                self.image = Image(self.filename, preview)
+                self._start_full_image_load(self.filename)
+            else:
+                self._image_loader = None
+                self.image = Image(self.filename)
             self.processed_image = None
+            self.roi = None
+            self._source_image = None
+            self._set_action_checked(self.ui.actionBinned_Preview, False)
+            self._show_snap_button(False)
 
             self.display_image()
 
+    def _start_full_image_load(self, path: str):
+        loader = ImageLoadThread(path, self)
+        loader.loaded.connect(self._on_full_image_loaded)
+        loader.finished.connect(loader.deleteLater)
+        self._image_loader = loader
+        loader.start()
+
+    @Slot(object)
+    def _on_full_image_loaded(self, image):
+        """Замена предпросмотра полным разрешением (результаты устаревших загрузок игнорируются)"""
+        loader = self._image_loader
+        if loader is None or image is None or image is not loader.image:
+            return
+        self._image_loader = None
+        if self._is_camera_mode or image.image_path != self.filename:
+            return
+        self.image = image
+        if self.processed_image is not None:
+            self.processed_image = self.image.stretch_bright_region(threshold=self.first_parameter)
+        self.display_image()
+
+    def _ensure_full_image(self):
+        """Дождаться полного разрешения перед измерениями"""
+        loader = self._image_loader
+        if loader is None:
+            return
+        loader.wait()
+        self._on_full_image_loaded(loader.image)
+        # Декодирование не удалось - остаёмся на предпросмотре, но больше не ждём
+        self._image_loader = None
+
     # ==================== Остальные методы ====================
 
     def _slider_move(self):
@@ -350,13 +1017,16 @@ class ImageViewer(QMainWindow):
             gamma = self.ui.gamma_slider.value() / 10.0
             self.gamma = gamma
             self.ui.gamma_label.setText(str(gamma))
+            if self.live_worker is not None:
+                self.live_worker.set_gamma(gamma)
         self.display_image()
 
     def _apply_second_auto_gamma(self):
         if self._is_camera_mode:
-            self._camera_paused=True
+            self._set_camera_paused(True)
 
         self.ui.pushButton.setChecked(False)
+        self._ensure_full_image()
         self.gamma = self.image.gamma_from_high_percentile(target=self.second_parameter)
         self._update_gamma()
         self.display_image()
@@ -364,12 +1034,13 @@ class ImageViewer(QMainWindow):
     def _apply_first_auto_gamma_toggled(self, checked: bool):
         if self._is_camera_mode:
             if not self.ui.apply_countour_button.isChecked():
-                self._camera_paused = checked
+                self._set_camera_paused(checked)
             else:
-                self._camera_paused = True
+                self._set_camera_paused(True)
 
         if checked:
             self.auto_gamma_flag = False
+            self._ensure_full_image()
             self.processed_image = self.image.stretch_bright_region(threshold=self.first_parameter)
         else:
             self.processed_image = None
@@ -386,10 +1057,10 @@ class ImageViewer(QMainWindow):
 
         selected_methods = dialog.get_selected_methods()
 
-        # ===== ШАГ 2: Выбор файлов =====
-        filenames, _ = QFileDialog.getOpenFileNames(
+        # ===== ШАГ 2: Выбор файлов (с миниатюрами) =====
+        filenames = ImageFilesDialog.get_open_file_names(
             self, 'Select Images', os.getcwd(),
-            'Image Files (*.png *.jpg *.bmp)'
+            'Image Files (*.png *.jpg *.bmp *.tif *.tiff *.npy)'
         )
         if not filenames:
             return
@@ -407,95 +1078,111 @@ class ImageViewer(QMainWindow):
         progress.setWindowModality(Qt.WindowModal)
         progress.setWindowTitle('Batch Processing')
 
-        results = []
-        step = 0
-
-        for i, filename in enumerate(filenames):
-            if progress.wasCanceled():
-                break
+        processor = BatchProcessor(
+            selected_methods,
+            unit_factor=self.unit_factor,
+            unit_name=self.unit_name,
+            first_parameter=self.first_parameter,
+            second_parameter=self.second_parameter,
+            per_image_calibration=dialog.get_per_image_calibration(),
+        )
 
-            for method in selected_methods:
-                if progress.wasCanceled():
-                    break
+        def report_progress(step, filename, method):
+            progress.setLabelText(
+                f'Processing {os.path.basename(filename)}\n'
+                f'Method: {method.value}'
+            )
+            progress.setValue(step)
 
-                progress.setLabelText(
-                    f'Processing {os.path.basename(filename)}\n'
-                    f'Method: {method.value}'
-                )
-                progress.setValue(step)
-                step += 1
-
-                # Каждый метод работает с чистой копией изображения
-                temp_image = Image(filename)
-                gamma = 1.0
-
-                # ===== ШАГ 3: Применение метода =====
-                if method == PreprocessMethod.GAMMA_BY_AREA:
-                    gamma = temp_image.calculate_gamma_from_contour_graph_with_log_deriv(
-                        max_gamma=15, modal_window=None
-                    )
-                    temp_image = temp_image.apply_gamma(gamma)
-
-                elif method == PreprocessMethod.GAMMA_BY_PERCENTILE:
-                    gamma = temp_image.gamma_from_high_percentile(
-                        target=self.second_parameter
-                    )
-                    temp_image = temp_image.apply_gamma(gamma)
-
-                elif method == PreprocessMethod.STRETCH_BRIGHT:
-                    temp_image = temp_image.stretch_bright_region(
-                        threshold=self.first_parameter
-                    )
-                    gamma = 0.0
-
-
-                elif method == PreprocessMethod.NO_PREPROCESSING:
-                    gamma = 1.0
-
-                # ===== ШАГ 4: Расчёт площади =====
-                sum_of_areas, areas_units = temp_image.calculate_area(self.unit_factor)
-                contours = temp_image.get_contours()
-
-                results.append({
-                    'filename': os.path.basename(filename),
-                    'method': method.value,
-                    'gamma': round(gamma, 4),
-                    'area_px': sum_of_areas,
-                    'area_units': round(areas_units, 4) if self.unit_factor else 0,
-                    'unit_name': self.unit_name or 'N/A',
-                    'contours_count': len(contours)
-                })
+        results = processor.process(filenames, progress_callback=report_progress,
+                                    is_canceled=progress.wasCanceled)
 
         progress.setValue(total_steps)
 
         if results:
-            with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['filename', 'method', 'gamma', 'area_px',
-                              'area_units', 'unit_name', 'contours_count']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(results)
+            summary_paths = processor.write(csv_path)
+            summary_str = '\n'.join(summary_paths)
 
             methods_str = '\n'.join(f'  • {m.value}' for m in selected_methods)
             QMessageBox.information(
                 self, 'Success',
                 f'Processed {len(filenames)} images × {len(selected_methods)} methods\n'
-                f'Total rows: {len(results)}\n\n'
+                f'Total rows: {len(results)}\n'
+                f'Loading: {processor.prefetch_stats.summary()}\n\n'
                 f'Methods used:\n{methods_str}\n\n'
-                f'Results saved to:\n{csv_path}'
+                f'Results saved to:\n{csv_path}\n\n'
+                f'Summary saved to:\n{summary_str}'
             )
 
+    def _analyze_large_image(self):
+        """Потайловый анализ гигапиксельного изображения выбранными методами"""
+        filename, _ = QFileDialog.getOpenFileName(
+            self, 'Open file', os.getcwd(),
+            'Large Images (*.bmp *.npy *.png *.tif *.tiff)'
+        )
+        if not filename:
+            return
+
+        dialog = PreprocessMethodDialog(self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        methods = dialog.get_selected_methods()
+
+        analyzer = TiledAnalyzer(open_tile_source(filename))
+        tiles = analyzer.tile_count()
+        progress = QProgressDialog('Scanning image...', 'Cancel', 0, tiles * (len(methods) + 1), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setWindowTitle('Tiled Analysis')
+
+        analyzer.scan(progress=lambda done, total: progress.setValue(done))
+        results = []
+        for index, method in enumerate(methods):
+            if progress.wasCanceled():
+                break
+            progress.setLabelText(f'Method: {method.value}')
+            offset = tiles * (index + 1)
+            results.append(analyzer.analyze(
+                method, self.first_parameter, self.second_parameter,
+                progress=lambda done, total: progress.setValue(offset + done),
+                is_canceled=progress.wasCanceled,
+            ))
+        progress.setValue(progress.maximum())
+
+        # Вместо гигапиксельного изображения показываем уменьшенную копию
+        if not self._is_camera_mode:
+            self.filename = filename
+            self._image_loader = None
+            self.image = Image(filename, analyzer.get_overview())
+            self.processed_image = None
+            self.roi = None
+            self._source_image = None
+            self.display_image()
+
+        lines = [self.tr("{width}x{height} px, {tiles} tiles").format(
+            width=analyzer.width, height=analyzer.height, tiles=tiles)]
+        for result in results:
+            area = f'{result.area_px:.0f} px'
+            if self.unit_factor:
+                area += f' = {result.area_px * self.unit_factor ** 2:.4f} {self.unit_name}'
+            lines.append(self.tr("{method}: {area}, {count} contours ({border} across tile borders)").format(
+                method=result.method, area=area, count=result.contours_count, border=result.border_objects))
+        QMessageBox.information(self, self.tr("Tiled Analysis"), '\n'.join(lines))
+
     def _calculate_area(self):
+        # В предпросмотре с биннингом измеряем снимок полного разрешения
+        if (self._is_camera_mode and self.thread is not None and not self._snapshot_shown
+                and self.ui.actionBinned_Preview.isChecked()):
+            self._measure_on_snapshot = True
+            self.thread.request_snapshot()
+            return
+
+        self._ensure_full_image()
         message_box = QMessageBox()
 
-        if self.processed_image is not None:
-            self.processed_image.apply_contours()
-            contours = self.processed_image.get_contours()
-            sum_of_areas, areas_units = self.processed_image.calculate_area(self.unit_factor)
-        else:
-            self.image.apply_contours()
-            contours = self.image.get_contours()
-            sum_of_areas, areas_units = self.image.calculate_area(self.unit_factor)
+        self._configure_pipeline()
+        contours = self.pipeline.get('contours')
+        measurements = self.pipeline.get('measurements')
+        sum_of_areas, areas_units = measurements.area(self.unit_factor)
 
         if areas_units > 0:
             message_box.setIcon(QMessageBox.Information)
@@ -527,11 +1214,16 @@ class ImageViewer(QMainWindow):
             )
         else:
             return
+        if self.roi is not None:
+            message_box.setText(message_box.text() + '\n' + self.tr(
+                "ROI: {w}x{h} at ({x}, {y}), {fraction:.3f}% of the full frame").format(
+                x=self.roi[0], y=self.roi[1], w=self.roi[2], h=self.roi[3],
+                fraction=measurements.area_fraction * 100))
         message_box.exec()
 
     def _auto_gamma_by_area(self):
         if self._is_camera_mode:
-            self._camera_paused = True
+            self._set_camera_paused(True)
         progress_dialog = QProgressDialog()
         progress_dialog.setWindowTitle('Auto gamma')
         progress_dialog.setValue(0)
@@ -541,25 +1233,95 @@ class ImageViewer(QMainWindow):
         progress_dialog.setMinimum(0)
         progress_dialog.setCancelButton(None)
 
+        self._ensure_full_image()
         image = self.image.clone()
         gamma = image.calculate_gamma_from_contour_graph_with_log_deriv(max_gamma=15, modal_window=progress_dialog)
         self.gamma = gamma
         self._update_gamma()
         if self._is_camera_mode:
-            self._camera_paused = True
+            self._set_camera_paused(True)
         self.display_image()
 
     def _update_gamma(self):
         self.ui.gamma_label.setText(f'{self.gamma:.2f}')
         self.ui.gamma_slider.setValue(int(self.gamma * 10))
+        if self.live_worker is not None:
+            self.live_worker.set_gamma(self.gamma)
 
     def closeEvent(self, event):
         """Закрытие приложения"""
+        if self._tile_view is not None:
+            self._tile_view.closed.disconnect(self._stop_streams)
+        self._stop_streams()
         if self.thread:
             self.thread.stop()
+        if self.live_worker is not None:
+            self.live_worker.stop()
+        HarvesterSession.reset_all()
         event.accept()
 
 
+class CameraTile(QWidget):
+    '''Плитка одной камеры: живой кадр и результат измерения'''
+
+    def __init__(self, name: str, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.image_label = QLabel(self)
+        self.image_label.setMinimumSize(QSize(160, 120))
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.status_label = QLabel(name, self)
+        self._converter = FrameConverter()
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.image_label, 1)
+        layout.addWidget(self.status_label)
+
+    @Slot(object)
+    def show_frame(self, image):
+        # Неизменившийся кадр не перерисовываем
+        if image.is_static and self.image_label.pixmap() is not None:
+            return
+        pixmap = image.get_pixmap(use_processed=False, use_contours=False, converter=self._converter)
+        self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio,
+                                                 Qt.FastTransformation))
+
+    @Slot(object)
+    def show_measurement(self, measurement):
+        self.status_label.setText(
+            self.tr("{name}: area {fraction:.2f}%, contours {contours}, {fps:.1f} fps").format(
+                name=self.name, fraction=measurement.area_fraction * 100,
+                contours=measurement.contours_count, fps=measurement.fps)
+        )
+
+
+class CameraTileView(QWidget):
+    '''Окно с плитками всех дополнительных камер'''
+    closed = Signal()
+
+    COLUMNS = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle(self.tr("Camera Streams"))
+        self.resize(800, 600)
+        self.grid = QGridLayout(self)
+        self.tiles = []
+
+    def add_stream(self, stream: CameraStream):
+        tile = CameraTile(stream.name, self)
+        index = len(self.tiles)
+        self.grid.addWidget(tile, index // self.COLUMNS, index % self.COLUMNS)
+        self.tiles.append(tile)
+        # Плитка живёт в потоке GUI - сигналы потоков камеры придут через очередь
+        stream.thread.frame_ready.connect(tile.show_frame)
+        stream.worker.measurement_ready.connect(tile.show_measurement)
+
+    def closeEvent(self, event):
+        self.closed.emit()
+        super().closeEvent(event)
+
+
 class ChooseCameraLogic(QDialog):
     def __init__(self, parent=None, inputs: dict = None):
         super().__init__(parent=parent)
@@ -594,6 +1356,8 @@ class ChooseCameraLogic(QDialog):
 
 
 if __name__ == "__main__":
+    metrics.start_from_environment()
+    register_cache_metrics()
     app = QApplication(sys.argv)
     viewer = ImageViewer()
     viewer.show()
@@ -0,0 +1,659 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ObjectClasses import Image, ProcessingPipeline
+from image_cache import decoded_image_cache, register_cache_metrics
+from metrics import metrics
+from profiling import profiler
+from tiling import NpyTileSource, TiledAnalyzer, open_tile_source
+from utils import CalibrationCache, OpenCVToQtAdapter, PreprocessMethod, calibration_cache
+
+
+class RunningStats:
+    '''Потоковые среднее и дисперсия (алгоритм Уэлфорда),
+     без хранения самих значений'''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update_many(self, values: np.ndarray):
+        """Добавляет пачку значений (объединение по формуле Чана)"""
+        values = np.asarray(values, dtype=np.float64)
+        n_b = values.size
+        if n_b == 0:
+            return
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self._m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def variance(self) -> float:
+        """Выборочная дисперсия (ddof=1)"""
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class LogHistogram:
+    '''Гистограмма с фиксированными логарифмическими интервалами.
+     Первый и последний элементы counts - выходы за нижнюю/верхнюю границу'''
+
+    def __init__(self, low: float = 1.0, high: float = 1e7, bins_per_decade: int = 4):
+        decades = math.log10(high) - math.log10(low)
+        n_bins = max(1, int(round(decades * bins_per_decade)))
+        self.edges = np.logspace(math.log10(low), math.log10(high), n_bins + 1)
+        self.counts = np.zeros(n_bins + 2, dtype=np.int64)
+
+    def update_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        # 0 -> underflow, len(edges) -> overflow
+        indices = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(indices, minlength=self.counts.size)
+
+
+class InclusionStatistics:
+    '''Агрегированная статистика включений для одного метода предобработки'''
+
+    def __init__(self):
+        self.images = 0
+        self.inclusions = 0
+        self.total_area_px = 0.0
+        self.total_image_px = 0
+        self.area_fraction = RunningStats()
+        self.count = RunningStats()
+        self.inclusion_area = RunningStats()
+        self.histogram = LogHistogram()
+
+    def update(self, contour_areas: np.ndarray, image_px: int):
+        """Учитывает одно изображение: площади его контуров (px) и число пикселей"""
+        contour_areas = np.asarray(contour_areas, dtype=np.float64)
+        area_px = float(contour_areas.sum())
+
+        self.images += 1
+        self.inclusions += contour_areas.size
+        self.total_area_px += area_px
+        self.total_image_px += image_px
+
+        self.area_fraction.update(area_px / image_px if image_px else 0.0)
+        self.count.update(contour_areas.size)
+        self.inclusion_area.update_many(contour_areas)
+        self.histogram.update_many(contour_areas)
+
+    @property
+    def total_area_fraction(self) -> float:
+        if not self.total_image_px:
+            return 0.0
+        return self.total_area_px / self.total_image_px
+
+    def as_row(self) -> dict:
+        inclusion_area = self.inclusion_area
+        return {
+            'images': self.images,
+            'inclusions': self.inclusions,
+            'total_area_px': round(self.total_area_px, 4),
+            'total_image_px': self.total_image_px,
+            'total_area_fraction': round(self.total_area_fraction, 6),
+            'mean_area_fraction': round(self.area_fraction.mean, 6),
+            'std_area_fraction': round(self.area_fraction.std, 6),
+            'mean_contours_count': round(self.count.mean, 4),
+            'std_contours_count': round(self.count.std, 4),
+            'mean_inclusion_area_px': round(inclusion_area.mean, 4),
+            'std_inclusion_area_px': round(inclusion_area.std, 4),
+            'min_inclusion_area_px': inclusion_area.min if inclusion_area.count else 0,
+            'max_inclusion_area_px': inclusion_area.max if inclusion_area.count else 0,
+        }
+
+
+class BatchStatistics:
+    '''Статистика пакетной обработки по каждому методу.
+     Обновляется после каждого изображения, контуры не хранятся'''
+
+    def __init__(self):
+        self.methods: Dict[str, InclusionStatistics] = {}
+
+    def update(self, method: str, contour_areas: np.ndarray, image_px: int):
+        if method not in self.methods:
+            self.methods[method] = InclusionStatistics()
+        self.methods[method].update(contour_areas, image_px)
+
+    def write(self, csv_path: str) -> List[str]:
+        """
+        Сохраняет сводку рядом с CSV результатов:
+        <имя>_summary.csv (по строке на метод) и <имя>_histogram.csv
+
+        Returns:
+            List[str]: Пути к записанным файлам
+        """
+        if not self.methods:
+            return []
+
+        base = Path(csv_path)
+        summary_path = base.with_name(f'{base.stem}_summary.csv')
+        histogram_path = base.with_name(f'{base.stem}_histogram.csv')
+
+        rows = [{'method': method, **stats.as_row()} for method, stats in self.methods.items()]
+        with open(summary_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+        edges = next(iter(self.methods.values())).histogram.edges
+        lows = [0.0, *edges]
+        highs = [*edges, math.inf]
+        with open(histogram_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['bin_low_px', 'bin_high_px', *self.methods.keys()])
+            for i, (low, high) in enumerate(zip(lows, highs)):
+                writer.writerow([
+                    round(low, 4), round(high, 4),
+                    *(int(stats.histogram.counts[i]) for stats in self.methods.values())
+                ])
+
+        return [str(summary_path), str(histogram_path)]
+
+
+class CalibrationSource:
+    """Значения колонки calibration_source в CSV"""
+    MANUAL = 'manual'
+    SCALE_BAR = 'scale_bar'
+    SCALE_BAR_CACHED = 'scale_bar_cached'
+    NONE = 'none'
+
+
+class ScaleBarCalibrator:
+    '''Определение масштаба по линейке каждого изображения.
+     OCR выполняется в отдельном пуле потоков (Tesseract - внешний процесс),
+     одинаковые кропы линеек распознаются один раз'''
+
+    def __init__(self, max_workers: int = 2, cache: CalibrationCache = calibration_cache):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr')
+        self._pending: Dict[str, Future] = {}
+
+    def submit(self, image: np.ndarray) -> Tuple[Future, bool]:
+        """
+        Ставит распознавание линейки в очередь
+
+        Returns:
+            (Future с (длина, подпись), True если результат переиспользован)
+        """
+        return self.submit_thresh(OpenCVToQtAdapter.binarize_scale_bar(image))
+
+    def submit_thresh(self, thresh: np.ndarray) -> Tuple[Future, bool]:
+        """submit() для уже бинаризованной области линейки"""
+        key = CalibrationCache.key(thresh)
+
+        if key in self._pending:
+            return self._pending[key], True
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            self._pending[key] = future
+            return future, True
+
+        future = self._executor.submit(self._recognize, key, thresh)
+        self._pending[key] = future
+        return future, False
+
+    def _recognize(self, key: str, thresh: np.ndarray):
+        length, units = OpenCVToQtAdapter.recognize_scale_bar(thresh)
+        if units:
+            self.cache.put(key, length, units)
+        return length, units
+
+    @staticmethod
+    def unit_factor_from(length: float, units: list) -> Tuple[Optional[float], Optional[str]]:
+        """Перевод результата OCR в (множитель, единицы); (None, None) если не распознано"""
+        if length <= 0 or len(units) < 2:
+            return None, None
+        return int(units[0]) / length, units[1]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+
+
+@dataclass
+class PrefetchStats:
+    """Статистика упреждающей загрузки файлов"""
+    files: int = 0
+    load_time: float = 0.0  # суммарное время декодирования в потоках ввода-вывода, с
+    io_wait: float = 0.0  # время, которое обработка простояла в ожидании файла, с
+    peak_bytes: int = 0  # максимум декодированных, но ещё не обработанных данных
+
+    def summary(self) -> str:
+        return (f'{self.files} files, decode {self.load_time:.2f} s, '
+                f'waiting for I/O {self.io_wait:.2f} s, peak prefetch {self.peak_bytes / 1024 ** 2:.0f} MB')
+
+
+class ImagePrefetcher:
+    '''Упреждающее декодирование следующих файлов в потоках ввода-вывода
+     (cv.imread отпускает GIL), пока текущий обрабатывается. Очередь
+     ограничена числом файлов и объёмом декодированных данных; хотя бы
+     следующий файл загружается всегда'''
+
+    def __init__(self, filenames: List[str], loader: Callable[[str], object], depth: int = 4,
+                 max_bytes: int = 1024 ** 3, workers: int = 2):
+        self.filenames = list(filenames)
+        self.loader = loader
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.stats = PrefetchStats()
+        self._decode_metric = metrics.counter('batch_decode_seconds_total', 'Time spent decoding batch files')
+        self._io_wait_metric = metrics.counter('batch_io_wait_seconds_total',
+                                               'Time batch processing waited for file loading')
+        # Оценка объёма ещё не загруженного файла - самый большой из уже загруженных;
+        # None - ни один файл ещё не загружен
+        self._estimate: Optional[int] = None
+
+    @staticmethod
+    def _nbytes(item) -> int:
+        image = item.get_image() if isinstance(item, Image) else None
+        return image.nbytes if image is not None else 0
+
+    def _timed_load(self, filename: str):
+        """Загрузка файла; при ошибке - None (файл пропускается, пакет продолжается)"""
+        start = time.perf_counter()
+        try:
+            item = self.loader(filename)
+        except Exception as e:
+            print(f"Cannot load {filename}: {e}")
+            item = None
+        return item, time.perf_counter() - start
+
+    def _queued_bytes(self, pending: deque) -> int:
+        total = 0
+        for _, future in pending:
+            if future.done() and future.exception() is None:
+                total += self._nbytes(future.result()[0])
+            else:
+                total += self._estimate or 0
+        return total
+
+    def _take(self, item, load_time: float):
+        self.stats.files += 1
+        self.stats.load_time += load_time
+        self._decode_metric.inc(load_time)
+        self._estimate = max(self._estimate or 0, self._nbytes(item))
+        return item
+
+    def _wait_done(self, start: float):
+        wait = time.perf_counter() - start
+        self.stats.io_wait += wait
+        self._io_wait_metric.inc(wait)
+
+    def __iter__(self) -> Iterator[Tuple[str, object]]:
+        if self.depth <= 0:
+            # Без упреждения: всё время загрузки - ожидание
+            for filename in self.filenames:
+                start = time.perf_counter()
+                item = self._take(*self._timed_load(filename))
+                self._wait_done(start)
+                yield filename, item
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        pending = deque()
+        remaining = iter(self.filenames)
+        try:
+            while True:
+                while len(pending) < self.depth:
+                    # Пока размер файлов неизвестен, загружается один файл - иначе первые
+                    # depth файлов могут превысить лимит памяти
+                    if pending and (self._estimate is None
+                                    or self._queued_bytes(pending) + self._estimate > self.max_bytes):
+                        break
+                    filename = next(remaining, None)
+                    if filename is None:
+                        break
+                    pending.append((filename, executor.submit(self._timed_load, filename)))
+                if not pending:
+                    return
+
+                self.stats.peak_bytes = max(self.stats.peak_bytes, self._queued_bytes(pending))
+                filename, future = pending.popleft()
+                start = time.perf_counter()
+                with profiler.stage('io_wait'):
+                    item = self._take(*future.result())
+                self._wait_done(start)
+                yield filename, item
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BatchProcessor:
+    '''Пакетная обработка изображений выбранными методами предобработки.
+     Не зависит от GUI: прогресс и отмена передаются через колбэки'''
+
+    FIELDNAMES = ['filename', 'method', 'gamma', 'area_px', 'area_units', 'unit_name',
+                  'unit_factor', 'calibration_source', 'contours_count']
+
+    # Изображения от этого размера (BMP/.npy) обрабатываются по тайлам
+    TILED_MIN_PIXELS = 100_000_000
+
+    def __init__(self, methods: List[PreprocessMethod], unit_factor: Optional[float] = None,
+                 unit_name: Optional[str] = None, first_parameter: float = 0.7,
+                 second_parameter: float = 0.5, per_image_calibration: bool = False,
+                 ocr_workers: int = 2, prefetch_depth: int = 4, prefetch_max_mb: float = 1024,
+                 io_workers: int = 2):
+        self.methods = methods
+        self.unit_factor = unit_factor
+        self.unit_name = unit_name
+        self.first_parameter = first_parameter
+        self.second_parameter = second_parameter
+        self.per_image_calibration = per_image_calibration
+        self.ocr_workers = ocr_workers
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_max_bytes = int(prefetch_max_mb * 1024 ** 2)
+        self.io_workers = io_workers
+
+        self.results: List[dict] = []
+        self.statistics = BatchStatistics()
+        self.prefetch_stats = PrefetchStats()
+
+    def method_params(self, image: Image, method: PreprocessMethod) -> Tuple[dict, float]:
+        """Параметры этапа preprocess для метода, возвращает (параметры, гамма)"""
+        if method == PreprocessMethod.GAMMA_BY_AREA:
+            # Подбор гаммы меняет изображение - работаем с копией
+            gamma = image.clone().calculate_gamma_from_contour_graph_with_log_deriv(
+                max_gamma=15, modal_window=None
+            )
+            return {'mode': ProcessingPipeline.GAMMA, 'gamma': gamma}, gamma
+
+        if method == PreprocessMethod.GAMMA_BY_PERCENTILE:
+            gamma = image.gamma_from_high_percentile(target=self.second_parameter)
+            return {'mode': ProcessingPipeline.GAMMA, 'gamma': gamma}, gamma
+
+        if method == PreprocessMethod.STRETCH_BRIGHT:
+            return {'mode': ProcessingPipeline.STRETCH, 'threshold': self.first_parameter}, 0.0
+
+        # Без предобработки
+        return {'mode': ProcessingPipeline.NONE}, 1.0
+
+    def _resolve_calibration(self, future: Optional[Future], reused: bool):
+        """Итоговые (множитель, единицы, источник) для строки CSV"""
+        if future is not None:
+            try:
+                factor, name = ScaleBarCalibrator.unit_factor_from(*future.result())
+            except Exception as e:
+                print(f"Scale bar recognition error: {e}")
+                factor, name = None, None
+            if factor:
+                source = CalibrationSource.SCALE_BAR_CACHED if reused else CalibrationSource.SCALE_BAR
+                return factor, name, source
+
+        if self.unit_factor:
+            return self.unit_factor, self.unit_name, CalibrationSource.MANUAL
+        return None, None, CalibrationSource.NONE
+
+    def process(self, filenames: List[str],
+                progress_callback: Optional[Callable[[int, str, PreprocessMethod], None]] = None,
+                is_canceled: Optional[Callable[[], bool]] = None) -> List[dict]:
+        """
+        Обрабатывает файлы всеми методами
+
+        Args:
+            progress_callback: вызывается перед каждым шагом (номер шага, файл, метод)
+            is_canceled: возвращает True, если обработку нужно прервать
+        """
+        calibrator = ScaleBarCalibrator(self.ocr_workers) if self.per_image_calibration else None
+        prefetcher = ImagePrefetcher(filenames, self._load, depth=self.prefetch_depth,
+                                     max_bytes=self.prefetch_max_bytes, workers=self.io_workers)
+        self.prefetch_stats = prefetcher.stats
+        files = iter(prefetcher)
+        pipeline = ProcessingPipeline()
+        step = 0
+        files_metric = metrics.counter('batch_files_total', 'Files processed by the batch engine')
+        rows_metric = metrics.counter('batch_rows_total', 'Result rows produced by the batch engine')
+        file_time_metric = metrics.histogram('batch_file_seconds', 'Processing time of one file, all methods')
+
+        try:
+            for filename, source_image in files:
+                if is_canceled and is_canceled():
+                    break
+                started = time.perf_counter()
+
+                if source_image is None:
+                    # Файл не загрузился (ImagePrefetcher уже сообщил об ошибке) - пропускаем
+                    step += len(self.methods)
+                    continue
+
+                # Ошибка обработки одного файла не прерывает пакет: файл пропускается
+                try:
+                    if isinstance(source_image, Image):
+                        rows, future, reused = self._process_image(source_image, filename, pipeline, calibrator,
+                                                                   step, progress_callback, is_canceled)
+                    else:
+                        with profiler.stage('batch.tiled'):
+                            rows, future, reused = self._process_tiled(source_image, filename, calibrator,
+                                                                       step, progress_callback, is_canceled)
+                except Exception as e:
+                    print(f"Error processing {filename}: {e}")
+                    step += len(self.methods)
+                    continue
+                step += len(self.methods)
+
+                self._add_results(rows, future, reused)
+                file_time_metric.observe(time.perf_counter() - started)
+                files_metric.inc()
+                rows_metric.inc(len(rows))
+        finally:
+            files.close()
+            if calibrator is not None:
+                calibrator.shutdown()
+
+        return self.results
+
+    def _load(self, filename: str):
+        """Загрузка для ImagePrefetcher: Image или источник тайлов для гигапиксельных файлов"""
+        tile_source = open_tile_source(filename, decode=False)
+        if tile_source is not None and tile_source.pixels >= self.TILED_MIN_PIXELS:
+            return tile_source
+        if isinstance(tile_source, NpyTileSource):
+            # cv.imread не читает .npy: небольшой массив копируется из отображения целиком
+            return Image(filename, np.array(tile_source.array))
+        image = Image(filename)
+        if image.get_image() is None:
+            raise ValueError('unsupported or damaged image')
+        return image
+
+    def _process_image(self, source_image: Image, filename: str, pipeline: ProcessingPipeline,
+                       calibrator: Optional[ScaleBarCalibrator], step: int,
+                       progress_callback, is_canceled) -> Tuple[List[dict], Optional[Future], bool]:
+        """Изображение в памяти: все методы через конвейер обработки"""
+        pipeline.set_source(source_image)
+
+        # OCR линейки идёт параллельно с обработкой контуров
+        future, reused = None, False
+        if calibrator is not None:
+            future, reused = calibrator.submit(source_image.get_image())
+
+        rows = []
+        for method in self.methods:
+            if is_canceled and is_canceled():
+                break
+
+            if progress_callback:
+                progress_callback(step, filename, method)
+            step += 1
+
+            with profiler.stage(f'batch.{method.name}'):
+                params, gamma = self.method_params(source_image, method)
+                pipeline.set_params('preprocess', **params)
+                result = pipeline.get('measurements')
+            sum_of_areas, _ = result.area()
+            self.statistics.update(method.value, result.contour_areas, result.image_px)
+
+            rows.append({
+                'filename': os.path.basename(filename),
+                'method': method.value,
+                'gamma': round(gamma, 4),
+                'area_px': sum_of_areas,
+                'contours_count': result.contours_count,
+            })
+        return rows, future, reused
+
+    def _add_results(self, rows: List[dict], future: Optional[Future], reused: bool):
+        """Дополняет строки калибровкой и добавляет в результаты"""
+        factor, unit_name, source = self._resolve_calibration(future, reused)
+        for row in rows:
+            area_px = row['area_px']
+            row['area_units'] = round(area_px * factor ** 2, 4) if factor and area_px > 0 else 0
+            row['unit_name'] = unit_name or 'N/A'
+            row['unit_factor'] = round(factor, 6) if factor else 0
+            row['calibration_source'] = source
+        self.results.extend(rows)
+
+    def _process_tiled(self, tile_source, filename: str, calibrator: Optional[ScaleBarCalibrator], step: int,
+                       progress_callback, is_canceled) -> Tuple[List[dict], Optional[Future], bool]:
+        """Гигапиксельное изображение: все методы по тайлам без полного декодирования"""
+        future, reused = None, False
+        if calibrator is not None:
+            height, width = tile_source.shape
+            y0, y1, x0, x1 = OpenCVToQtAdapter.scale_bar_region(height, width)
+            crop = tile_source.read(x0, y0, x1 - x0, y1 - y0)
+            future, reused = calibrator.submit_thresh(OpenCVToQtAdapter.binarize_scale_bar_crop(crop))
+
+        analyzer = TiledAnalyzer(tile_source)
+        rows = []
+        for method in self.methods:
+            if is_canceled and is_canceled():
+                break
+            if progress_callback:
+                progress_callback(step, filename, method)
+            step += 1
+
+            result = analyzer.analyze(method, self.first_parameter, self.second_parameter,
+                                      is_canceled=is_canceled)
+            self.statistics.update(method.value, result.contour_areas, result.width * result.height)
+            rows.append({
+                'filename': os.path.basename(filename),
+                'method': method.value,
+                'gamma': round(result.gamma, 4),
+                'area_px': result.area_px,
+                'contours_count': result.contours_count,
+            })
+        return rows, future, reused
+
+    def write(self, csv_path: str) -> List[str]:
+        """Сохраняет результаты в CSV и сводную статистику рядом с ним"""
+        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=self.FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(self.results)
+        return self.statistics.write(csv_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Batch inclusion area calculation')
+    parser.add_argument('files', nargs='+', help='Image files')
+    parser.add_argument('-o', '--output',
+                        default=f'results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+                        help='Results CSV path')
+    parser.add_argument('-m', '--method', action='append', dest='methods',
+                        choices=[method.name for method in PreprocessMethod],
+                        help='Preprocessing method (can be repeated), default GAMMA_BY_AREA')
+    parser.add_argument('--unit-factor', type=float, default=None, help='Units per pixel')
+    parser.add_argument('--unit-name', default=None, help='Unit name, e.g. мкм')
+    parser.add_argument('--auto-calibration', action='store_true',
+                        help='Detect scale bar on every image (falls back to --unit-factor)')
+    parser.add_argument('--ocr-workers', type=int, default=2, help='OCR worker threads')
+    parser.add_argument('--prefetch', type=int, default=4, help='Files decoded ahead (0 - no prefetch)')
+    parser.add_argument('--prefetch-max-mb', type=float, default=1024, help='Prefetched data limit, MB')
+    parser.add_argument('--io-workers', type=int, default=2, help='Image decoding threads')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='TRACE',
+                        help='Print per-stage timings; optionally save a Chrome trace JSON')
+    parser.add_argument('--image-cache', default=None, metavar='DIR',
+                        help='Decoded image cache directory (default: $CV_IMAGE_CACHE_DIR, off if unset)')
+    parser.add_argument('--image-cache-max-mb', type=float, default=None, help='Decoded image cache size cap, MB')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on localhost:PORT/metrics (default: $CV_METRICS_PORT)')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Write metrics in Prometheus text format to this file (default: $CV_METRICS_FILE)')
+    args = parser.parse_args(argv)
+
+    if args.metrics_port or args.metrics_file:
+        metrics.start(args.metrics_port, args.metrics_file)
+    else:
+        metrics.start_from_environment()
+    register_cache_metrics()
+
+    if args.profile is not None:
+        profiler.set_enabled(True)
+
+    if args.image_cache or args.image_cache_max_mb is not None:
+        max_bytes = int(args.image_cache_max_mb * 1024 ** 2) if args.image_cache_max_mb is not None else None
+        decoded_image_cache.configure(args.image_cache or decoded_image_cache.directory, max_bytes)
+
+    methods = [PreprocessMethod[name] for name in (args.methods or ['GAMMA_BY_AREA'])]
+    processor = BatchProcessor(methods, unit_factor=args.unit_factor, unit_name=args.unit_name,
+                               per_image_calibration=args.auto_calibration,
+                               ocr_workers=args.ocr_workers, prefetch_depth=args.prefetch,
+                               prefetch_max_mb=args.prefetch_max_mb, io_workers=args.io_workers)
+
+    def report(step, filename, method):
+        print(f'[{step + 1}/{len(args.files) * len(methods)}] {os.path.basename(filename)}: {method.value}')
+
+    processor.process(args.files, progress_callback=report)
+    if not processor.results:
+        print('Nothing processed')
+        return 1
+
+    summary_paths = processor.write(args.output)
+    print(f'Results saved to: {args.output}')
+    print(f'Prefetch: {processor.prefetch_stats.summary()}')
+    if profiler.enabled:
+        profiler.dump(args.profile or None)
+    if decoded_image_cache.enabled:
+        print(f'Image cache: {decoded_image_cache.hits} hits, {decoded_image_cache.misses} misses, '
+              f'{decoded_image_cache.size_bytes() / 1024 ** 2:.0f} MB')
+    for path in summary_paths:
+        print(f'Summary saved to: {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import argparse
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2 as cv
+import numpy as np
+
+from ObjectClasses import Image, gamma_lut
+from utils import OpenCVToQtAdapter
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """16-битный кадр: светлые включения на зашумлённом фоне"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width), 12000.0)
+    for _ in range(200):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(3, 40)), int(rng.integers(3, 40)))
+        cv.ellipse(frame, center, axes, float(rng.uniform(0, 180)), 0, 360, float(rng.uniform(30000, 60000)), -1)
+    frame = cv.GaussianBlur(frame, (5, 5), 0) + rng.normal(0, 800, frame.shape)
+    return np.clip(frame, 0, 65535).astype(np.uint16)
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    """Медианное время вызова, мс"""
+    function()  # прогрев (кэш LUT, выделение памяти)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def benchmark(frame: np.ndarray, gamma: float, repeat: int) -> Dict[str, float]:
+    """Время этапов конвейера для одного кадра"""
+    image = Image('', frame)
+    processed = Image('', frame).apply_gamma(gamma)
+
+    stages = {
+        # Кадр после гаммы целиком (для 16 бит он строится только при отображении)
+        'gamma': lambda: image.apply_gamma(gamma).get_processed_image(),
+        'contours': lambda: processed.apply_contours(draw=False),
+        'area': lambda: processed.calculate_area(),
+        'display': lambda: processed.get_display_image(),
+    }
+    timings = {name: measure(stage, repeat) for name, stage in stages.items()}
+    # Подбор гаммы по площади (~140 шагов) - самый тяжёлый сценарий
+    timings['sweep'] = measure(
+        lambda: image.clone().calculate_gamma_from_contour_graph_with_log_deriv(max_gamma=15),
+        max(1, repeat // 10))
+
+    def pipeline():
+        result = Image('', frame).apply_gamma(gamma).apply_contours(draw=False)
+        result.calculate_area()
+        result.get_display_image()
+
+    timings['total'] = measure(pipeline, repeat)
+    return timings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='8-bit vs 16-bit pipeline benchmark')
+    parser.add_argument('files', nargs='*', help='16-bit images (synthetic frame if omitted)')
+    parser.add_argument('--size', default='2448x2048', help='Synthetic frame size WxH')
+    parser.add_argument('--gamma', type=float, default=2.5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.files:
+        frames = [(path, Image(path).get_image()) for path in args.files]
+    else:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        frames = [(f'synthetic {width}x{height}', synthetic_frame(width, height))]
+
+    for name, frame in frames:
+        if frame.dtype != np.uint16:
+            print(f'{name}: not a 16-bit image, skipped')
+            continue
+        results = {
+            8: benchmark(OpenCVToQtAdapter.to_8bit(frame), args.gamma, args.repeat),
+            16: benchmark(frame, args.gamma, args.repeat),
+        }
+        print(f'{name} (LUT cache: {gamma_lut.cache_info().currsize} tables)')
+        print(f'  {"stage":<10}{"8-bit, ms":>12}{"16-bit, ms":>12}{"ratio":>8}')
+        for stage in results[8]:
+            eight, sixteen = results[8][stage], results[16][stage]
+            print(f'  {stage:<10}{eight:>12.2f}{sixteen:>12.2f}{sixteen / eight if eight else 0:>8.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import json
 import os
 
-from PySide6.QtCore import (QCoreApplication, QMetaObject, Qt)
+from PySide6.QtCore import (QCoreApplication, QMetaObject, QSize, Qt)
+from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (QHBoxLayout, QLabel, QPushButton, QSizePolicy,
                                QVBoxLayout, QSpacerItem, QComboBox, QDialogButtonBox,
-                               QDialog, QCheckBox, QGroupBox, QMessageBox, QDoubleSpinBox)
+                               QDialog, QCheckBox, QGroupBox, QMessageBox, QDoubleSpinBox,
+                               QFileDialog, QAbstractItemView, QListView, QListWidget, QListWidgetItem)
 
-from utils import PreprocessMethod
+from ObjectClasses import ThumbnailThread
+from image_cache import thumbnail_cache
+from utils import OpenCVToQtAdapter, PreprocessMethod
 
 
 class ChooseCameraDialog(object):
@@ -71,6 +75,7 @@ class PreprocessMethodDialog(QDialog):
 
         self._checkboxes: dict[PreprocessMethod, QCheckBox] = {}
         self._selected_methods: list[PreprocessMethod] = []
+        self._per_image_calibration = False
 
         self._init_ui()
         self.retranslateUi()
@@ -116,6 +121,11 @@ class PreprocessMethodDialog(QDialog):
 
         layout.addLayout(toggle_layout)
 
+        # Калибровка по линейке каждого изображения
+        self._calibration_cb = QCheckBox()
+        self._calibration_cb.setObjectName(u"perImageCalibrationCheckBox")
+        layout.addWidget(self._calibration_cb)
+
         # OK / Cancel
         button_layout = QHBoxLayout()
 
@@ -154,6 +164,9 @@ class PreprocessMethodDialog(QDialog):
         self._deselect_all_btn.setText(QCoreApplication.translate(
             "PreprocessMethodDialog", "Deselect All", None))
 
+        self._calibration_cb.setText(QCoreApplication.translate(
+            "PreprocessMethodDialog", "Detect scale bar on each image", None))
+
         self._ok_btn.setText(QCoreApplication.translate(
             "PreprocessMethodDialog", "OK", None))
 
@@ -180,12 +193,120 @@ class PreprocessMethodDialog(QDialog):
                     "PreprocessMethodDialog",
                     "Please select at least one method.", None))
             return
+        self._per_image_calibration = self._calibration_cb.isChecked()
         self.accept()
 
     def get_selected_methods(self) -> list[PreprocessMethod]:
         """Возвращает список выбранных методов после закрытия диалога"""
         return self._selected_methods
 
+    def get_per_image_calibration(self) -> bool:
+        """True, если масштаб нужно определять по линейке каждого изображения"""
+        return self._per_image_calibration
+
+
+class ImageFilesDialog(QFileDialog):
+    """Выбор файлов для пакетной обработки: миниатюра текущего файла и лента миниатюр выбранных (кэшируются)"""
+
+    # Сторона миниатюры в ленте выбранных файлов и их наибольшее число
+    SELECTION_ICON_SIDE = 96
+    MAX_SELECTION_THUMBNAILS = 200
+
+    def __init__(self, parent=None, caption: str = '', directory: str = '', file_filter: str = ''):
+        super().__init__(parent, caption, directory, file_filter)
+        self.setObjectName(u"ImageFilesDialog")
+        # Миниатюру можно встроить только в диалог Qt, не в системный
+        self.setOption(QFileDialog.DontUseNativeDialog, True)
+        self.setFileMode(QFileDialog.ExistingFiles)
+
+        side = thumbnail_cache.side
+        self._preview_label = QLabel()
+        self._preview_label.setObjectName(u"previewLabel")
+        self._preview_label.setAlignment(Qt.AlignCenter)
+        self._preview_label.setFixedSize(side, side)
+        layout = self.layout()
+        layout.addWidget(self._preview_label, 1, layout.columnCount(), layout.rowCount() - 1, 1)
+
+        icon_side = self.SELECTION_ICON_SIDE
+        self._selection_list = QListWidget()
+        self._selection_list.setObjectName(u"selectionList")
+        self._selection_list.setViewMode(QListView.IconMode)
+        self._selection_list.setFlow(QListView.LeftToRight)
+        self._selection_list.setWrapping(False)
+        self._selection_list.setMovement(QListView.Static)
+        self._selection_list.setSelectionMode(QAbstractItemView.NoSelection)
+        self._selection_list.setIconSize(QSize(icon_side, icon_side))
+        self._selection_list.setFixedHeight(icon_side + 2 * self.fontMetrics().height() + 16)
+        self._selection_items = {}
+        layout.addWidget(self._selection_list, layout.rowCount(), 0, 1, layout.columnCount())
+
+        # Несжатые PNG/BMP/TIFF декодируются целиком - только в фоне
+        self._current_path = None
+        self._thumbnails = ThumbnailThread(self)
+        self._thumbnails.ready.connect(self._on_thumbnail_ready)
+        self._thumbnails.start()
+
+        self.currentChanged.connect(self._show_thumbnail)
+        # Сигнала об изменении выбора у QFileDialog нет - следим за его списками файлов
+        for view in self.findChildren(QAbstractItemView):
+            if view is not self._selection_list and view.selectionModel() is not None:
+                view.selectionModel().selectionChanged.connect(self._update_selection)
+
+    def _show_thumbnail(self, path: str):
+        self._current_path = path
+        if not os.path.isfile(path):
+            self._preview_label.clear()
+            return
+        thumbnail = thumbnail_cache.peek(path)
+        if thumbnail is not None:
+            self._preview_label.setPixmap(OpenCVToQtAdapter.convert_cv_to_qt(thumbnail))
+            return
+        self._preview_label.clear()
+        self._thumbnails.request(path)
+
+    def _update_selection(self):
+        """Лента миниатюр выбранных файлов; недостающие строятся в фоне"""
+        paths = [path for path in self.selectedFiles() if os.path.isfile(path)][:self.MAX_SELECTION_THUMBNAILS]
+        if paths == list(self._selection_items):
+            return
+        self._selection_list.clear()
+        self._selection_items = {}
+        for path in paths:
+            item = QListWidgetItem(os.path.basename(path))
+            item.setToolTip(path)
+            thumbnail = thumbnail_cache.peek(path)
+            if thumbnail is not None:
+                item.setIcon(QIcon(OpenCVToQtAdapter.convert_cv_to_qt(thumbnail)))
+            self._selection_list.addItem(item)
+            self._selection_items[path] = item
+        # Запросы обслуживаются с конца: первые выбранные файлы строятся первыми
+        for path in reversed(paths):
+            if thumbnail_cache.peek(path) is None:
+                self._thumbnails.request(path)
+
+    def _on_thumbnail_ready(self, path: str, thumbnail):
+        if thumbnail is None:
+            return
+        pixmap = OpenCVToQtAdapter.convert_cv_to_qt(thumbnail)
+        item = self._selection_items.get(path)
+        if item is not None:
+            item.setIcon(QIcon(pixmap))
+        # Пока миниатюра строилась, пользователь мог выбрать другой файл
+        if path == self._current_path:
+            self._preview_label.setPixmap(pixmap)
+
+    def done(self, result: int):
+        self._thumbnails.stop()
+        super().done(result)
+
+    @staticmethod
+    def get_open_file_names(parent=None, caption: str = '', directory: str = '', file_filter: str = '') -> list:
+        """Аналог QFileDialog.getOpenFileNames, возвращает только список файлов"""
+        dialog = ImageFilesDialog(parent, caption, directory, file_filter)
+        if dialog.exec() != QDialog.Accepted:
+            return []
+        return dialog.selectedFiles()
+
 
 class ChooseCalibrationDialog(QDialog):
     """Диалог выбора готовой калибровки микроскопа или ввода своей"""
@@ -0,0 +1,360 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+from PySide6.QtGui import QImageReader
+
+from metrics import metrics
+from profiling import profiler
+
+
+class DecodedImageCache:
+    '''Дисковый кэш декодированных кадров для повторных прогонов одних и тех же
+     серий: кадр хранится несжатым .npy и при следующем открытии отображается
+     в память (mmap) вместо декодирования TIFF/PNG/JPEG. Запись действительна,
+     пока у исходного файла не изменились mtime и размер. Суммарный объём
+     ограничен, при переполнении вытесняются давно не использованные записи.
+     По умолчанию выключен: включается переменной окружения CV_IMAGE_CACHE_DIR
+     (лимит - CV_IMAGE_CACHE_MAX_MB) или вызовом configure()'''
+
+    INDEX_FILE = "index.json"
+    DEFAULT_MAX_MB = 4096
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 1024 ** 2):
+        self.directory = None
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            self.configure(directory, max_bytes)
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_environment(cls) -> 'DecodedImageCache':
+        directory = os.environ.get("CV_IMAGE_CACHE_DIR")
+        try:
+            max_mb = float(os.environ.get("CV_IMAGE_CACHE_MAX_MB", cls.DEFAULT_MAX_MB))
+        except ValueError:
+            max_mb = cls.DEFAULT_MAX_MB
+        return cls(directory, int(max_mb * 1024 ** 2))
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def configure(self, directory: Optional[str], max_bytes: Optional[int] = None):
+        """Включение (каталог) или выключение (None) кэша"""
+        self.flush()
+        with self._lock:
+            self._entries = None
+            self._dirty = False
+            if max_bytes is not None:
+                self.max_bytes = int(max_bytes)
+            if directory:
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    self.directory = os.path.abspath(directory)
+                except OSError as e:
+                    print(f"Кэш изображений отключён, каталог недоступен: {e}")
+                    self.directory = None
+            else:
+                self.directory = None
+
+    @staticmethod
+    def key(path: str, flags: int) -> str:
+        return hashlib.sha1(f"{os.path.abspath(path)}|{flags}".encode()).hexdigest()
+
+    def _data_file(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            index_file = os.path.join(self.directory, self.INDEX_FILE)
+            if os.path.exists(index_file):
+                try:
+                    with open(index_file, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    print(f"Ошибка при чтении индекса кэша изображений: {e}")
+        return self._entries
+
+    def _save(self):
+        index_file = os.path.join(self.directory, self.INDEX_FILE)
+        try:
+            tmp_file = index_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=1, ensure_ascii=False)
+            os.replace(tmp_file, index_file)
+            self._dirty = False
+        except Exception as e:
+            print(f"Ошибка при сохранении индекса кэша изображений: {e}")
+
+    def flush(self):
+        """Запись отметок последнего использования (обновляются в памяти)"""
+        with self._lock:
+            if self.enabled and self._dirty:
+                self._save()
+
+    def _forget(self, key: str) -> bool:
+        try:
+            os.remove(self._data_file(key))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Файл ещё отображён в память (Windows) - удалим при следующем вытеснении
+            return False
+        self._entries.pop(key, None)
+        self._dirty = True
+        return True
+
+    def get(self, path: str, flags: int) -> Optional[np.ndarray]:
+        """Кадр из кэша (только чтение, mmap) или None, если записи нет или она устарела"""
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = self.key(path, flags)
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                self._forget(key)
+                self.misses += 1
+                return None
+            try:
+                image = np.load(self._data_file(key), mmap_mode="r", allow_pickle=False)
+            except Exception:
+                self._forget(key)
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            self.hits += 1
+        return np.asarray(image)
+
+    def put(self, path: str, flags: int, image: np.ndarray):
+        """Сохранение декодированного кадра с вытеснением старых записей"""
+        if not self.enabled or image is None or image.nbytes > self.max_bytes:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        key = self.key(path, flags)
+        data_file = self._data_file(key)
+        # Запись кадра (сотни МБ) идёт без блокировки: потоки упреждающей загрузки
+        # и попадания в кэш не ждут друг друга; под блокировкой - только индекс
+        tmp_file = f"{data_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                np.save(f, np.ascontiguousarray(image), allow_pickle=False)
+        except OSError as e:
+            print(f"Ошибка при записи в кэш изображений: {e}")
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            entries = self._load()
+            try:
+                os.replace(tmp_file, data_file)
+            except OSError as e:
+                print(f"Ошибка при записи в кэш изображений: {e}")
+                return
+            entries[key] = {
+                "path": os.path.abspath(path),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "bytes": int(image.nbytes),
+                "last_used": time.time(),
+            }
+            self._dirty = True
+            # Индекс переписывается только при вытеснении, иначе - в flush() при выходе
+            if self._evict(keep=key):
+                self._save()
+
+    def _evict(self, keep: str) -> bool:
+        """Вытеснение давно не использованных записей; True, если что-то удалено"""
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        evicted = False
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            size = self._entries[key]["bytes"]
+            if self._forget(key):
+                total -= size
+                evicted = True
+        return evicted
+
+    def size_bytes(self) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return sum(entry["bytes"] for entry in self._load().values())
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            for key in list(self._load()):
+                self._forget(key)
+            self._save()
+
+
+decoded_image_cache = DecodedImageCache.from_environment()
+
+
+def register_cache_metrics():
+    """Попадания и промахи кэша декодированных кадров (вызывается после metrics.start)"""
+    metrics.counter('image_cache_hits_total', 'Decoded image cache hits').set_function(
+        lambda: decoded_image_cache.hits)
+    metrics.counter('image_cache_misses_total', 'Decoded image cache misses').set_function(
+        lambda: decoded_image_cache.misses)
+    metrics.gauge('image_cache_bytes', 'Decoded image cache size on disk').set_function(
+        decoded_image_cache.size_bytes)
+
+
+def cached_imread(path: str, flags: int) -> Optional[np.ndarray]:
+    """cv.imread через кэш декодированных кадров (если он включён)"""
+    with profiler.stage('imread.cache'):
+        image = decoded_image_cache.get(path, flags)
+    if image is None:
+        with profiler.stage('imread'):
+            image = cv.imread(path, flags)
+        decoded_image_cache.put(path, flags, image)
+    return image
+
+
+# Уменьшение при декодировании реально ускоряет только JPEG (масштабирование DCT
+# в libjpeg); остальные форматы OpenCV декодирует целиком и затем уменьшает
+REDUCED_DECODE_EXTENSIONS = ('.jpg', '.jpeg', '.jpe')
+_REDUCED_FLAGS = ((8, cv.IMREAD_REDUCED_GRAYSCALE_8), (4, cv.IMREAD_REDUCED_GRAYSCALE_4),
+                  (2, cv.IMREAD_REDUCED_GRAYSCALE_2))
+
+
+def reduction_factor(width: int, height: int, max_side: int) -> int:
+    """Наибольший коэффициент уменьшения (8/4/2), при котором сторона не меньше max_side"""
+    for factor, _ in _REDUCED_FLAGS:
+        if max(width, height) // factor >= max_side:
+            return factor
+    return 1
+
+
+def read_reduced(path: str, max_side: int) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Быстрое декодирование уменьшенной копии для предпросмотра
+
+    Returns:
+        (кадр, коэффициент уменьшения) или (None, 1), если выигрыша нет
+    """
+    if not path.lower().endswith(REDUCED_DECODE_EXTENSIONS):
+        return None, 1
+    size = QImageReader(path).size()  # только заголовок файла
+    if not size.isValid():
+        return None, 1
+    factor = reduction_factor(size.width(), size.height(), max_side)
+    if factor == 1:
+        return None, 1
+    image = cv.imread(path, dict(_REDUCED_FLAGS)[factor])
+    return (image, factor) if image is not None else (None, 1)
+
+
+class ThumbnailCache:
+    '''8-битные миниатюры для выбора файлов пакетной обработки.
+     Хранятся в памяти (LRU), ключ - путь, mtime и размер файла'''
+
+    def __init__(self, side: int = 256, max_entries: int = 2000):
+        self.side = side
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def peek(self, path: str) -> Optional[np.ndarray]:
+        """Миниатюра, только если она уже в кэше (без декодирования)"""
+        key = self._key(path)
+        if key is None:
+            return None
+        with self._lock:
+            thumbnail = self._entries.get(key)
+            if thumbnail is not None:
+                self._entries.move_to_end(key)
+            return thumbnail
+
+    def get(self, path: str) -> Optional[np.ndarray]:
+        key = self._key(path)
+        if key is None:
+            return None
+        thumbnail = self.peek(path)
+        if thumbnail is not None:
+            return thumbnail
+
+        thumbnail = self._make(path)
+        if thumbnail is None:
+            return None
+        with self._lock:
+            self._entries[key] = thumbnail
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return thumbnail
+
+    def _make(self, path: str) -> Optional[np.ndarray]:
+        image, _ = read_reduced(path, self.side)
+        if image is None and path.lower().endswith('.npy'):
+            try:
+                array = np.load(path, mmap_mode="r", allow_pickle=False)
+            except Exception:
+                return None
+            if array.ndim != 2:
+                return None
+            # Прореживание читает с диска только нужные строки
+            step = max(1, max(array.shape) // (self.side * 2))
+            image = np.ascontiguousarray(array[::step, ::step])
+        if image is None:
+            image = decoded_image_cache.get(path, cv.IMREAD_GRAYSCALE | cv.IMREAD_ANYDEPTH)
+        if image is None:
+            image = cv.imread(path, cv.IMREAD_GRAYSCALE | cv.IMREAD_ANYDEPTH)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        scale = self.side / max(height, width)
+        if scale < 1:
+            image = cv.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                              interpolation=cv.INTER_AREA)
+        if image.dtype == np.uint16:
+            return cv.convertScaleAbs(image, alpha=1.0 / 257.0)
+        if image.dtype != np.uint8:
+            return cv.normalize(image, None, 0, 255, cv.NORM_MINMAX, dtype=cv.CV_8U)
+        return np.ascontiguousarray(image)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+thumbnail_cache = ThumbnailCache()
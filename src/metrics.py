@@ -0,0 +1,307 @@
+import atexit
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+
+class _Cells:
+    '''Значения метрики по потокам: каждый поток пишет только в свою ячейку,
+     поэтому запись не требует блокировки; при чтении ячейки суммируются'''
+
+    def __init__(self, size: int):
+        self._size = size
+        self._cells: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def local(self) -> list:
+        cell = self._cells.get(threading.get_ident())
+        if cell is None:
+            cell = [0.0] * self._size
+            with self._lock:
+                self._cells[threading.get_ident()] = cell
+        return cell
+
+    def total(self) -> list:
+        with self._lock:
+            cells = list(self._cells.values())
+        return [sum(values) for values in zip(*cells)] if cells else [0.0] * self._size
+
+
+class Counter:
+    """
+    Монотонно растущее значение (кадры, пропуски, файлы). Счётчик, который
+    объект уже ведёт сам, подключается через set_function без затрат на запись
+    """
+    type_name = 'counter'
+
+    def __init__(self):
+        self._cells = _Cells(1)
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, value: float = 1.0):
+        self._cells.local()[0] += value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self, name: str, labels: str):
+        value = self._cells.total()[0]
+        if self._function is not None:
+            try:
+                value += self._function()
+            except Exception:
+                value = math.nan
+        yield name, labels, value
+
+
+class Gauge:
+    """Текущее значение; может вычисляться в момент чтения (set_function)"""
+    type_name = 'gauge'
+
+    def __init__(self):
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self, name: str, labels: str):
+        value = self.value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = math.nan
+        yield name, labels, value
+
+
+class Histogram:
+    """Распределение длительностей по корзинам (верхние границы, с)"""
+    type_name = 'histogram'
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # Ячейки: счётчики корзин, затем +Inf и сумма
+        self._cells = _Cells(len(self.buckets) + 2)
+
+    def observe(self, value: float):
+        cell = self._cells.local()
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                cell[index] += 1
+                break
+        else:
+            cell[len(self.buckets)] += 1
+        cell[-1] += value
+
+    def samples(self, name: str, labels: str):
+        totals = self._cells.total()
+        cumulative = 0.0
+        for bound, count in zip((*self.buckets, math.inf), totals[:-1]):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(bound)
+            yield f'{name}_bucket', _join_labels(labels, f'le="{le}"'), cumulative
+        yield f'{name}_count', labels, cumulative
+        yield f'{name}_sum', labels, totals[-1]
+
+
+class _NullMetric:
+    """Заглушка выключенного реестра: вызовы ничего не стоят"""
+
+    def inc(self, value: float = 1.0):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def set_function(self, function):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+
+
+def _join_labels(*parts: str) -> str:
+    return ','.join(part for part in parts if part)
+
+
+def _format_labels(labels: Optional[Dict[str, object]]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return ','.join(f'{key}="{value}"' for key, value in zip(labels.keys(), escaped))
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    '''Реестр метрик для длительной работы станций: частоты кадров, пропуски,
+     задержки обработки, пропускная способность пакетов, память. По умолчанию
+     выключен (метрики - пустые заглушки); включается переменными окружения
+     CV_METRICS_PORT (HTTP на localhost, формат Prometheus) и/или
+     CV_METRICS_FILE (сброс в файл при выходе и каждые CV_METRICS_INTERVAL с)'''
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        # имя -> (тип, описание, {метки: метрика})
+        self._families: Dict[str, Tuple[str, str, Dict[str, object]]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._dump_path: Optional[str] = None
+
+    def _metric(self, factory, name: str, description: str, labels: Optional[Dict[str, object]], **kwargs):
+        if not self.enabled:
+            return _NULL_METRIC
+        label_text = _format_labels(labels)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (factory.type_name, description, {})
+            metric = family[2].get(label_text)
+            if metric is None:
+                metric = family[2][label_text] = factory(**kwargs)
+        return metric
+
+    def counter(self, name: str, description: str = '', labels: Optional[Dict[str, object]] = None) -> Counter:
+        return self._metric(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = '', labels: Optional[Dict[str, object]] = None) -> Gauge:
+        return self._metric(Gauge, name, description, labels)
+
+    def histogram(self, name: str, description: str = '', labels: Optional[Dict[str, object]] = None,
+                  buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._metric(Histogram, name, description, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        with self._lock:
+            families = [(name, kind, description, list(metrics.items()))
+                        for name, (kind, description, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, kind, description, metrics in families:
+            if description:
+                lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for label_text, metric in metrics:
+                for sample_name, labels, value in metric.samples(name, label_text):
+                    label_part = f'{{{labels}}}' if labels else ''
+                    lines.append(f'{sample_name}{label_part} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Optional[str] = None):
+        path = path or self._dump_path
+        if not path:
+            return
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Ошибка при записи метрик: {e}")
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> bool:
+        """HTTP-эндпоинт /metrics в фоновом потоке (только localhost по умолчанию)"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"Metrics endpoint is not available on {host}:{port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"Metrics: http://{host}:{port}/metrics")
+        return True
+
+    def start(self, port: Optional[int] = None, dump_path: Optional[str] = None, interval: float = 60.0):
+        """Включение реестра, эндпоинта и/или периодического сброса в файл"""
+        if not port and not dump_path:
+            return
+        self.enabled = True
+        _register_process_metrics(self)
+        if port:
+            self.serve(port)
+        if dump_path:
+            self._dump_path = dump_path
+            atexit.register(self.write)
+            if interval > 0:
+                threading.Thread(target=self._dump_loop, args=(interval,), name='metrics-dump', daemon=True).start()
+
+    def start_from_environment(self):
+        try:
+            port = int(os.environ.get('CV_METRICS_PORT', 0))
+            interval = float(os.environ.get('CV_METRICS_INTERVAL', 60))
+        except ValueError:
+            print("CV_METRICS_PORT / CV_METRICS_INTERVAL must be numbers")
+            return
+        self.start(port, os.environ.get('CV_METRICS_FILE') or None, interval)
+
+    def _dump_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.write()
+
+
+def _resident_memory() -> float:
+    """Резидентная память процесса, байт (psutil из requirements; без него - /proc в Linux)"""
+    try:
+        import psutil
+        return float(psutil.Process().memory_info().rss)
+    except ImportError:
+        pass
+    with open('/proc/self/statm') as f:
+        return float(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _process_start_time() -> Optional[float]:
+    """Время запуска процесса (unix), None - без psutil неизвестно"""
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except ImportError:
+        return None
+
+
+def _register_process_metrics(registry: MetricsRegistry):
+    registry.gauge('process_resident_memory_bytes', 'Resident memory size').set_function(_resident_memory)
+    started = _process_start_time()
+    if started is not None:
+        registry.gauge('process_start_time_seconds', 'Start time since unix epoch').set(started)
+    registry.gauge('process_threads', 'Python threads').set_function(lambda: float(threading.active_count()))
+
+
+metrics = MetricsRegistry()
@@ -5,28 +5,35 @@ from PySide6.QtCore import QThread, Signal
 import time
 import random
 
-from ObjectClasses import Image
+from ObjectClasses import Image, FrameAverager, BurstStats, FrameRateMeter, register_camera_metrics
 
 class MockHikrobotThread(QThread):
     frame_ready = Signal(Image)  # Эмуляция сигнала Image
+    snapshot_ready = Signal(Image)
+    burst_ready = Signal(object, object)
 
     def __init__(self, cti_file: Optional[str] = None, camera_index: int = 0):
         super().__init__()
         self.cti_file = cti_file
         self.camera_index = camera_index
         self.running = False
+        self.paused = False
         self.last_frame = None
         self.width = 640
         self.height = 480
         self.fps = 30
         self.frame_count = 0
+        self.roi = None
+        self.binning = 1
+        self.acquisition_meter = FrameRateMeter()
+        self.dropped_frames = 0
 
         # Параметры для генерации тестовых изображений
         self.test_patterns = ['chessboard', 'gradient', 'circles', 'noise', 'color_bars']
         self.current_pattern = 'color_bars'
 
     @staticmethod
-    def get_devices(cti_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_devices(cti_file: Optional[str] = None, refresh: bool = False) -> List[Dict[str, Any]]:
         """
         Возвращает список эмулированных устройств
         """
@@ -164,6 +171,7 @@ class MockHikrobotThread(QThread):
 
     def run(self):
         """Основной цикл эмуляции камеры"""
+        register_camera_metrics(self, f'mock{self.camera_index}')
         self.running = True
         frame_time = 1.0 / self.fps
 
@@ -171,13 +179,21 @@ class MockHikrobotThread(QThread):
             while self.running:
                 start_time = time.time()
 
+                if self.paused:
+                    time.sleep(frame_time)
+                    continue
+
                 # Генерируем тестовое изображение
                 frame = self._generate_test_image()
                 self.last_frame = frame
                 self.frame_count += 1
 
 
-                image = Image('', frame)
+                timestamp = time.perf_counter()
+                self.acquisition_meter.tick(timestamp)
+                image = Image('', frame, timestamp=timestamp)
+                if self.roi is not None:
+                    image = image.crop(*self.roi)
                 self.frame_ready.emit(image)
 
                 # Поддерживаем постоянный FPS
@@ -191,6 +207,23 @@ class MockHikrobotThread(QThread):
         finally:
             self.running = False
 
+    def pause(self, stop_acquisition: bool = True):
+        """Стоп-кадр"""
+        self.paused = True
+
+    def resume(self):
+        """Возобновление эмуляции"""
+        self.paused = False
+
+    def is_paused(self) -> bool:
+        return self.paused
+
+    def get_last_image(self):
+        """Последний кадр без остановки эмуляции"""
+        if self.last_frame is None:
+            return None
+        return Image('', self.last_frame)
+
     def stop(self):
         """Остановка эмуляции"""
         self.running = False
@@ -204,6 +237,49 @@ class MockHikrobotThread(QThread):
         self.width = width
         self.height = height
 
+    def set_analysis_roi(self, x: int, y: int, width: int, height: int) -> bool:
+        """Программный ROI анализа"""
+        self.roi = (x, y, width, height)
+        return True
+
+    def clear_analysis_roi(self) -> bool:
+        self.roi = None
+        return True
+
+    def set_preview_binning(self, factor: int) -> bool:
+        """Биннинг эмулируется уменьшением генерируемого кадра"""
+        factor = max(1, int(factor))
+        self.width = self.width * self.binning // factor
+        self.height = self.height * self.binning // factor
+        self.binning = factor
+        return True
+
+    def request_snapshot(self):
+        """Кадр полного разрешения"""
+        binning = self.binning
+        self.set_preview_binning(1)
+        image = Image('', self._generate_test_image())
+        self.set_preview_binning(binning)
+        self.snapshot_ready.emit(image)
+
+    def request_burst(self, frames: int = 8):
+        """Серия зашумлённых тестовых кадров с усреднением"""
+        start = time.perf_counter()
+        averager = FrameAverager()
+        base = self._generate_test_image()
+        averager.reset(base.shape)
+        noise = np.empty(base.shape, np.int16)
+        for _ in range(max(2, frames)):
+            cv2.randn(noise, 0, 8)
+            averager.add(cv2.add(base, noise, dtype=cv2.CV_8U))
+        stats = BurstStats(
+            frames=averager.count,
+            capture_time=time.perf_counter() - start,
+            noise_variance_single=averager.single_noise_variance(),
+            noise_variance_averaged=averager.averaged_noise_variance(),
+        )
+        self.burst_ready.emit(Image('', averager.average()), stats)
+
     def set_fps(self, fps: int):
         """Установка FPS"""
         self.fps = max(1, fps)
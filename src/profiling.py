@@ -0,0 +1,182 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class StageStats:
+    '''Время одного этапа: количество, сумма, минимум/максимум
+     и гистограмма длительностей по степеням двойки (от 1 мкс)'''
+
+    BUCKETS = 32  # 1 мкс .. ~35 минут
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.histogram = [0] * self.BUCKETS
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        micros = duration * 1e6
+        bucket = 0 if micros < 1 else min(self.BUCKETS - 1, int(math.log2(micros)) + 1)
+        self.histogram[bucket] += 1
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля по гистограмме (верхняя граница корзины), с"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return min(self.max, (2 ** bucket) * 1e-6)
+        return self.max
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler:
+    '''Инструментирование горячих участков: таймеры этапов (perf_counter),
+     счётчики и гистограммы задержек. Выключенный профайлер возвращает
+     общий пустой контекст, поэтому стоимость замера - одна проверка флага.
+     Включается переменной окружения CV_PROFILE=1 или из меню; итог -
+     таблица (summary) или трасса для chrome://tracing / Perfetto'''
+
+    MAX_TRACE_EVENTS = 500_000
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages: Dict[str, StageStats] = {}
+            self.counters: Dict[str, int] = {}
+            self._events: List[tuple] = []
+            self.dropped_events = 0
+            self._origin = time.perf_counter()
+
+    def set_enabled(self, enabled: bool):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def stage(self, name: str):
+        """Контекст замера: with profiler.stage('imread'): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str):
+        """Декоратор замера функции"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter())
+            return wrapper
+        return decorator
+
+    def record(self, name: str, start: float, end: float):
+        thread_id = threading.get_ident()
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(end - start)
+            if len(self._events) < self.MAX_TRACE_EVENTS:
+                self._events.append((name, start, end, thread_id))
+            else:
+                self.dropped_events += 1
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> str:
+        """Таблица этапов по убыванию суммарного времени"""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1].total, reverse=True)
+            counters = sorted(self.counters.items())
+        lines = [f'{"stage":<22}{"count":>9}{"total, s":>11}{"mean, ms":>10}'
+                 f'{"p50, ms":>10}{"p95, ms":>10}{"max, ms":>10}']
+        for name, stats in stages:
+            lines.append(f'{name:<22}{stats.count:>9}{stats.total:>11.3f}'
+                         f'{stats.total / stats.count * 1000:>10.3f}'
+                         f'{stats.percentile(0.5) * 1000:>10.3f}{stats.percentile(0.95) * 1000:>10.3f}'
+                         f'{stats.max * 1000:>10.3f}')
+        for name, value in counters:
+            lines.append(f'{name:<22}{value:>9}')
+        if self.dropped_events:
+            lines.append(f'(trace truncated, {self.dropped_events} events dropped)')
+        return '\n'.join(lines)
+
+    def write_chrome_trace(self, path: str):
+        """Трасса в формате Chrome Trace Event (chrome://tracing, ui.perfetto.dev)"""
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self.counters)
+            origin = self._origin
+        pid = os.getpid()
+        trace = [{
+            'name': name, 'ph': 'X', 'pid': pid, 'tid': thread_id,
+            'ts': (start - origin) * 1e6, 'dur': (end - start) * 1e6,
+        } for name, start, end, thread_id in events]
+        trace.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+                      'ts': (time.perf_counter() - origin) * 1e6, 'args': counters})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+    def dump(self, trace_path: Optional[str] = None):
+        """Таблица в stdout и (если задан путь) трасса"""
+        print(self.summary())
+        if trace_path:
+            self.write_chrome_trace(trace_path)
+            print(f'Trace saved to: {trace_path}')
+
+
+profiler = Profiler(enabled=os.environ.get('CV_PROFILE', '') not in ('', '0'))
@@ -0,0 +1,366 @@
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+
+from ObjectClasses import Image, gamma_lut, otsu_from_histogram
+from utils import PreprocessMethod
+
+
+class ArrayTileSource:
+    '''Источник тайлов из массива. Сжатые форматы (PNG, JPEG, TIFF)
+     декодируются целиком - ограничена только память обработки'''
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.array.shape[:2]
+
+    @property
+    def dtype(self):
+        return self.array.dtype
+
+    @property
+    def pixels(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    def read(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        return self.array[y:y + height, x:x + width]
+
+
+class NpyTileSource(ArrayTileSource):
+    '''Массив .npy, отображённый в память (np.load с mmap_mode)'''
+
+    def __init__(self, path: str):
+        array = np.load(path, mmap_mode='r')
+        if array.ndim != 2 or array.dtype not in (np.uint8, np.uint16):
+            raise ValueError(f'Unsupported array {array.shape} {array.dtype}')
+        super().__init__(array)
+
+
+class BmpTileSource:
+    '''Несжатый BMP, отображённый в память: читаются только строки тайла.
+     Поддерживаются 8 бит с палитрой, 24 и 32 бита'''
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(54)
+            if len(header) < 54 or header[:2] != b'BM':
+                raise ValueError('Not a BMP file')
+            pixel_offset, dib_size = struct.unpack_from('<II', header, 10)
+            width, height = struct.unpack_from('<ii', header, 18)
+            bpp, compression = struct.unpack_from('<HI', header, 28)
+            colors_used = struct.unpack_from('<I', header, 46)[0]
+            if compression not in (0, 3) or bpp not in (8, 24, 32):
+                raise ValueError(f'Unsupported BMP: {bpp} bpp, compression {compression}')
+
+            self._palette = None
+            if bpp == 8:
+                f.seek(14 + dib_size)
+                count = colors_used or 256
+                palette = np.frombuffer(f.read(4 * count), np.uint8).reshape(-1, 4)
+                gray = cv.cvtColor(palette[np.newaxis, :, :3], cv.COLOR_BGR2GRAY).ravel()
+                lut = np.zeros(256, np.uint8)
+                lut[:len(gray)] = gray
+                # Серая палитра (индекс = яркость) - без перекодировки
+                if not np.array_equal(lut, np.arange(256, dtype=np.uint8)):
+                    self._palette = lut
+
+        self.width = width
+        self.height = abs(height)
+        self.channels = bpp // 8
+        # Положительная высота - строки хранятся снизу вверх
+        self._bottom_up = height > 0
+        stride = (width * bpp + 31) // 32 * 4
+        self._data = np.memmap(path, np.uint8, 'r', offset=pixel_offset, shape=(self.height, stride))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint8)
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def read(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        if self._bottom_up:
+            rows = self._data[self.height - y - height:self.height - y][::-1]
+        else:
+            rows = self._data[y:y + height]
+        tile = np.ascontiguousarray(rows[:, x * self.channels:(x + width) * self.channels])
+        if self.channels == 1:
+            return tile if self._palette is None else cv.LUT(tile, self._palette)
+        tile = tile.reshape(height, width, self.channels)
+        return cv.cvtColor(tile, cv.COLOR_BGR2GRAY if self.channels == 3 else cv.COLOR_BGRA2GRAY)
+
+
+def open_tile_source(path: str, decode: bool = True):
+    """
+    Источник тайлов для файла: BMP и .npy отображаются в память, остальные
+    форматы декодируются целиком (decode=False - вернуть None)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.bmp':
+            return BmpTileSource(path)
+        if extension == '.npy':
+            return NpyTileSource(path)
+    except (ValueError, OSError) as e:
+        print(f"Cannot map {path}: {e}")
+    if not decode:
+        return None
+    return ArrayTileSource(Image(path).get_image())
+
+
+@dataclass
+class TiledResult:
+    """Итог потайловой обработки одного изображения одним методом"""
+    method: str
+    width: int
+    height: int
+    gamma: float
+    threshold: float
+    contour_areas: List[float] = field(default_factory=list)
+    tiles: int = 0
+    border_objects: int = 0
+
+    @property
+    def area_px(self) -> float:
+        return float(sum(self.contour_areas))
+
+    @property
+    def contours_count(self) -> int:
+        return len(self.contour_areas)
+
+
+class TiledAnalyzer:
+    '''Анализ гигапиксельных изображений по перекрывающимся тайлам
+     с ограниченной памятью.
+
+     Гамма и порог Оцу выбираются один раз по глобальной гистограмме,
+     поэтому все тайлы бинаризуются одинаково. Целый объект засчитывается
+     тайлу, в ядре которого лежит левый верхний угол его рамки; объекты,
+     обрезанные краем окна, дочитываются отдельно расширяющейся областью
+     и учитываются один раз по истинной рамке'''
+
+    def __init__(self, source, tile_size: int = 4096, overlap: int = 256,
+                 overview_side: int = 2048, max_object_side: int = 16384):
+        self.source = source
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.overview_side = overview_side
+        self.max_object_side = max_object_side
+        self.height, self.width = source.shape
+        self.max_value = int(np.iinfo(source.dtype).max)
+        self._histogram = None
+        self._overview = None
+
+    def tiles(self):
+        """Ядра тайлов (x, y, ширина, высота) без перекрытия"""
+        for y in range(0, self.height, self.tile_size):
+            for x in range(0, self.width, self.tile_size):
+                yield x, y, min(self.tile_size, self.width - x), min(self.tile_size, self.height - y)
+
+    def tile_count(self) -> int:
+        return -(-self.width // self.tile_size) * -(-self.height // self.tile_size)
+
+    # ==================== Глобальные параметры ====================
+
+    def scan(self, progress: Optional[Callable[[int, int], None]] = None):
+        """Один проход по изображению: глобальная гистограмма и уменьшенная копия"""
+        bins = self.max_value + 1
+        histogram = np.zeros(bins, np.float64)
+        scale = min(1.0, self.overview_side / max(self.width, self.height))
+        overview = np.zeros((max(1, round(self.height * scale)), max(1, round(self.width * scale))),
+                            self.source.dtype)
+
+        total = self.tile_count()
+        for index, (x, y, w, h) in enumerate(self.tiles()):
+            if progress:
+                progress(index, total)
+            tile = self.source.read(x, y, w, h)
+            histogram += cv.calcHist([tile], [0], None, [bins], [0, bins]).ravel()
+
+            ox0, oy0 = round(x * scale), round(y * scale)
+            ox1, oy1 = max(ox0 + 1, round((x + w) * scale)), max(oy0 + 1, round((y + h) * scale))
+            ox1, oy1 = min(ox1, overview.shape[1]), min(oy1, overview.shape[0])
+            if ox1 > ox0 and oy1 > oy0:
+                overview[oy0:oy1, ox0:ox1] = cv.resize(tile, (ox1 - ox0, oy1 - oy0), interpolation=cv.INTER_AREA)
+
+        self._histogram = histogram
+        self._overview = overview
+        return histogram
+
+    def get_histogram(self) -> np.ndarray:
+        if self._histogram is None:
+            self.scan()
+        return self._histogram
+
+    def get_overview(self) -> np.ndarray:
+        if self._overview is None:
+            self.scan()
+        return self._overview
+
+    def gamma_from_high_percentile(self, top_percent=0.001, target=0.6) -> float:
+        """Как Image.gamma_from_high_percentile, но по глобальной гистограмме"""
+        histogram = self.get_histogram()
+        top_k = max(1, int(histogram.sum() * top_percent))
+        # Самые яркие top_k пикселей: идём от верхних уровней
+        counts = histogram[::-1]
+        taken = np.minimum(counts, np.maximum(top_k - (np.cumsum(counts) - counts), 0))
+        levels = np.arange(self.max_value, -1, -1, dtype=np.float64)
+        bright_avg = float((taken * levels).sum() / taken.sum()) / self.max_value
+        gamma = np.log(target) / np.log(bright_avg)
+        return float(np.clip(gamma, 0.5, 10.0))
+
+    def lookup_table(self, method: PreprocessMethod, first_parameter: float = 0.7,
+                     second_parameter: float = 0.5) -> Tuple[np.ndarray, float]:
+        """Поточечное преобразование метода в виде таблицы и гамма для отчёта"""
+        dtype = self.source.dtype
+        if method == PreprocessMethod.GAMMA_BY_PERCENTILE:
+            gamma = self.gamma_from_high_percentile(target=second_parameter)
+            return gamma_lut(round(gamma, 4), dtype.name), gamma
+
+        if method == PreprocessMethod.STRETCH_BRIGHT:
+            values = np.arange(self.max_value + 1, dtype=np.float64) / self.max_value
+            stretched = np.clip((values - first_parameter) / (1.0 - first_parameter), 0, 1)
+            return (stretched * self.max_value).astype(dtype), 0.0
+
+        # Перепад площадей определяется отношениями - достаточно уменьшенной копии
+        gamma = Image('', self.get_overview().copy()).calculate_gamma_from_contour_graph_with_log_deriv(
+            max_gamma=15, modal_window=None
+        )
+        return gamma_lut(round(gamma, 4), dtype.name), gamma
+
+    def threshold_for(self, lut: np.ndarray) -> float:
+        """Порог Оцу обработанного изображения: гистограмма переносится через таблицу"""
+        histogram = np.bincount(lut, weights=self.get_histogram(), minlength=self.max_value + 1)
+        return otsu_from_histogram(histogram)
+
+    # ==================== Обработка тайлов ====================
+
+    def _binarize(self, x: int, y: int, w: int, h: int, lut: np.ndarray, threshold: float) -> np.ndarray:
+        tile = self.source.read(x, y, w, h)
+        processed = cv.LUT(tile, lut) if tile.dtype == np.uint8 else np.take(lut, tile)
+        return cv.compare(processed, threshold, cv.CMP_GT)
+
+    def _window(self, x: int, y: int, w: int, h: int, margin: int) -> Tuple[int, int, int, int]:
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(self.width, x + w + margin), min(self.height, y + h + margin)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def _touches_window_edge(self, rect, window) -> bool:
+        """Рамка контура упирается в край окна, который не является краем изображения"""
+        bx, by, bw, bh = rect
+        x0, y0, w, h = window
+        return ((bx == 0 and x0 > 0) or (by == 0 and y0 > 0)
+                or (bx + bw == w and x0 + w < self.width) or (by + bh == h and y0 + h < self.height))
+
+    def _resolve_border_object(self, point: Tuple[int, int], rect, lut, threshold):
+        """
+        Полный контур объекта, обрезанного краем тайла: область вокруг
+        видимой части расширяется, пока объект не перестанет упираться в её край
+
+        Returns:
+            (глобальная рамка, контур в глобальных координатах) или None
+        """
+        margin = self.overlap
+        while True:
+            window = self._window(*rect, margin)
+            x0, y0, w, h = window
+            contours, _ = cv.findContours(self._binarize(*window, lut, threshold),
+                                          cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+            local = (float(point[0] - x0), float(point[1] - y0))
+            contour = next((c for c in contours if cv.pointPolygonTest(c, local, False) >= 0), None)
+            if contour is None:
+                return None
+
+            bounds = cv.boundingRect(contour)
+            if self._touches_window_edge(bounds, window):
+                if max(w, h) < self.max_object_side:
+                    margin *= 2
+                    continue
+                print(f"Warning: object at {point} exceeds {self.max_object_side} px, area is truncated")
+            global_rect = (bounds[0] + x0, bounds[1] + y0, bounds[2], bounds[3])
+            return global_rect, contour + np.array([x0, y0], dtype=contour.dtype)
+
+    def analyze(self, method: PreprocessMethod, first_parameter: float = 0.7, second_parameter: float = 0.5,
+                progress: Optional[Callable[[int, int], None]] = None,
+                is_canceled: Optional[Callable[[], bool]] = None) -> TiledResult:
+        lut, gamma = self.lookup_table(method, first_parameter, second_parameter)
+        threshold = self.threshold_for(lut)
+        result = TiledResult(method=method.value, width=self.width, height=self.height,
+                             gamma=gamma, threshold=threshold)
+
+        # Целые объекты: рамка -> (площадь, точка контура)
+        counted: Dict[Tuple[int, int, int, int], Tuple[float, Tuple[int, int]]] = {}
+        # Обрезанные объекты: точка контура и видимая рамка в глобальных координатах
+        border: List[Tuple[Tuple[int, int], Tuple[int, int, int, int]]] = []
+
+        total = self.tile_count()
+        for index, (x, y, w, h) in enumerate(self.tiles()):
+            if is_canceled and is_canceled():
+                break
+            if progress:
+                progress(index, total)
+            result.tiles += 1
+
+            window = self._window(x, y, w, h, self.overlap)
+            x0, y0 = window[:2]
+            contours, _ = cv.findContours(self._binarize(*window, lut, threshold),
+                                          cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+            for contour in contours:
+                bounds = cv.boundingRect(contour)
+                gx, gy = bounds[0] + x0, bounds[1] + y0
+                point = (int(contour[0, 0, 0]) + x0, int(contour[0, 0, 1]) + y0)
+                if self._touches_window_edge(bounds, window):
+                    border.append((point, (gx, gy, bounds[2], bounds[3])))
+                elif x <= gx < x + w and y <= gy < y + h:
+                    counted[(gx, gy, bounds[2], bounds[3])] = (cv.contourArea(contour), point)
+
+        # Обрезанные объекты дочитываются и учитываются по истинной рамке
+        resolved = []
+        for point, rect in border:
+            if any(r[0] <= point[0] < r[0] + r[2] and r[1] <= point[1] < r[1] + r[3]
+                   and cv.pointPolygonTest(c, (float(point[0]), float(point[1])), False) >= 0
+                   for r, c in resolved):
+                continue
+            found = self._resolve_border_object(point, rect, lut, threshold)
+            if found is None:
+                continue
+            global_rect, contour = found
+            resolved.append((global_rect, contour))
+            if global_rect not in counted:
+                counted[global_rect] = (cv.contourArea(contour), point)
+                result.border_objects += 1
+
+        # Объекты внутри дыр дочитанных объектов при обработке целиком не внешние
+        if resolved:
+            buckets: Dict[Tuple[int, int], List[Tuple[int, int, int, int]]] = {}
+            for rect in counted:
+                buckets.setdefault((rect[0] // self.tile_size, rect[1] // self.tile_size), []).append(rect)
+            for global_rect, contour in resolved:
+                rx, ry, rw, rh = global_rect
+                for bx in range(rx // self.tile_size, (rx + rw) // self.tile_size + 1):
+                    for by in range(ry // self.tile_size, (ry + rh) // self.tile_size + 1):
+                        for rect in buckets.get((bx, by), ()):
+                            if rect == global_rect or rect not in counted:
+                                continue
+                            if not (rx <= rect[0] and ry <= rect[1] and rect[0] + rect[2] <= rx + rw
+                                    and rect[1] + rect[3] <= ry + rh):
+                                continue
+                            point = counted[rect][1]
+                            if cv.pointPolygonTest(contour, (float(point[0]), float(point[1])), False) > 0:
+                                del counted[rect]
+
+        result.contour_areas = [area for area, _ in counted.values()]
+        return result
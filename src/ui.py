@@ -32,6 +32,44 @@ class Ui_MainWindow(object):
         self.actionGamma_by_percentile.setObjectName(u"actionGamma_by_percentile")
         self.actionSet_Calibration = QAction(MainWindow)
         self.actionSet_Calibration.setObjectName(u"actionSet_Calibration")
+        self.actionLive_Measurement = QAction(MainWindow)
+        self.actionLive_Measurement.setObjectName(u"actionLive_Measurement")
+        self.actionLive_Measurement.setCheckable(True)
+        self.actionGamma_Tracking = QAction(MainWindow)
+        self.actionGamma_Tracking.setObjectName(u"actionGamma_Tracking")
+        self.actionGamma_Tracking.setCheckable(True)
+        self.actionSelect_ROI = QAction(MainWindow)
+        self.actionSelect_ROI.setObjectName(u"actionSelect_ROI")
+        self.actionSelect_ROI.setCheckable(True)
+        self.actionReset_ROI = QAction(MainWindow)
+        self.actionReset_ROI.setObjectName(u"actionReset_ROI")
+        self.actionBinned_Preview = QAction(MainWindow)
+        self.actionBinned_Preview.setObjectName(u"actionBinned_Preview")
+        self.actionBinned_Preview.setCheckable(True)
+        self.actionBurst_Average = QAction(MainWindow)
+        self.actionBurst_Average.setObjectName(u"actionBurst_Average")
+        self.actionBurst_Benchmark = QAction(MainWindow)
+        self.actionBurst_Benchmark.setObjectName(u"actionBurst_Benchmark")
+        self.actionAdd_Camera_Stream = QAction(MainWindow)
+        self.actionAdd_Camera_Stream.setObjectName(u"actionAdd_Camera_Stream")
+        self.actionAdd_GenICam_Stream = QAction(MainWindow)
+        self.actionAdd_GenICam_Stream.setObjectName(u"actionAdd_GenICam_Stream")
+        self.actionHigh_Bit_Depth = QAction(MainWindow)
+        self.actionHigh_Bit_Depth.setObjectName(u"actionHigh_Bit_Depth")
+        self.actionHigh_Bit_Depth.setCheckable(True)
+        self.actionAnalyze_Large_Image = QAction(MainWindow)
+        self.actionAnalyze_Large_Image.setObjectName(u"actionAnalyze_Large_Image")
+        self.actionZoomable_Viewer = QAction(MainWindow)
+        self.actionZoomable_Viewer.setObjectName(u"actionZoomable_Viewer")
+        self.actionZoomable_Viewer.setCheckable(True)
+        self.actionProfiling = QAction(MainWindow)
+        self.actionProfiling.setObjectName(u"actionProfiling")
+        self.actionProfiling.setCheckable(True)
+        self.actionSave_Profile = QAction(MainWindow)
+        self.actionSave_Profile.setObjectName(u"actionSave_Profile")
+        self.actionPerformance_Overlay = QAction(MainWindow)
+        self.actionPerformance_Overlay.setObjectName(u"actionPerformance_Overlay")
+        self.actionPerformance_Overlay.setCheckable(True)
         self.centralwidget = QWidget(MainWindow)
         self.centralwidget.setObjectName(u"centralwidget")
         self.verticalLayout_2 = QVBoxLayout(self.centralwidget)
@@ -119,14 +157,36 @@ class Ui_MainWindow(object):
         self.menuFIle.addAction(self.actionConnect_Camera)
         self.menuFIle.addSeparator()
         self.menuFIle.addAction(self.actionConnect_cti_file)
+        self.menuFIle.addSeparator()
+        self.menuFIle.addAction(self.actionAdd_Camera_Stream)
+        self.menuFIle.addAction(self.actionAdd_GenICam_Stream)
         self.menuHelp.addAction(self.actionAbout)
         self.menuHelp.addAction(self.actionChange_Language)
+        self.menuHelp.addSeparator()
+        self.menuHelp.addAction(self.actionProfiling)
+        self.menuHelp.addAction(self.actionSave_Profile)
+        self.menuHelp.addAction(self.actionPerformance_Overlay)
         self.menuGamma.addAction(self.actionGamma_by_area)
         self.menuGamma.addAction(self.actionGamma_by_percentile)
+        self.menuGamma.addSeparator()
+        self.menuGamma.addAction(self.actionGamma_Tracking)
         self.menuFunctions.addAction(self.actionCalculate_the_area)
         self.menuFunctions.addSeparator()
         self.menuFunctions.addAction(self.actionProcess_Image_Array)
         self.menuFunctions.addAction(self.actionSet_Calibration)
+        self.menuFunctions.addSeparator()
+        self.menuFunctions.addAction(self.actionLive_Measurement)
+        self.menuFunctions.addSeparator()
+        self.menuFunctions.addAction(self.actionSelect_ROI)
+        self.menuFunctions.addAction(self.actionReset_ROI)
+        self.menuFunctions.addSeparator()
+        self.menuFunctions.addAction(self.actionBinned_Preview)
+        self.menuFunctions.addAction(self.actionBurst_Average)
+        self.menuFunctions.addAction(self.actionBurst_Benchmark)
+        self.menuFunctions.addAction(self.actionHigh_Bit_Depth)
+        self.menuFunctions.addAction(self.actionAnalyze_Large_Image)
+        self.menuFunctions.addSeparator()
+        self.menuFunctions.addAction(self.actionZoomable_Viewer)
 
         self.retranslateUi(MainWindow)
 
@@ -146,6 +206,21 @@ class Ui_MainWindow(object):
         self.actionGamma_by_area.setText(QCoreApplication.translate("MainWindow", u"Gamma by area", None))
         self.actionGamma_by_percentile.setText(QCoreApplication.translate("MainWindow", u"Gamma by percentile", None))
         self.actionSet_Calibration.setText(QCoreApplication.translate("MainWindow", u"Set Calibration", None))
+        self.actionLive_Measurement.setText(QCoreApplication.translate("MainWindow", u"Live Measurement", None))
+        self.actionGamma_Tracking.setText(QCoreApplication.translate("MainWindow", u"Auto Gamma Tracking", None))
+        self.actionSelect_ROI.setText(QCoreApplication.translate("MainWindow", u"Select ROI", None))
+        self.actionReset_ROI.setText(QCoreApplication.translate("MainWindow", u"Reset ROI", None))
+        self.actionBinned_Preview.setText(QCoreApplication.translate("MainWindow", u"Binned Preview", None))
+        self.actionBurst_Average.setText(QCoreApplication.translate("MainWindow", u"Burst Average", None))
+        self.actionBurst_Benchmark.setText(QCoreApplication.translate("MainWindow", u"Burst Benchmark", None))
+        self.actionAdd_Camera_Stream.setText(QCoreApplication.translate("MainWindow", u"Add Camera Stream", None))
+        self.actionAdd_GenICam_Stream.setText(QCoreApplication.translate("MainWindow", u"Add GenICam Stream", None))
+        self.actionHigh_Bit_Depth.setText(QCoreApplication.translate("MainWindow", u"16-bit Camera Mode", None))
+        self.actionAnalyze_Large_Image.setText(QCoreApplication.translate("MainWindow", u"Analyze Large Image (Tiled)", None))
+        self.actionZoomable_Viewer.setText(QCoreApplication.translate("MainWindow", u"Zoomable Viewer", None))
+        self.actionProfiling.setText(QCoreApplication.translate("MainWindow", u"Profiling", None))
+        self.actionSave_Profile.setText(QCoreApplication.translate("MainWindow", u"Save Profile...", None))
+        self.actionPerformance_Overlay.setText(QCoreApplication.translate("MainWindow", u"Performance Overlay", None))
         self.pixmap_label.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.label_2.setText("")
         self.pushButton.setText(QCoreApplication.translate("MainWindow", u"Strech Bright Region", None))
@@ -1,5 +1,8 @@
+import hashlib
+import json
 import os
 import sys
+import threading
 from enum import Enum
 
 import cv2 as cv
@@ -7,6 +10,8 @@ import numpy as np
 import pytesseract
 from PySide6.QtGui import QImage, QPixmap
 
+from profiling import profiler
+
 
 # from scipy.signal import savgol_filter
 
@@ -18,64 +23,202 @@ class PreprocessMethod(Enum):
     # NO_PREPROCESSING = "No preprocessing (raw image)"
 
 
+class CalibrationCache:
+    '''Кэш результатов OCR калибровки по хэшу бинаризованного кропа линейки.
+     Хранится на диске рядом с calibration_config.json'''
+
+    def __init__(self, cache_file: str = "calibration_cache.json"):
+        self.cache_file = cache_file
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(thresh: np.ndarray) -> str:
+        digest = hashlib.sha1(np.ascontiguousarray(thresh).tobytes())
+        digest.update(str(thresh.shape).encode())
+        return digest.hexdigest()
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    print(f"Ошибка при чтении кэша калибровки: {e}")
+        return self._entries
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None:
+            return None
+        return entry["length"], list(entry["units"])
+
+    def put(self, key: str, length: float, units: list):
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"length": float(length), "units": list(units)}
+            try:
+                with open(self.cache_file, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, indent=4, ensure_ascii=False)
+            except Exception as e:
+                print(f"Ошибка при сохранении кэша калибровки: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            if os.path.exists(self.cache_file):
+                os.remove(self.cache_file)
+
+
+calibration_cache = CalibrationCache()
+
+
+class FrameConverter:
+    '''Кадр OpenCV -> QImage без лишних копий. Непрерывные 8-битные кадры
+     (серые, BGR, RGB, RGBA) оборачиваются как есть: Qt читает их напрямую,
+     BGR - через Format_BGR888 без cvtColor. Остальные (16 бит, отражение,
+     срезы ROI) преобразуются в собственный буфер конвертера; буфер и QImage
+     над ним переиспользуются, пока не меняются размер и формат кадра.
+     QImage ссылается на память массива и действителен до следующего вызова
+     to_qimage (массив удерживается конвертером и самим QImage)'''
+
+    def __init__(self):
+        self._source = None  # массив, на который ссылается последний QImage
+        self._buffer = None
+        self._qimage = None
+        self.wrapped_frames = 0
+        self.converted_frames = 0
+
+    @staticmethod
+    def qt_format(channels: int, swap_rgb: bool = True) -> QImage.Format:
+        if channels == 1:
+            return QImage.Format_Grayscale8
+        if channels == 3:
+            return QImage.Format_BGR888 if swap_rgb else QImage.Format_RGB888
+        if channels == 4:
+            return QImage.Format_RGBA8888
+        raise ValueError("Неподдерживаемый формат изображения")
+
+    @staticmethod
+    def _wrap(array: np.ndarray, qt_format: QImage.Format) -> QImage:
+        height, width = array.shape[:2]
+        q_img = QImage(array.data, width, height, array.strides[0], qt_format)
+        # Ссылка на массив живёт столько же, сколько обёртка QImage
+        q_img._array = array
+        return q_img
+
+    @profiler.timed('qt_convert')
+    def to_qimage(self, cv_img: np.ndarray, swap_rgb=True, mirror=False) -> QImage:
+        channels = 1 if cv_img.ndim == 2 else cv_img.shape[2]
+        qt_format = self.qt_format(channels, swap_rgb)
+
+        if cv_img.dtype == np.uint8 and cv_img.flags.c_contiguous and not mirror:
+            self._source = cv_img
+            self.wrapped_frames += 1
+            return self._wrap(cv_img, qt_format)
+
+        shape = cv_img.shape
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+            self._qimage = None
+        if self._qimage is None or self._qimage.format() != qt_format:
+            self._qimage = self._wrap(self._buffer, qt_format)
+
+        if cv_img.dtype == np.uint16 and not mirror:
+            cv.convertScaleAbs(cv_img, dst=self._buffer, alpha=1.0 / 257.0)
+        else:
+            image = OpenCVToQtAdapter.to_8bit(cv_img)
+            if mirror:
+                cv.flip(image, 1, dst=self._buffer)
+            else:
+                np.copyto(self._buffer, image)
+        self._source = self._buffer
+        self.converted_frames += 1
+        return self._qimage
+
+
 class OpenCVToQtAdapter:
     '''Статический класс с вспомогательными статическими функциями'''
 
     @staticmethod
-    def convert_cv_to_qt(cv_img: np.ndarray, swap_rgb=True, mirror=False) -> QPixmap:
+    def to_8bit(image: np.ndarray) -> np.ndarray:
+        """Приведение 16-битного изображения к 8 битам (для отображения и OCR)"""
+        if image.dtype == np.uint8:
+            return image
+        if image.dtype == np.uint16:
+            return cv.convertScaleAbs(image, alpha=1.0 / 257.0)
+        return cv.normalize(image, None, 0, 255, cv.NORM_MINMAX, dtype=cv.CV_8U)
+
+    @staticmethod
+    def convert_cv_to_qt(cv_img: np.ndarray, swap_rgb=True, mirror=False,
+                         converter: 'FrameConverter' = None) -> QPixmap:
         """
         Конвертирует изображение OpenCV в QPixmap для отображения в PySide6
 
         Параметры:
             cv_img (numpy.ndarray): Изображение в формате OpenCV (BGR)
-            swap_rgb (bool): Если True, меняет каналы BGR на RGB (по умолчанию True)
+            swap_rgb (bool): Если True, трёхканальное изображение считается BGR (по умолчанию True)
             mirror (bool): Если True, зеркально отражает изображение по горизонтали
+            converter (FrameConverter): Конвертер с буфером, переиспользуемым между кадрами
 
         Возвращает:
             QPixmap: Изображение, готовое для отображения в PySide6
         """
-        # Конвертируем цветовое пространство при необходимости
-        if swap_rgb and len(cv_img.shape) == 3 and cv_img.shape[2] == 3:
-            cv_img = cv.cvtColor(cv_img, cv.COLOR_BGR2RGB)
-
-        # Зеркальное отражение при необходимости
-        if mirror:
-            cv_img = cv.flip(cv_img, 1)
-
-        # Определяем формат QImage в зависимости от типа изображения
-        if len(cv_img.shape) == 2:
-            # Ч/б изображение
-            h, w = cv_img.shape
-            qt_format = QImage.Format_Grayscale8
-            bytes_per_line = w
-        elif cv_img.shape[2] == 3:
-            # Цветное изображение (RGB)
-            h, w, _ = cv_img.shape
-            qt_format = QImage.Format_RGB888
-            bytes_per_line = w * 3
-        elif cv_img.shape[2] == 4:
-            # Изображение с альфа-каналом (RGBA)
-            h, w, _ = cv_img.shape
-            qt_format = QImage.Format_RGBA8888
-            bytes_per_line = w * 4
-        else:
-            raise ValueError("Неподдерживаемый формат изображения")
-
-        # Создаем QImage и преобразуем в QPixmap
-        q_img = QImage(cv_img.data, w, h, bytes_per_line, qt_format)
-        return QPixmap.fromImage(q_img)
+        if converter is None:
+            converter = FrameConverter()
+        # QPixmap копирует данные, поэтому буфер конвертера можно сразу переиспользовать
+        return QPixmap.fromImage(converter.to_qimage(cv_img, swap_rgb=swap_rgb, mirror=mirror))
 
     @staticmethod
-    def process_calibration_image(image_path):
-        pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD").encode('unicode_escape').decode()
+    def process_calibration_image(image_path, use_cache=True):
         image = cv.imread(image_path, cv.IMREAD_GRAYSCALE)
-        height, width = image.shape
+        return OpenCVToQtAdapter.process_calibration_array(image, use_cache=use_cache)
+
+    @staticmethod
+    def binarize_scale_bar(image: np.ndarray) -> np.ndarray:
+        """Вырезает область масштабной линейки и бинаризует её"""
+        y0, y1, x0, x1 = OpenCVToQtAdapter.scale_bar_region(*image.shape[:2])
+        return OpenCVToQtAdapter.binarize_scale_bar_crop(image[y0:y1, x0:x1])
 
-        # Обрезаем нижние 10% и правые 32% изображения
-        cropped = image[int(height * 0.9):height, int(width * 0.68):width]
+    @staticmethod
+    def scale_bar_region(height: int, width: int):
+        """Область линейки: нижние 10% и правые 32% изображения (y0, y1, x0, x1)"""
+        return int(height * 0.9), height, int(width * 0.68), width
 
-        # Бинаризация
+    @staticmethod
+    def binarize_scale_bar_crop(cropped: np.ndarray) -> np.ndarray:
+        """Бинаризация уже вырезанной области линейки"""
+        cropped = OpenCVToQtAdapter.to_8bit(cropped)
         _, thresh = cv.threshold(cropped, 200, 255, cv.THRESH_BINARY)
+        return thresh
+
+    @staticmethod
+    def process_calibration_array(image: np.ndarray, use_cache=True):
+        thresh = OpenCVToQtAdapter.binarize_scale_bar(image)
+
+        # Линейки с одного микроскопа/объектива совпадают попиксельно,
+        # поэтому результат OCR можно взять из кэша по хэшу кропа
+        key = CalibrationCache.key(thresh)
+        if use_cache:
+            cached = calibration_cache.get(key)
+            if cached is not None:
+                return cached
+
+        max_length, out_text = OpenCVToQtAdapter.recognize_scale_bar(thresh)
+        if use_cache and out_text:
+            calibration_cache.put(key, max_length, out_text)
+        return max_length, out_text
+
+    @staticmethod
+    @profiler.timed('ocr')
+    def recognize_scale_bar(thresh: np.ndarray):
+        """Длина линейки в пикселях и подпись (число и единицы) через Tesseract"""
+        tesseract_cmd = os.getenv("TESSERACT_CMD")
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd.encode('unicode_escape').decode()
 
         # Ищем контуры
         contours, _ = cv.findContours(thresh, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
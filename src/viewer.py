@@ -0,0 +1,247 @@
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+from PySide6.QtCore import Qt, QRectF, QPointF, Signal
+from PySide6.QtGui import QColor, QPainter, QPainterPath, QPen, QPixmap, QPolygonF
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView, QStyleOptionGraphicsItem
+
+from utils import OpenCVToQtAdapter
+
+
+class TilePyramid:
+    '''Многоуровневая пирамида тайлов для отображения больших изображений.
+     Уровень k - изображение, уменьшенное в 2^k раз; уровни и тайлы строятся
+     лениво, только когда попадают в видимую область, и кэшируются (LRU)'''
+
+    def __init__(self, image: np.ndarray, contours=None, tile_size: int = 512, max_tiles: int = 256):
+        self.image = image
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.height, self.width = image.shape[:2]
+        # Верхний уровень целиком помещается в один тайл
+        self.max_level = max(0, math.ceil(math.log2(max(self.width, self.height) / tile_size)))
+        self._levels: Dict[int, np.ndarray] = {0: image}
+        self._tiles = OrderedDict()
+
+        self.set_contours(contours)
+
+    def set_contours(self, contours):
+        """Замена контуров: тайлы без контуров и уровни пирамиды сохраняются"""
+        self.contours = list(contours) if contours is not None else []
+        if self.contours:
+            self._bounds = np.array([cv.boundingRect(contour) for contour in self.contours], dtype=np.int64)
+        else:
+            self._bounds = np.empty((0, 4), dtype=np.int64)
+        self._paths = {}
+        for key in [key for key in self._tiles if key[3]]:
+            del self._tiles[key]
+
+    def level_image(self, level: int) -> np.ndarray:
+        image = self._levels.get(level)
+        if image is None:
+            scale = 2 ** level
+            size = (max(1, -(-self.width // scale)), max(1, -(-self.height // scale)))
+            image = cv.resize(self.image, size, interpolation=cv.INTER_AREA)
+            self._levels[level] = image
+        return image
+
+    def tile_span(self, level: int) -> int:
+        """Сторона тайла уровня level в пикселях полного изображения"""
+        return self.tile_size * 2 ** level
+
+    def visible_tiles(self, level: int, rect: QRectF) -> List[Tuple[int, int]]:
+        span = self.tile_span(level)
+        x0 = max(0, int(rect.left() // span))
+        y0 = max(0, int(rect.top() // span))
+        x1 = min(-(-self.width // span), int(math.ceil(rect.right() / span)))
+        y1 = min(-(-self.height // span), int(math.ceil(rect.bottom() / span)))
+        return [(tx, ty) for ty in range(y0, y1) for tx in range(x0, x1)]
+
+    def _contours_in(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Индексы контуров, чьи габариты пересекают прямоугольник"""
+        bounds = self._bounds
+        if not len(bounds):
+            return np.empty(0, dtype=np.int64)
+        mask = ((bounds[:, 0] < x1) & (bounds[:, 0] + bounds[:, 2] > x0)
+                & (bounds[:, 1] < y1) & (bounds[:, 1] + bounds[:, 3] > y0))
+        return np.flatnonzero(mask)
+
+    def tile(self, level: int, tx: int, ty: int, raster_contours: bool) -> QPixmap:
+        key = (level, tx, ty, raster_contours)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+
+        size = self.tile_size
+        data = self.level_image(level)[ty * size:(ty + 1) * size, tx * size:(tx + 1) * size]
+        data = OpenCVToQtAdapter.to_8bit(np.ascontiguousarray(data))
+        if raster_contours and self.contours:
+            # На мелких уровнях контуры рисуются в сам тайл (линия в 1 пиксель уровня)
+            scale = 2 ** level
+            origin = np.array([tx * self.tile_span(level), ty * self.tile_span(level)])
+            x1, y1 = origin + self.tile_span(level)
+            indices = self._contours_in(origin[0], origin[1], x1, y1)
+            if len(indices):
+                data = cv.cvtColor(data, cv.COLOR_GRAY2RGB)
+                shifted = [((self.contours[i] - origin) // scale).astype(np.int32) for i in indices]
+                cv.drawContours(data, shifted, -1, (255, 0, 0), 1)
+
+        pixmap = OpenCVToQtAdapter.convert_cv_to_qt(data)
+        self._tiles[key] = pixmap
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return pixmap
+
+    def contour_path(self, tx: int, ty: int) -> QPainterPath:
+        """Векторные контуры тайла уровня 0 (строятся при первом показе тайла)"""
+        path = self._paths.get((tx, ty))
+        if path is None:
+            path = QPainterPath()
+            span = self.tile_size
+            for i in self._contours_in(tx * span, ty * span, (tx + 1) * span, (ty + 1) * span):
+                points = self.contours[i].reshape(-1, 2)
+                path.addPolygon(QPolygonF([QPointF(x + 0.5, y + 0.5) for x, y in points]))
+                path.closeSubpath()
+            self._paths[(tx, ty)] = path
+        return path
+
+
+class TiledImageItem(QGraphicsItem):
+    '''Элемент сцены: рисует только видимые тайлы уровня, подходящего к масштабу'''
+
+    # До этого уровня контуры рисуются вектором толщиной в экранный пиксель
+    VECTOR_CONTOUR_LEVELS = 1
+    CONTOUR_COLOR = QColor(0, 0, 255)
+
+    def __init__(self, pyramid: TilePyramid):
+        super().__init__()
+        self.pyramid = pyramid
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def set_pyramid(self, pyramid: TilePyramid):
+        if (pyramid.width, pyramid.height) != (self.pyramid.width, self.pyramid.height):
+            self.prepareGeometryChange()
+        self.pyramid = pyramid
+        self.update()
+
+    def boundingRect(self) -> QRectF:
+        return QRectF(0, 0, self.pyramid.width, self.pyramid.height)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        pyramid = self.pyramid
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = 0 if lod >= 1 else min(pyramid.max_level, int(math.floor(math.log2(1 / lod))))
+        vector_contours = bool(pyramid.contours) and level <= self.VECTOR_CONTOUR_LEVELS
+
+        # При увеличении пиксели не сглаживаются - видны границы включений
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, lod < 1)
+        exposed = option.exposedRect
+        span = pyramid.tile_span(level)
+        scale = 2 ** level
+        for tx, ty in pyramid.visible_tiles(level, exposed):
+            pixmap = pyramid.tile(level, tx, ty, raster_contours=not vector_contours)
+            target = QRectF(tx * span, ty * span, pixmap.width() * scale, pixmap.height() * scale)
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+        if vector_contours:
+            pen = QPen(self.CONTOUR_COLOR)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.setBrush(Qt.NoBrush)
+            for tx, ty in pyramid.visible_tiles(0, exposed):
+                painter.drawPath(pyramid.contour_path(tx, ty))
+
+
+class ZoomableImageView(QGraphicsView):
+    '''Просмотр с масштабированием колесом и перетаскиванием. Новый кадр того же
+     размера сохраняет масштаб и положение (живой режим камеры)'''
+
+    roi_selected = Signal(int, int, int, int)  # x, y, w, h в координатах изображения
+
+    ZOOM_STEP = 1.25
+    MAX_ZOOM = 32.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState, True)
+        self.setBackgroundBrush(Qt.darkGray)
+        self._item: Optional[TiledImageItem] = None
+        self._contours = None
+        self._fitted = True
+        self._rubber_band = None
+        self.rubberBandChanged.connect(self._on_rubber_band_changed)
+
+    def set_image(self, image: np.ndarray, contours=None):
+        if self._item is not None and self._item.pyramid.image is image:
+            # Тот же кадр (например, переключены контуры): кэш тайлов сохраняется
+            if contours is not self._contours:
+                self._contours = contours
+                self._item.pyramid.set_contours(contours)
+                self._item.update()
+            return
+        self._contours = contours
+        pyramid = TilePyramid(image, contours)
+        if self._item is None:
+            self._item = TiledImageItem(pyramid)
+            self.scene().addItem(self._item)
+            resized = True
+        else:
+            resized = (pyramid.width, pyramid.height) != (self._item.pyramid.width, self._item.pyramid.height)
+            self._item.set_pyramid(pyramid)
+        if resized:
+            self.scene().setSceneRect(self._item.boundingRect())
+            self.fit()
+
+    def fit(self):
+        if self._item is not None:
+            self.fitInView(self._item, Qt.KeepAspectRatio)
+            self._fitted = True
+
+    def set_roi_mode(self, enabled: bool):
+        self.setDragMode(QGraphicsView.RubberBandDrag if enabled else QGraphicsView.ScrollHandDrag)
+
+    def _on_rubber_band_changed(self, rect, start: QPointF, end: QPointF):
+        if not rect.isNull():
+            self._rubber_band = (start, end)
+            return
+        # Пустой прямоугольник - выделение завершено
+        if self._rubber_band is None or self._item is None:
+            return
+        start, end = self._rubber_band
+        self._rubber_band = None
+        area = QRectF(start, end).normalized().intersected(self._item.boundingRect())
+        if area.width() >= 2 and area.height() >= 2:
+            self.roi_selected.emit(int(area.left()), int(area.top()), int(area.width()), int(area.height()))
+
+    def wheelEvent(self, event):
+        factor = self.ZOOM_STEP if event.angleDelta().y() > 0 else 1 / self.ZOOM_STEP
+        zoom = self.transform().m11() * factor
+        if factor > 1 and zoom > self.MAX_ZOOM:
+            return
+        if factor < 1 and self._item is not None:
+            # Не уменьшаем сильнее, чем "целиком в окне"
+            rect = self._item.boundingRect()
+            fit = min(self.viewport().width() / rect.width(), self.viewport().height() / rect.height())
+            if zoom < fit:
+                self.fit()
+                return
+        self.scale(factor, factor)
+        self._fitted = False
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit()
+        super().mouseDoubleClickEvent(event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self._fitted:
+            self.fit()